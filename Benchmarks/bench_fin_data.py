@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import gzip
+import glob
+import time
+import timeit
+import argparse
+import platform
+import functools
+import contextlib
+import numpy as np
+import historicalFinancialData
+import historicalFinancialData.utils as ut
+from historicalFinancialData.main import FinData
+from historicalFinancialData.cache import SeriesCache
+from historicalFinancialData.limiter import TokenBucket
+from historicalFinancialData.directory import CompanyDirectory
+from historicalFinancialData.derived import DERIVED_METRICS
+from fixtures import PROFILES, filer_payloads
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Tests"))
+from stand_in_server import StandInServer, synthetic_frame_payloads, synthetic_submissions_payload
+
+"""
+bench_fin_data.py - Times every public FinData.get_* method, end to end against a local stand-in for the SEC API, along
+                    with the internal stages of cleaning the data, for filers from small to very large. Filers are the
+                    fixtures' generated ones or those recorded from the SEC by record_fixtures.py. Every call does the
+                    whole work: nothing is cached, every tag is requested and the rate limit doesn't apply. Prints (or
+                    writes) the results as json and, given the results of an earlier version, the methods that regressed
+
+                    Usage: python Benchmarks/bench_fin_data.py [--repetitions 5] [--recorded Benchmarks/recorded]
+                                                               [--output results.json] [--baseline earlier.json]
+"""
+
+# Internal stages of get_data, timed inclusively (get_spec_data_given_url includes the two stages it calls)
+STAGES = ("get_spec_data_given_url", "fill_start_dates", "get_quarterly_data_from_time_periods", "fill_data",
+          "correct_output")
+# Public methods timed, by name, given the fin data object and the ticker
+METHODS = {"get_revenue": lambda fin_data, ticker: fin_data.get_revenue(ticker),
+           "get_dates": lambda fin_data, ticker: fin_data.get_dates(ticker),
+           "get_cost_of_revenue": lambda fin_data, ticker: fin_data.get_cost_of_revenue(ticker),
+           "get_gross_profit": lambda fin_data, ticker: fin_data.get_gross_profit(ticker),
+           "get_operating_income": lambda fin_data, ticker: fin_data.get_operating_income(ticker),
+           "get_net_profit": lambda fin_data, ticker: fin_data.get_net_profit(ticker),
+           "get_eps": lambda fin_data, ticker: fin_data.get_eps(ticker),
+           "get_eps_diluted": lambda fin_data, ticker: fin_data.get_eps(ticker, is_diluted=True),
+           "get_total_assets": lambda fin_data, ticker: fin_data.get_total_assets(ticker),
+           "get_total_liabilities": lambda fin_data, ticker: fin_data.get_total_liabilities(ticker),
+           "get_statement": lambda fin_data, ticker: fin_data.get_statement(ticker)}
+# Slowdown, relative to the baseline, from which a method counts as having regressed
+REGRESSION_THRESHOLD = 1.2
+
+
+"Builds a filer, in the format record_fixtures.py records them in, out of the fixtures' payloads of the given profile"
+def generated_filer(profile, cik):
+    padded_cik = str(cik).zfill(10)
+    payloads, facts = {}, {}
+    for tag, payload in filer_payloads(profile, cik).items():
+        payloads["/api/xbrl/companyconcept/CIK" + padded_cik + "/us-gaap/" + tag + ".json"] = payload
+        facts[tag] = {"label": tag, "description": tag, "units": payload["units"]}
+    payloads["/api/xbrl/companyfacts/CIK" + padded_cik + ".json"] = \
+        {"cik": cik, "entityName": "Fixture Company " + str(cik), "facts": {"us-gaap": facts}}
+    payloads["/submissions/CIK" + padded_cik + ".json"] = synthetic_submissions_payload(cik, facts)
+    return {"ticker": profile.upper(), "cik": cik, "title": "Fixture Company " + str(cik), "payloads": payloads}
+
+
+"Loads the filers record_fixtures.py recorded into the directory, one gzipped json file each"
+def recorded_filers(directory):
+    filers = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.json.gz"))):
+        with gzip.open(path, 'rb') as f:
+            filer = json.loads(f.read().decode('utf-8'))
+        filers[filer["ticker"]] = filer
+    return filers
+
+
+"""Every payload the stand-in serves for the filers, including the company_tickers.json mapping their tickers and the
+    frames of their facts"""
+def stand_in_payloads(filers):
+    payloads = {"/files/company_tickers.json": {}}
+    for i, filer in enumerate(filers.values()):
+        payloads["/files/company_tickers.json"][str(i)] = {"cik_str": filer["cik"], "ticker": filer["ticker"],
+                                                           "title": filer["title"]}
+        payloads.update(filer["payloads"])
+    payloads.update(synthetic_frame_payloads(payloads))
+    return payloads
+
+
+"Points the library at the stand-in server, with nothing cached, skipped or rate limited, restoring it afterwards"
+@contextlib.contextmanager
+def pointed_at(server):
+    settings = [(CompanyDirectory, 'url', server.url + "/files/company_tickers.json"),
+                (ut, 'sec_url', server.url + "/api/xbrl/companyconcept/CIK{0}/us-gaap/{1}.json"),
+                (ut, 'company_facts_url', server.url + "/api/xbrl/companyfacts/CIK{0}.json"),
+                (ut, 'submissions_url', server.url + "/submissions/CIK{0}.json"),
+                (ut, 'frames_url', server.url + "/api/xbrl/frames/us-gaap/{0}/{1}/{2}.json"),
+                (ut, 'response_cache', None), (ut, 'tag_index', None), (ut, 'rate_limiter', TokenBucket(10 ** 9))]
+    originals = [(owner, name, getattr(owner, name)) for owner, name, _ in settings]
+    for owner, name, value in settings:
+        setattr(owner, name, value)
+    try:
+        yield
+    finally:
+        for owner, name, value in originals:
+            setattr(owner, name, value)
+
+
+"Replaces the stages in utils with timed versions, yielding the {stage: [seconds, calls]} they add up to"
+@contextlib.contextmanager
+def timed_stages():
+    totals = {stage: [0.0, 0] for stage in STAGES}
+    originals = {stage: getattr(ut, stage) for stage in STAGES}
+
+    def timed(stage, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                totals[stage][0] += time.perf_counter() - start
+                totals[stage][1] += 1
+        return wrapper
+
+    for stage, function in originals.items():
+        setattr(ut, stage, timed(stage, function))
+    try:
+        yield totals
+    finally:
+        for stage, function in originals.items():
+            setattr(ut, stage, function)
+
+
+"Best time of the repetitions, which is the least disturbed by whatever else runs on the machine"
+def _time(function, repetitions):
+    return min(timeit.repeat(function, number=1, repeat=repetitions))
+
+
+"""Time of a fixed workload, independent of the library, measuring how fast the machine is. Dividing by it keeps
+    results taken on different (or differently loaded) machines comparable"""
+def calibration_seconds(repetitions):
+    return _time(lambda: sorted(str(i) for i in range(100_000)), repetitions)
+
+
+def run(repetitions=5, recorded=None):
+    filers = recorded_filers(recorded) if recorded is not None else \
+        {profile: generated_filer(profile, i + 1) for i, profile in enumerate(PROFILES)}
+    results = {}
+    with StandInServer(stand_in_payloads(filers)) as server, pointed_at(server):
+        # Nothing is cached, so every call requests and cleans all of its data
+        fin_data = FinData(directory=CompanyDirectory(None), series_cache=SeriesCache(max_bytes=0))
+        fin_data.directory.tickers()  # The directory is only downloaded once, outside of the timings
+        for name, filer in filers.items():
+            ticker = filer["ticker"]
+            methods = {method: _time(lambda: call(fin_data, ticker), repetitions) for method, call in METHODS.items()}
+            # Stages of a run of every method, the best of the repetitions like the methods
+            stages = {}
+            for _ in range(repetitions):
+                with timed_stages() as totals:
+                    for call in METHODS.values():
+                        call(fin_data, ticker)
+                for stage, (seconds, calls) in totals.items():
+                    if stage not in stages or seconds < stages[stage]["seconds"]:
+                        stages[stage] = {"seconds": seconds, "calls": calls}
+            facts = sum(len(facts) for path, payload in filer["payloads"].items() if "companyconcept" in path
+                        for facts in payload["units"].values())
+            results[name] = {"ticker": ticker, "concept_facts": facts, "methods": methods, "stages": stages}
+        get_many_seconds = _time(lambda: fin_data.get_many([filer["ticker"] for filer in filers.values()], 'revenue'),
+                                 repetitions)
+        # Every derived metric of every filer, including fetching the base series they are computed from
+        get_derived_seconds = _time(lambda: fin_data.get_derived([filer["ticker"] for filer in filers.values()],
+                                                                 list(DERIVED_METRICS)), repetitions)
+        # A cross section of every filer, for a fourth quarter so it is derived out of the other quarters' frames
+        get_cross_section_seconds = _time(lambda: fin_data.get_cross_section('revenue', 2015, 4, mute_warnings=True),
+                                          repetitions)
+    return {"library_version": historicalFinancialData.__version__, "python": platform.python_version(),
+            "numpy": np.__version__, "repetitions": repetitions, "fixtures": recorded or "generated",
+            "calibration_seconds": calibration_seconds(repetitions), "filers": results,
+            "get_many_seconds": get_many_seconds, "get_derived_seconds": get_derived_seconds,
+            "get_cross_section_seconds": get_cross_section_seconds}
+
+
+"""Returns the methods (and stages) of every filer that are slower than in the baseline results by the threshold or
+    more, once both are scaled by how fast the machine was (their calibration)"""
+def regressions(results, baseline, threshold=REGRESSION_THRESHOLD):
+    machine_ratio = results["calibration_seconds"] / baseline["calibration_seconds"]
+    slower = []
+    for name, filer in results["filers"].items():
+        earlier = baseline["filers"].get(name)
+        if earlier is None:
+            continue
+        timings = [(method, seconds, earlier["methods"].get(method)) for method, seconds in filer["methods"].items()]
+        timings += [(stage, timing["seconds"], earlier["stages"].get(stage, {}).get("seconds"))
+                    for stage, timing in filer["stages"].items()]
+        for timed, seconds, earlier_seconds in timings:
+            if earlier_seconds and seconds / earlier_seconds / machine_ratio >= threshold:
+                slower.append({"filer": name, "timed": timed, "seconds": seconds, "baseline_seconds": earlier_seconds,
+                               "ratio": seconds / earlier_seconds / machine_ratio})
+    return slower
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Times FinData against a local stand-in for the SEC API")
+    parser.add_argument("--repetitions", type=int, default=5, help="Times every method is run, the best one counts")
+    parser.add_argument("--recorded", help="Directory of filers recorded by record_fixtures.py, instead of fixtures")
+    parser.add_argument("--output", help="File the results are written to instead of being printed")
+    parser.add_argument("--baseline", help="Results of an earlier version, the regressions from it are reported")
+    args = parser.parse_args(args)
+    results = run(args.repetitions, args.recorded)
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            results["regressions"] = regressions(results, json.load(f))
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    # A non-zero exit status lets CI fail on regressions
+    return 1 if results.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
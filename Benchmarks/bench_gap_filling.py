@@ -0,0 +1,63 @@
+import sys
+import json
+import timeit
+import datetime
+import numpy as np
+import historicalFinancialData.utils as ut
+from historicalFinancialData.parser import decode_facts
+
+"""
+bench_gap_filling.py - Times filling missing time periods from a payload's facts as the number of facts and missing
+                       periods grow, comparing the time period index with the reference it replaced (testing every fact
+                       against, and rebuilding on every match, an (n, 2) array of periods). Prints the results as json
+
+                       Usage: python Benchmarks/bench_gap_filling.py [repetitions]
+"""
+
+
+"The gap filling the time period index replaced, kept as the reference it is benchmarked against"
+def _reference_gap_filling(candidates, time_periods):
+    missing_data = []
+    for value, start_date, end_date in candidates:
+        if np.array([start_date, end_date]) in time_periods:
+            missing_data.append([str(end_date.year) + "Q4", value, start_date, end_date])
+            if len(time_periods[time_periods != np.array([start_date, end_date])]) % 2:
+                time_periods = np.vstack([time_periods, np.array([start_date, end_date + ut.ONE_DAY_DATETIME])])
+            time_periods = np.sort(time_periods[time_periods != np.array([start_date, end_date])]).reshape(-1, 2)
+    return missing_data, time_periods
+
+
+"""Facts of every quarter over the given number of years, each reported several times, and every fourth quarter
+    (which filers only report through their yearly data) missing"""
+def _payload(years, repetitions=4):
+    facts, time_periods = [], []
+    start = datetime.datetime(2000, 1, 1)
+    for i in range(years * 4):
+        end = (start + datetime.timedelta(days=95)).replace(day=1) - datetime.timedelta(days=1)
+        if i % 4 == 3:
+            time_periods.append([start, end])
+        facts += [{"start": start.date().isoformat(), "end": end.date().isoformat(), "val": i, "fy": start.year,
+                   "fp": "Q" + str(i % 4 + 1), "form": "10-K" if i % 4 == 3 else "10-Q"}] * repetitions
+        start = end + datetime.timedelta(days=1)
+    return facts, np.array(time_periods, dtype=object)
+
+
+def run(repetitions=5):
+    results = []
+    for years in (10, 40, 160):
+        facts, time_periods = _payload(years)
+        decoded = decode_facts(facts)
+        candidates, start_dates, end_dates = ut.get_time_period_candidates(decoded, {})
+        reference = list(zip(decoded.val[candidates], start_dates, end_dates))
+        reference_seconds = min(timeit.repeat(lambda: _reference_gap_filling(reference, time_periods.copy()),
+                                              number=1, repeat=repetitions))
+        index_seconds = min(timeit.repeat(lambda: ut.get_quarterly_data_from_time_periods(decoded, time_periods, {}),
+                                          number=1, repeat=repetitions))
+        results.append({"facts": len(facts), "missing_time_periods": len(time_periods),
+                        "reference_seconds": reference_seconds, "index_seconds": index_seconds,
+                        "speedup": reference_seconds / index_seconds})
+    return {"repetitions": repetitions, "sizes": results}
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(*[int(arg) for arg in sys.argv[1:2]]), indent=2))
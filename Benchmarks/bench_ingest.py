@@ -0,0 +1,61 @@
+import os
+import sys
+import json
+import time
+import zipfile
+import argparse
+import tempfile
+from historicalFinancialData.store import ColumnarStore, ingest_company_facts_archive
+from fixtures import PROFILES, filer_payloads
+
+"""
+bench_ingest.py - Times ingesting a bulk companyfacts.zip archive into a ColumnarStore with increasing numbers of
+                  worker processes, to check the cleaning scales with the cores. The archive is made of the fixtures'
+                  filers, cycling through their sizes. Prints the results as json, with each number of workers' speedup
+                  over a single one (which can't exceed the number of CPUs the machine has)
+
+                  Usage: python Benchmarks/bench_ingest.py [--companies 200] [--workers 1 2 4 8]
+"""
+
+
+"Writes an archive of the given number of companies, laid out like the SEC's companyfacts.zip"
+def write_archive(path, companies):
+    profiles = list(PROFILES)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for cik in range(1, companies + 1):
+            payloads = filer_payloads(profiles[cik % len(profiles)], cik)
+            facts = {tag: {"label": payload["label"], "description": payload["description"],
+                           "units": payload["units"]} for tag, payload in payloads.items()}
+            archive.writestr("CIK" + str(cik).zfill(10) + ".json", json.dumps(
+                {"cik": cik, "entityName": "Fixture Company " + str(cik), "facts": {"us-gaap": facts}}))
+
+
+def run(companies=200, workers=(1, 2, 4, 8)):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        archive_path = os.path.join(directory, "companyfacts.zip")
+        write_archive(archive_path, companies)
+        for worker_count in workers:
+            store = ColumnarStore(os.path.join(directory, "store" + str(worker_count)))
+            start = time.perf_counter()
+            ingested, failures = ingest_company_facts_archive(archive_path, store, workers=worker_count)
+            seconds = time.perf_counter() - start
+            results[worker_count] = {"seconds": seconds, "companies_per_second": ingested / seconds,
+                                     "failures": len(failures)}
+    for worker_count in workers:
+        results[worker_count]["speedup"] = results[workers[0]]["seconds"] / results[worker_count]["seconds"]
+    return {"companies": companies, "cpus": os.cpu_count(), "workers": results}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Times ingesting a companyfacts archive with more and more processes")
+    parser.add_argument("--companies", type=int, default=200, help="Number of companies in the archive")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8],
+                        help="Numbers of worker processes to time, the first one is the speedups' reference")
+    args = parser.parse_args(args)
+    print(json.dumps(run(args.companies, args.workers), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
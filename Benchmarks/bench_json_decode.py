@@ -0,0 +1,128 @@
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+import historicalFinancialData.utils as ut
+from historicalFinancialData.parser import FactTable
+from historicalFinancialData.streaming import decode_document
+from fixtures import PROFILES, concept_payload, filer_payloads
+
+"""
+bench_json_decode.py - Compares decoding a companyconcept or companyfacts document whole (json.loads, then every fact
+                       list into a FactTable) with decoding it as it is streamed (streaming.py), by decode time and peak
+                       memory. Documents are the fixtures' very large filer's companyconcept payload and a companyfacts
+                       document of as many tags as a large filer reports. Memory is measured in a fresh process per
+                       mode, which reads the document the way get_url_data does: whole, like a response's content, or
+                       in chunks, like a streamed response. Prints the results as json
+
+                       Usage: python Benchmarks/bench_json_decode.py [--repetitions 5] [--tags 400]
+"""
+
+
+"The whole document decoded at once then its fact lists into FactTables, the library's path before streaming"
+def decode_whole(content):
+    document = json.loads(content.decode('utf-8'))
+    units = [document["units"]] if "units" in document else \
+        [concept["units"] for concept in document["facts"]["us-gaap"].values()]
+    for unit in units:
+        for name, facts in unit.items():
+            unit[name] = FactTable(facts)
+    return document
+
+
+"Reads the file the way a response is read: whole, or in chunks when streamed"
+def read_document(path, mode):
+    f = open(path, 'rb')
+    if mode == "whole":
+        with f:
+            return f.read()
+    return iter(lambda: f.read(ut.STREAM_CHUNK_SIZE) or f.close(), None)
+
+
+"Builds the benchmarked documents, a companyfacts one made of the given number of the fixtures' tags"
+def documents(tags):
+    profile = PROFILES["very_large"]
+    concept = max(filer_payloads("very_large", 1).values(),
+                  key=lambda payload: sum(map(len, payload["units"].values())))
+    facts = {}
+    for i in range(tags):
+        payload = concept_payload(1, "Tag" + str(i), profile["years"], profile["fiscal_year_end"],
+                                  instant=i % 3 == 0, refilings=profile["refilings"])
+        facts[payload["tag"]] = {"label": payload["label"], "description": payload["description"],
+                                 "units": payload["units"]}
+    company_facts = {"cik": 1, "entityName": "Fixture Company 1", "facts": {"us-gaap": facts}}
+    return {"companyconcept": concept, "companyfacts": company_facts}
+
+
+"""Peak resident memory of this process in bytes. Linux's ru_maxrss carries the parent's peak over into a process it
+    starts, so the high water mark of /proc is used where there is one"""
+def peak_rss():
+    try:
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:")) * 1024
+    except (OSError, StopIteration):
+        # In kilobytes on Linux, bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+"""Best time of the repetitions of each function, which are run in turns (after a garbage collection) so neither is
+    slowed down by the garbage the other left behind"""
+def best_times(functions, repetitions):
+    times = {name: float("inf") for name in functions}
+    for _ in range(repetitions):
+        for name, function in functions.items():
+            gc.collect()
+            start = time.perf_counter()
+            function()
+            times[name] = min(times[name], time.perf_counter() - start)
+    return times
+
+
+"Measures, in this (fresh) process, the peak memory of decoding the document in the mode"
+def measure_memory(path, mode):
+    rss_before = peak_rss()
+    content = read_document(path, mode)
+    document = decode_whole(content) if mode == "whole" else decode_document(content)
+    return {"peak_rss_bytes": peak_rss(), "peak_rss_increase_bytes": peak_rss() - rss_before}
+
+
+def run(repetitions=5, tags=400):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, document in documents(tags).items():
+            path = os.path.join(directory, name + ".json")
+            with open(path, 'wb') as f:
+                f.write(json.dumps(document, separators=(',', ':')).encode('utf-8'))
+            results[name] = {"bytes": os.path.getsize(path)}
+            times = best_times({"whole": lambda: decode_whole(read_document(path, "whole")),
+                                "streamed": lambda: decode_document(read_document(path, "streamed"))}, repetitions)
+            for mode, seconds in times.items():
+                memory = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure-memory", path, mode],
+                                        capture_output=True, check=True, env=os.environ | {
+                                            "PYTHONPATH": os.pathsep.join(sys.path)}).stdout
+                results[name][mode] = {"decode_seconds": seconds} | json.loads(memory)
+            results[name]["peak_rss_ratio"] = results[name]["streamed"]["peak_rss_increase_bytes"] / \
+                max(1, results[name]["whole"]["peak_rss_increase_bytes"])
+    return {"repetitions": repetitions, "chunk_size": ut.STREAM_CHUNK_SIZE, "documents": results}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Compares whole and streamed decoding of SEC documents")
+    parser.add_argument("--repetitions", type=int, default=5, help="Times every decode is run, the best one counts")
+    parser.add_argument("--tags", type=int, default=400, help="Number of tags in the companyfacts document")
+    parser.add_argument("--measure-memory", nargs=2, metavar=("PATH", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args(args)
+    if args.measure_memory is not None:
+        print(json.dumps(measure_memory(*args.measure_memory)))
+    else:
+        print(json.dumps(run(args.repetitions, args.tags), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import sys
+import json
+import argparse
+import tracemalloc
+import contextvars
+import historicalFinancialData.utils as ut
+from historicalFinancialData.main import FinData
+from historicalFinancialData.cache import SeriesCache
+from historicalFinancialData.columnar import CompactSeries
+from historicalFinancialData.directory import CompanyDirectory
+from historicalFinancialData.exceptions import NotFoundError
+from fixtures import PROFILES, filer_payloads
+
+"""
+bench_memory.py - Measures the memory a screening server keeping the whole SEC universe resident needs: the company
+                  directory and every metric of every company in the series cache. Each is measured (with tracemalloc)
+                  as the library holds it, integer CIKs and compact fixed-width series, and as it used to, zero-padded
+                  CIK strings and object arrays of boxed numbers and datetime objects. Companies cycle through the
+                  fixtures' filer sizes. Prints the results as json
+
+                  Usage: python Benchmarks/bench_memory.py [--companies 10000]
+"""
+
+
+"Builds a company_tickers.json payload of the given number of companies, like the SEC's"
+def tickers_payload(companies):
+    return {str(i): {"cik_str": 1000 + i * 7, "ticker": "T" + format(i, "X"), "title": "Company " + str(i) + " Inc."}
+            for i in range(companies)}
+
+
+"The directory's maps as they used to be, keyed by and holding zero-padded CIK strings"
+def padded_maps(payload):
+    ticker_cik_map, cik_ticker_map, name_cik_map = {}, {}, {}
+    for company in payload.values():
+        company_cik = str(company["cik_str"]).zfill(10)
+        ticker_cik_map[company["ticker"]] = company_cik
+        cik_ticker_map.setdefault(company_cik, company["ticker"])
+        name_cik_map.setdefault(company["title"].casefold(), company_cik)
+    return ticker_cik_map, cik_ticker_map, name_cik_map
+
+
+"Returns the memory (in bytes) the objects built by the function take, by tracing every allocation it makes"
+def traced_bytes(function):
+    tracemalloc.start()
+    try:
+        kept = function()
+        return tracemalloc.get_traced_memory()[0], kept
+    finally:
+        tracemalloc.stop()
+
+
+"Cleans every metric of a filer of every profile once, the series the cache is then filled with"
+def template_series():
+    ut.tag_index = None
+    templates = {}
+    for cik, profile in enumerate(PROFILES, 1):
+        payloads = filer_payloads(profile, cik)
+        padded_cik = str(cik).zfill(10)
+        responses = {ut.sec_url.format(padded_cik, tag): payloads.get(tag, NotFoundError())
+                     for jargon, _, _ in FinData._metrics.values() for tag in jargon}
+        context = contextvars.copy_context()
+        context.run(ut.prefetched_responses.set, responses)
+        templates[profile] = {}
+        for metric, (jargon, title, allow_negatives) in FinData._metrics.items():
+            try:
+                series = context.run(ut.get_data, padded_cik, jargon, title, allow_negatives=allow_negatives)
+            except NotFoundError:
+                continue
+            templates[profile][metric] = CompactSeries(series[1:])
+    return templates
+
+
+"Fills a series cache with every metric of the given number of companies, as object arrays or compact series"
+def fill_series_cache(templates, companies, compact):
+    cache = SeriesCache(max_bytes=float('inf'), ttl=float('inf'))
+    profiles = list(templates.values())
+    for cik in range(companies):
+        for metric, template in profiles[cik % len(profiles)].items():
+            # Rebuilt rows are new objects, as every series cleaned by get_data is
+            series = template.rows()
+            cache.put((str(cik).zfill(10), metric), CompactSeries(series) if compact else series)
+    return cache
+
+
+def run(companies=10000):
+    payload = tickers_payload(companies)
+    padded_bytes, _ = traced_bytes(lambda: padded_maps(payload))
+    directory_bytes, _ = traced_bytes(lambda: CompanyDirectory(path=None, tickers=payload))
+    templates = template_series()
+    object_bytes, _ = traced_bytes(lambda: fill_series_cache(templates, companies, False))
+    compact_bytes, compact_cache = traced_bytes(lambda: fill_series_cache(templates, companies, True))
+    series = compact_cache.stats()["series"]
+    return {"companies": companies, "series": series,
+            "directory": {"padded_cik_strings_bytes": padded_bytes, "integer_ciks_bytes": directory_bytes,
+                          "reduction": padded_bytes / directory_bytes},
+            "series_cache": {"object_arrays_bytes": object_bytes, "compact_bytes": compact_bytes,
+                             "object_arrays_bytes_per_series": object_bytes / series,
+                             "compact_bytes_per_series": compact_bytes / series,
+                             "reported_bytes": compact_cache.stats()["bytes"],
+                             "reduction": object_bytes / compact_bytes}}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Measures the memory of the directory and series cache of the whole "
+                                                 "SEC universe")
+    parser.add_argument("--companies", type=int, default=10000,
+                        help="Number of companies, the SEC's directory lists about ten thousand")
+    args = parser.parse_args(args)
+    print(json.dumps(run(args.companies), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
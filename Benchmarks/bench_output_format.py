@@ -0,0 +1,55 @@
+import sys
+import json
+import time
+import datetime
+import numpy as np
+from historicalFinancialData.columnar import to_columns, to_structured
+
+"""
+bench_output_format.py - Compares the memory use of the library's labeled object arrays with the typed 'structured' and
+                         'columns' outputs, as well as the cost of converting between them. Prints the results as json
+
+                         Usage: python Benchmarks/bench_output_format.py [number of quarters] [number of companies]
+"""
+
+
+def labeled_array(quarters):
+    """Builds a labeled array, as returned by get_revenue, of the given number of quarters"""
+    rows = [np.array(['Time-Period', 'Revenue', 'Start of Quarter', 'End of Quarter'], dtype=object)]
+    start = datetime.datetime(2009, 1, 1)
+    for i in range(quarters):
+        end = start + datetime.timedelta(days=89)
+        rows.append(np.array([str(2009 + i // 4) + "Q" + str(i % 4 + 1), 50_000_000_000 + i * 1_000_003, start, end],
+                             dtype=object))
+        start = end + datetime.timedelta(days=1)
+    return np.vstack(rows)
+
+
+def object_array_bytes(data):
+    """Memory of an object array including every (distinct) object it points to"""
+    seen = set()
+    total = data.nbytes
+    for item in data.flat:
+        if id(item) not in seen and item is not None:
+            seen.add(id(item))
+            total += sys.getsizeof(item)
+    return total
+
+
+def run(quarters=60, companies=1000):
+    data = [labeled_array(quarters) for _ in range(companies)]
+    start = time.perf_counter()
+    columns = [to_columns(company) for company in data]
+    to_columns_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    structured = [to_structured(company) for company in columns]
+    to_structured_seconds = time.perf_counter() - start
+    return {"quarters": quarters, "companies": companies,
+            "array_bytes": sum(object_array_bytes(company) for company in data),
+            "structured_bytes": sum(company.nbytes for company in structured),
+            "columns_bytes": sum(sum(column.nbytes for column in company.values()) for company in columns),
+            "to_columns_seconds": to_columns_seconds, "to_structured_seconds": to_structured_seconds}
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(*[int(arg) for arg in sys.argv[1:3]]), indent=2))
@@ -0,0 +1,92 @@
+import sys
+import json
+import timeit
+from datetime import datetime as dt
+import numpy as np
+import historicalFinancialData.utils as ut
+from fixtures import PROFILES, profile_payloads
+
+"""
+bench_parser.py - Times the selections get_data makes out of a companyconcept payload (yearly data, explicit quarters,
+                  quarters marked by frame and the facts that could fill missing time periods), comparing the decoded,
+                  vectorized parser with a per-fact reference (the library's parsing before the parser, which
+                  iterates the facts and parses their dates with datetime.fromisoformat in every selection). Payloads
+                  are the fixtures' filers of every size. Prints the results as json
+
+                  Usage: python Benchmarks/bench_parser.py [repetitions]
+"""
+
+
+"The per-fact selection the parser replaced, kept as the reference it is benchmarked against"
+def _reference_selection(raw_output, min_year, max_year):
+    value_list_name = list(raw_output["units"].keys())[0]
+    facts = raw_output["units"][value_list_name]
+
+    def frontrunning(start, fy, fp):
+        latest_start = {"Q1": 1, "Q2": 4, "Q3": 7, "Q4": 10}
+        return start.year > fy or (start.year == fy and (latest_start[fp] < start.month or
+                                                         (latest_start[fp] == start.month and start.day > 7)))
+
+    def yr_is_valid(item):
+        return item["form"] == "10-K" and "fy" in item and "fp" in item and min_year <= int(item["fy"]) <= max_year \
+            and ("start" not in item or
+                 330 < (dt.fromisoformat(item["end"]) - dt.fromisoformat(item["start"])).days < 380)
+
+    def could_fill_time_period(item):
+        if "start" not in item:
+            return False
+        start, end = dt.fromisoformat(item["start"]), dt.fromisoformat(item["end"])
+        return "fy" in item and "fp" in item and 60 < (end - start).days < 100 and \
+            not frontrunning(start, item["fy"], "Q4")
+
+    def qr_is_valid(item):
+        return "fp" in item and item["form"] in "10-Q/A" and min_year <= int(item["fy"]) <= max_year and \
+            ("start" not in item or (60 < (dt.fromisoformat(item["end"]) - dt.fromisoformat(item["start"])).days < 100
+                                     and not frontrunning(dt.fromisoformat(item["start"]), item["fy"], item["fp"])))
+
+    yearly = {str(item["fy"]): item["val"] for item in facts if yr_is_valid(item)}
+    quarterly = np.array([[str(item["fy"]) + item["fp"], item["val"], (dt.fromisoformat(item["start"]) if "start" in
+                          item else None), dt.fromisoformat(item["end"])] for item in facts if qr_is_valid(item)])
+    frames = np.array([[item["frame"][2:8], item["val"], (dt.fromisoformat(item["start"]) if "start" in item else None),
+                        dt.fromisoformat(item["end"])] for item in facts if "frame" in item and "Q" in item["frame"]
+                       and min_year <= int(item["frame"][2:6]) <= max_year])
+    candidates = [item for item in facts if could_fill_time_period(item)]
+    return yearly, quarterly, frames, candidates
+
+
+"The same selections through the parser, including decoding the payload"
+def _parser_selection(raw_output, min_year, max_year):
+    value_list_name = list(raw_output["units"].keys())[0]
+    facts = ut.decode_facts(raw_output["units"][value_list_name])
+    yearly_mask = ut.yr_is_valid(facts, min_year, max_year)
+    yearly = dict(zip(map(str, facts.fy[yearly_mask].tolist()), facts.val[yearly_mask]))
+    return yearly, ut.get_explicit_quarter_data(facts, min_year, max_year), \
+        ut.get_frame_quarter_data(facts, min_year, max_year, {}), ut.get_time_period_candidates(facts, {})
+
+
+"Best time of the repetitions, which is the least disturbed by whatever else runs on the machine"
+def _time(function, repetitions):
+    return min(timeit.repeat(function, number=1, repeat=repetitions))
+
+
+def run(repetitions=20):
+    results = {}
+    for profile in PROFILES:
+        payloads = list(profile_payloads(profile, 320193).values())
+        reference_seconds = _time(lambda: [_reference_selection(payload, 0, 3000) for payload in payloads], repetitions)
+        parser_seconds = _time(lambda: [_parser_selection(payload, 0, 3000) for payload in payloads], repetitions)
+        # The whole of get_data, which also fills and cleans the selected data
+        company_facts = {"facts": {"us-gaap": profile_payloads(profile, 320193)}}
+        tags = PROFILES[profile]["tags"]
+        get_data_seconds = _time(lambda: ut.get_data("0000320193", tags, "Revenue", company_facts=company_facts),
+                                 repetitions)
+        results[profile] = {"facts": sum(len(list(payload["units"].values())[0]) for payload in payloads),
+                            "reference_selection_seconds": reference_seconds,
+                            "parser_selection_seconds": parser_seconds,
+                            "speedup": reference_seconds / parser_seconds,
+                            "get_data_seconds": get_data_seconds}
+    return {"repetitions": repetitions, "profiles": results}
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(*[int(arg) for arg in sys.argv[1:2]]), indent=2))
@@ -0,0 +1,136 @@
+import zlib
+import random
+import datetime
+
+"""
+fixtures.py - Generates companyconcept payloads shaped like the SEC's, including their noise: comparative prior period
+              facts re-reported (with the filing's fy/fp) in every 10-Q and 10-K, year-to-date durations, Q4 only
+              reported through the yearly 10-K value, amendments, instants for balance sheet tags and frames only on
+              some facts. Payloads are deterministic for a given seed so benchmarks are comparable across versions
+"""
+
+# Filers of increasing size, by number of fiscal years reported and how many tags they use
+PROFILES = {"small": {"years": 4, "fiscal_year_end": 12, "tags": ["Revenues"]},
+            "medium": {"years": 9, "fiscal_year_end": 6, "tags": ["SalesRevenueNet",
+                                                                   "RevenueFromContractWithCustomerExcludingAssessedTax"]},
+            "large": {"years": 15, "fiscal_year_end": 9, "tags": ["SalesRevenueNet", "Revenues",
+                                                                  "RevenueFromContractWithCustomerExcludingAssessedTax"]},
+            "very_large": {"years": 15, "fiscal_year_end": 1, "tags": ["Revenues", "SalesRevenueNet",
+                                                                       "RevenueFromContractWithCustomerExcludingAssessedTax"],
+                           "refilings": 6}}
+
+
+def _add_months(date, months):
+    month = date.month - 1 + months
+    year, month = date.year + month // 12, month % 12 + 1
+    return datetime.date(year, month, 1)
+
+
+def _fiscal_quarters(first_fiscal_year, years, fiscal_year_end):
+    """Returns (fy, quarter, start, end) of every quarter, fiscal years ending at the end of fiscal_year_end"""
+    quarters = []
+    for fy in range(first_fiscal_year, first_fiscal_year + years):
+        year_start = _add_months(datetime.date(fy, fiscal_year_end, 1), -11)
+        for quarter in range(4):
+            start = _add_months(year_start, 3 * quarter)
+            end = _add_months(start, 3) - datetime.timedelta(days=1)
+            quarters.append((fy, quarter + 1, start, end))
+    return quarters
+
+
+def concept_payload(cik, tag, years, fiscal_year_end=12, first_fiscal_year=2009, instant=False, refilings=0, seed=0):
+    """Builds a companyconcept payload with every 10-Q and 10-K a filer would have made over the given years"""
+    rng = random.Random(zlib.crc32((str(cik) + tag + str(seed)).encode('utf-8')))
+    quarters = _fiscal_quarters(first_fiscal_year, years, fiscal_year_end)
+    values = {(fy, q): rng.randint(5_000, 90_000) * 1_000_000 for fy, q, _, _ in quarters}
+    facts = []
+
+    def fact(start, end, value, fy, fp, form, filed, accn, frame=None):
+        item = {"end": end.isoformat(), "val": value, "accn": accn, "fy": fy, "fp": fp, "form": form,
+                "filed": filed.isoformat()}
+        if not instant:
+            item = {"start": start.isoformat()} | item
+        if frame is not None:
+            item["frame"] = frame
+        facts.append(item)
+
+    for i, (fy, q, start, end) in enumerate(quarters):
+        filed = end + datetime.timedelta(days=rng.randint(25, 45) if q < 4 else rng.randint(50, 70))
+        accn = str(cik).zfill(10) + "-" + str(filed.year)[2:] + "-" + str(rng.randint(0, 999999)).zfill(6)
+        calendar_frame = "CY" + str(end.year if end.month > 1 else end.year - 1) + "Q" + str((end.month - 2) % 12 // 3 + 1)
+        # Prior year comparatives are filed again with the current filing's fy and fp
+        reported = [(fy, q, start, end)] + ([quarters[i - 4]] if i >= 4 else [])
+        if q < 4:
+            form = "10-Q"
+            for rep_fy, rep_q, rep_start, rep_end in reported:
+                frame = calendar_frame if rep_fy == fy else None
+                fact(rep_start, rep_end, values[(rep_fy, rep_q)], fy, "Q" + str(q), form, filed, accn,
+                     frame + ("I" if instant else "") if frame else None)
+                if q > 1 and not instant:
+                    # Year-to-date durations, which the library has to ignore
+                    ytd_start = quarters[i - q + 1 - (4 if rep_fy != fy else 0)][2]
+                    fact(ytd_start, rep_end, sum(values[(rep_fy, k)] for k in range(1, rep_q + 1)), fy,
+                         "Q" + str(q), form, filed, accn)
+            if rng.random() < 0.05:
+                # Occasional amendments restating the quarter
+                values[(fy, q)] += rng.randint(-5, 5) * 1_000_000
+                fact(start, end, values[(fy, q)], fy, "Q" + str(q), "10-Q/A", filed + datetime.timedelta(days=30),
+                     accn[:-1] + "9")
+        else:
+            form = "10-K"
+            year_start = quarters[i - 3][2]
+            for back in range(3 if i >= 8 else 1 + i // 4):
+                rep_fy = fy - back
+                rep_start = _add_months(year_start, -12 * back)
+                rep_end = _add_months(end + datetime.timedelta(days=1), -12 * back) - datetime.timedelta(days=1)
+                if instant:
+                    fact(rep_end, rep_end, values[(rep_fy, 4)], fy, "FY", form, filed, accn,
+                         calendar_frame + "I" if back == 0 else None)
+                else:
+                    fact(rep_start, rep_end, sum(values[(rep_fy, k)] for k in range(1, 5)), fy, "FY", form, filed,
+                         accn, "CY" + str(rep_end.year) if back == 0 else None)
+            if not instant and rng.random() < 0.3:
+                # Some filers also tag the fourth quarter by itself in the 10-K
+                fact(start, end, values[(fy, q)], fy, "FY", form, filed, accn, calendar_frame)
+        if rng.random() < 0.03:
+            fact(start, end, values[(fy, q)], fy, "Q" + str(min(q, 3)), "8-K", filed, accn[:-1] + "8")
+    # Large filers re-report their history in registration statements and current reports, which the library ignores
+    for item in list(facts):
+        for k in range(refilings):
+            facts.append(item | {"form": ["8-K", "S-4", "424B3"][k % 3], "accn": item["accn"][:-2] + str(k).zfill(2)})
+    facts.sort(key=lambda item: (item["end"], item["filed"]))
+    unit = "USD/shares" if tag.startswith("EarningsPerShare") else "USD"
+    return {"cik": cik, "taxonomy": "us-gaap", "tag": tag, "label": tag, "description": tag,
+            "entityName": "Fixture Company " + str(cik), "units": {unit: facts}}
+
+
+def profile_payloads(profile, cik, seed=0):
+    """Returns {tag: payload} of a filer of the given size (one of PROFILES)"""
+    settings = PROFILES[profile]
+    tags = settings["tags"]
+    payloads = {}
+    for i, tag in enumerate(tags):
+        # Filers switch tags over time (i.e. to RevenueFromContractWithCustomer... in 2018), each covers some years
+        years = settings["years"] if len(tags) == 1 else max(2, settings["years"] // len(tags) + 1)
+        first_year = 2009 + i * (settings["years"] // len(tags))
+        payloads[tag] = concept_payload(cik, tag, years, settings["fiscal_year_end"], first_year,
+                                        refilings=settings.get("refilings", 0), seed=seed)
+    payloads["Assets"] = concept_payload(cik, "Assets", settings["years"], settings["fiscal_year_end"], instant=True,
+                                         seed=seed)
+    return payloads
+
+
+# Tags every filer also reports, besides its profile's revenue tags and Assets, so each of the library's metrics has
+# data. Whether they are instants (balance sheet tags) or durations
+OTHER_TAGS = {"CostOfRevenue": False, "GrossProfit": False, "OperatingIncomeLoss": False, "NetIncomeLoss": False,
+              "EarningsPerShareBasic": False, "EarningsPerShareDiluted": False, "Liabilities": True}
+
+
+def filer_payloads(profile, cik, seed=0):
+    """Returns {tag: payload} of a filer of the given size (one of PROFILES) reporting a tag for every metric"""
+    settings = PROFILES[profile]
+    payloads = profile_payloads(profile, cik, seed)
+    for tag, instant in OTHER_TAGS.items():
+        payloads[tag] = concept_payload(cik, tag, settings["years"], settings["fiscal_year_end"], instant=instant,
+                                        refilings=settings.get("refilings", 0), seed=seed)
+    return payloads
@@ -0,0 +1,62 @@
+import os
+import sys
+import json
+import gzip
+import argparse
+from urllib.parse import urlparse
+import historicalFinancialData.utils as ut
+from historicalFinancialData.main import FinData
+from historicalFinancialData.directory import CompanyDirectory
+from historicalFinancialData.exceptions import *
+
+"""
+record_fixtures.py - Records, from the SEC, every payload the library requests for the given tickers: the companyconcept
+                     document of every tag of every metric the company reports, its companyfacts and its submissions.
+                     Each filer is written to a gzipped json file bench_fin_data.py serves through its stand-in, so
+                     benchmarks run against real filers without network access and stay comparable across versions
+
+                     Usage: python Benchmarks/record_fixtures.py AAPL MSFT ... [--output Benchmarks/recorded]
+"""
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded")
+
+
+"Records the payload of the url under the path the stand-in serves it by, returning it or None if the SEC has none"
+def _record(url, payloads):
+    try:
+        payloads[urlparse(url).path] = ut.get_url_data(url)
+    except NotFoundError:
+        return None  # The stand-in answers paths it has no payload for with a 404, like the SEC
+    return payloads[urlparse(url).path]
+
+
+"Records the payloads of a single filer, returning it in the format bench_fin_data.py loads"
+def record_filer(directory, ticker):
+    cik = directory.cik(ticker)
+    payloads = {}
+    tags = dict.fromkeys(tag for jargon_terms, _, _ in FinData._metrics.values() for tag in jargon_terms)
+    for tag in tags:
+        _record(ut.sec_url.format(cik, tag), payloads)
+    company_facts = _record(ut.company_facts_url.format(cik), payloads)
+    _record(ut.submissions_url.format(cik), payloads)
+    title = company_facts["entityName"] if company_facts is not None else ticker
+    return {"ticker": ticker, "cik": int(cik), "title": title, "payloads": payloads}
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Records the SEC's payloads of filers for the benchmarks")
+    parser.add_argument("tickers", nargs="+", help="Tickers of the filers, ideally from small to very large ones")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Directory the filers are written to")
+    args = parser.parse_args(args)
+    os.makedirs(args.output, exist_ok=True)
+    directory = CompanyDirectory(None)
+    for ticker in args.tickers:
+        filer = record_filer(directory, ticker)
+        with gzip.open(os.path.join(args.output, ticker + ".json.gz"), 'wb') as f:
+            f.write(json.dumps(filer).encode('utf-8'))
+        print("Recorded " + str(len(filer["payloads"])) + " payloads of " + ticker, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import json
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from historicalFinancialData.cache import SeriesCache
+
+"""
+stand_in_server.py - A local stand-in for the SEC API so the library can be tested without network access. It serves
+                     json payloads by request path, supports ETag revalidation and records every request it receives
+"""
+
+
+class _Server(ThreadingHTTPServer):
+    # Concurrent clients (i.e. AsyncFinData) open many connections at once, more than the default backlog of 5
+    request_queue_size = 64
+
+
+class StandInServer:
+    def __init__(self, payloads=None, keep_alive=False):
+        # Maps a request path, i.e. /api/xbrl/companyconcept/CIK0000000001/us-gaap/Revenues.json, to a json payload
+        self.payloads = {} if payloads is None else payloads
+        self.requests = []
+        # Maps a request path to the number of times it should still fail with a 503 before being served
+        self.failures = {}
+        self.not_modified = 0
+        # Seconds every response is delayed by, like the SEC's latency
+        self.delay = 0
+        # Connections clients opened, each kept open for their next requests if keep_alive, as the SEC does
+        self.connections = 0
+        self.keep_alive = keep_alive
+        self._server = _Server(('127.0.0.1', 0), self._handler_class())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def _handler_class(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" if stand_in.keep_alive else "HTTP/1.0"
+
+            def setup(self):
+                stand_in.connections += 1
+                super().setup()
+
+            def _send_status(self, status, body=b""):
+                self.send_response(status)
+                if status == 503:
+                    self.send_header('Retry-After', '0')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                stand_in.requests.append(self.path)
+                time.sleep(stand_in.delay)
+                if stand_in.failures.get(self.path, 0) > 0:
+                    stand_in.failures[self.path] -= 1
+                    self._send_status(503, b"Service Unavailable")
+                    return
+                if self.path not in stand_in.payloads:
+                    # The SEC answers missing tags with a short error document
+                    self._send_status(404, b"<Error><Code>NoSuchKey</Code></Error>")
+                    return
+                body = json.dumps(stand_in.payloads[self.path]).encode('utf-8')
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    stand_in.not_modified += 1
+                    self._send_status(304)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:" + str(self._server.server_address[1])
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class ExpiringSeriesCache(SeriesCache):
+    """SeriesCache whose entries expire right after they were first looked up, by get or a membership test, as if they
+    reached their TTL (or were evicted) between two lookups made by the same call"""
+
+    def _expire(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def get(self, key):
+        series = super().get(key)
+        self._expire(key)
+        return series
+
+    def __contains__(self, key):
+        cached = super().__contains__(key)
+        self._expire(key)
+        return cached
+
+
+def synthetic_concept_payload(cik, tag, first_year, last_year, base_value=1000, unit="USD"):
+    """Builds a companyconcept payload shaped like the SEC's for a calendar fiscal year filer. Q4 is only reported
+    through the 10-K (yearly value) so the library has to fill it in, as it does for real filers"""
+    facts = []
+    quarter_bounds = [("01-01", "03-31"), ("04-01", "06-30"), ("07-01", "09-30"), ("10-01", "12-31")]
+    for year in range(first_year, last_year + 1):
+        yearly_value = 0
+        for quarter, (start, end) in enumerate(quarter_bounds, 1):
+            value = base_value + (year - first_year) * 40 + quarter * 10
+            yearly_value += value
+            if quarter == 4:
+                continue
+            facts.append({"start": str(year) + "-" + start, "end": str(year) + "-" + end, "val": value,
+                          "accn": "0000000000-" + str(year)[2:] + "-00000" + str(quarter), "fy": year,
+                          "fp": "Q" + str(quarter), "form": "10-Q", "filed": str(year) + "-" + end[:2] + "-28",
+                          "frame": "CY" + str(year) + "Q" + str(quarter)})
+        facts.append({"start": str(year) + "-01-01", "end": str(year) + "-12-31", "val": yearly_value,
+                      "accn": "0000000000-" + str(year + 1)[2:] + "-000004", "fy": year, "fp": "FY", "form": "10-K",
+                      "filed": str(year + 1) + "-02-15", "frame": "CY" + str(year)})
+    return {"cik": cik, "taxonomy": "us-gaap", "tag": tag, "label": tag, "description": tag,
+            "entityName": "Synthetic Company " + str(cik), "units": {unit: facts}}
+
+
+def synthetic_sec_payloads(companies, first_year=2015, last_year=2020):
+    """Builds the payloads of the SEC endpoints the library uses for the given {ticker: (cik, [tags])} companies"""
+    payloads = {"/files/company_tickers.json": {}}
+    for i, (ticker, (cik, tags)) in enumerate(companies.items()):
+        padded_cik = str(cik).zfill(10)
+        payloads["/files/company_tickers.json"][str(i)] = {"cik_str": cik, "ticker": ticker,
+                                                           "title": "Synthetic Company " + str(cik)}
+        facts = {}
+        for j, tag in enumerate(tags):
+            concept = synthetic_concept_payload(cik, tag, first_year, last_year, base_value=1000 * (j + 1))
+            payloads["/api/xbrl/companyconcept/CIK" + padded_cik + "/us-gaap/" + tag + ".json"] = concept
+            facts[tag] = {"label": tag, "description": tag, "units": concept["units"]}
+        payloads["/api/xbrl/companyfacts/CIK" + padded_cik + ".json"] = \
+            {"cik": cik, "entityName": "Synthetic Company " + str(cik), "facts": {"us-gaap": facts}}
+        payloads["/submissions/CIK" + padded_cik + ".json"] = synthetic_submissions_payload(cik, facts)
+    payloads.update(synthetic_frame_payloads(payloads))
+    return payloads
+
+
+def synthetic_submissions_payload(cik, facts):
+    """Builds a submissions payload shaped like the SEC's, listing the filings the companyfacts facts come from"""
+    filings = sorted({(fact["filed"], fact["accn"], fact["form"]) for concept in facts.values()
+                      for unit_facts in concept["units"].values() for fact in unit_facts}, reverse=True)
+    return {"cik": str(cik), "name": "Synthetic Company " + str(cik),
+            "filings": {"recent": {"filingDate": [filed for filed, _, _ in filings],
+                                   "accessionNumber": [accn for _, accn, _ in filings],
+                                   "form": [form for _, _, form in filings]}, "files": []}}
+
+
+def synthetic_frame_payloads(payloads):
+    """Builds the frames payloads of the companyconcept payloads' facts that have a frame, like the SEC's: one per tag,
+    unit and calendar period listing the value of every filer that reported it"""
+    frames = {}
+    for path, payload in payloads.items():
+        if "/companyconcept/" not in path:
+            continue
+        for unit, facts in payload["units"].items():
+            for fact in facts:
+                if "frame" not in fact:
+                    continue
+                frame_path = "/api/xbrl/frames/us-gaap/" + payload["tag"] + "/" + unit + "/" + fact["frame"] + ".json"
+                frame = frames.setdefault(frame_path, {"taxonomy": "us-gaap", "tag": payload["tag"],
+                                                       "ccp": fact["frame"], "uom": unit, "label": payload["label"],
+                                                       "data": []})
+                frame["data"].append({"accn": fact["accn"], "cik": payload["cik"], "entityName": payload["entityName"],
+                                      "loc": "US-NY", "end": fact["end"], "val": fact["val"]} |
+                                     ({"start": fact["start"]} if "start" in fact else {}))
+    for frame in frames.values():
+        frame["pts"] = len(frame["data"])
+    return frames
+
+
+def point_library_at(test_case, server):
+    """Points every SEC url the library uses at the stand-in server for the duration of the test"""
+    import historicalFinancialData.utils as ut
+    from historicalFinancialData.main import FinData
+    from historicalFinancialData.directory import CompanyDirectory
+    from historicalFinancialData.cache import SeriesCache
+    from historicalFinancialData.tags import TagIndex
+    urls = [(CompanyDirectory, 'url', "/files/company_tickers.json"),
+            (ut, 'sec_url', "/api/xbrl/companyconcept/CIK{0}/us-gaap/{1}.json"),
+            (ut, 'company_facts_url', "/api/xbrl/companyfacts/CIK{0}.json"),
+            (ut, 'submissions_url', "/submissions/CIK{0}.json"),
+            (ut, 'frames_url', "/api/xbrl/frames/us-gaap/{0}/{1}/{2}.json")]
+    for owner, name, path in urls:
+        test_case.addCleanup(setattr, owner, name, getattr(owner, name))
+        setattr(owner, name, server.url + path)
+    # Keep the stand-in's companies out of the directory persisted on the machine
+    test_case.addCleanup(setattr, FinData, '_default_directory', FinData._default_directory)
+    FinData._default_directory = CompanyDirectory(None)
+    # Nor should series cached by other tests be served instead of the stand-in's
+    test_case.addCleanup(setattr, FinData, '_default_series_cache', FinData._default_series_cache)
+    FinData._default_series_cache = SeriesCache()
+    # And what other tests learned about tags must neither be used nor persisted on the machine
+    test_case.addCleanup(setattr, ut, 'tag_index', ut.tag_index)
+    ut.tag_index = TagIndex(None)
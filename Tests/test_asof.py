@@ -0,0 +1,65 @@
+import tempfile
+from unittest import TestCase
+import numpy as np
+from historicalFinancialData.main import FinData
+from historicalFinancialData.asof import forward_fill
+from stand_in_server import StandInServer, synthetic_sec_payloads, point_library_at
+
+"""
+test_asof.py - Testing script for the as-of (point-in-time) queries, against a local stand-in for the SEC API
+"""
+
+COMPANIES = {"SYN": (1, ["Revenues"])}
+REVENUES_PATH = "/api/xbrl/companyconcept/CIK0000000001/us-gaap/Revenues.json"
+
+
+class TestAsOf(TestCase):
+    def setUp(self):
+        payloads = synthetic_sec_payloads(COMPANIES)
+        # 2015Q2 is restated by an amended 10-Q well after it was first reported
+        payloads[REVENUES_PATH]["units"]["USD"].append(
+            {"start": "2015-04-01", "end": "2015-06-30", "val": 1500, "accn": "0000000000-17-000009", "fy": 2015,
+             "fp": "Q2", "form": "10-Q/A", "filed": "2017-05-01"})
+        self.server = StandInServer(payloads).__enter__()
+        self.addCleanup(self.server.__exit__)
+        point_library_at(self, self.server)
+        self.fin_data_test_subject = FinData()
+
+    def test_forward_fill(self):
+        values = np.array([[np.nan, 1.0], [2.0, np.nan], [np.nan, 3.0]])
+        np.testing.assert_array_equal(forward_fill(values), [[np.nan, 1], [2, 1], [2, 3]])
+
+    def test_quarters_known_on_the_date(self):
+        before_10k = self.fin_data_test_subject.get_revenue('SYN', 2015, 1, 2015, 4, as_of='2016-01-31')
+        self.assertEqual(before_10k[1:, 0].tolist(), ["2015Q1", "2015Q2", "2015Q3"],
+                         "Checking Q4 isn't known before the 10-K it is worked out from was filed")
+        after_10k = self.fin_data_test_subject.get_revenue('SYN', 2015, 1, 2015, 4, as_of='2016-02-15')
+        self.assertEqual(after_10k[4].tolist()[:2], ["2015Q4", 1040])
+        self.assertIsNone(self.fin_data_test_subject.get_revenue('SYN', as_of='2015-01-01', mute_warnings=True),
+                          "Checking nothing is known before the first filing")
+
+    def test_restatements(self):
+        before = self.fin_data_test_subject.get_revenue('SYN', 2015, 2, 2015, 2, as_of=np.datetime64('2017-04-30'))
+        after = self.fin_data_test_subject.get_revenue('SYN', 2015, 2, 2015, 2, as_of='2017-05-01', output='columns')
+        self.assertEqual(before[1][1], 1020, "Checking the value first reported is returned before the restatement")
+        self.assertEqual(after["value"].tolist(), [1500])
+
+    def test_versions_are_indexed_once(self):
+        self.fin_data_test_subject.get_revenue('SYN', as_of='2018-01-01')
+        self.assertEqual(len(self.server.requests), 1 + len(FinData._rev_jargon),
+                         "Checking each tag (and the directory) was requested once")
+        del self.server.requests[:]
+        for date in np.arange(np.datetime64('2016-01-01'), np.datetime64('2020-01-01'), 30):
+            self.fin_data_test_subject.get_revenue('SYN', as_of=date)
+        latest = self.fin_data_test_subject.get_revenue('SYN')
+        self.assertEqual(self.server.requests, [], "Checking other dates, and the latest series, are answered from "
+                                                   "the cached index")
+        self.assertEqual(latest.shape, (25, 4))
+
+    def test_store_has_no_history(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaises(ValueError):
+                FinData(store=directory).get_revenue('SYN', as_of='2018-01-01')
+        self.assertIsNone(self.fin_data_test_subject.get_revenue('SYN', 2030, 1, as_of='2018-01-01',
+                                                                 mute_warnings=True),
+                          "Checking bounds without any quarter known on the date return nothing")
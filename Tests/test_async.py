@@ -0,0 +1,87 @@
+import time
+import asyncio
+import unittest
+from unittest import TestCase
+import historicalFinancialData.utils as ut
+from historicalFinancialData.main import FinData
+from historicalFinancialData.async_main import AsyncFinData
+from historicalFinancialData.limiter import TokenBucket
+from historicalFinancialData.transport import aiohttp
+from historicalFinancialData.exceptions import InvalidTickerError, NotFoundError
+from stand_in_server import StandInServer, ExpiringSeriesCache, synthetic_sec_payloads, point_library_at
+
+"""
+test_async.py - Testing script for AsyncFinData against a local stand-in for the SEC API, skipped without aiohttp
+"""
+
+COMPANIES = {"SYN": (1, ["Revenues", "NetIncomeLoss", "Assets"]), "ALT": (2, ["SalesRevenueNet"]), "NOD": (3, [])}
+
+
+@unittest.skipUnless(aiohttp, "AsyncFinData requires aiohttp")
+class TestAsyncFinData(TestCase):
+    def setUp(self):
+        self.server = StandInServer(synthetic_sec_payloads(COMPANIES)).__enter__()
+        self.addCleanup(self.server.__exit__)
+        point_library_at(self, self.server)
+        # The stand-in isn't the SEC, so its limit doesn't need to be respected
+        self.addCleanup(setattr, ut, 'rate_limiter', ut.rate_limiter)
+        ut.rate_limiter = TokenBucket(1000)
+
+    def run_async(self, method, *args, **kwargs):
+        async def run():
+            async with AsyncFinData() as fin_data_test_subject:
+                return await getattr(fin_data_test_subject, method)(*args, **kwargs)
+        return asyncio.run(run())
+
+    def test_same_data_as_fin_data(self):
+        revenue = self.run_async('get_revenue', 'SYN', 2016, 1, 2019, 4)
+        revenue_requests = len(self.server.requests)
+        self.assertEqual(revenue_requests, 1 + len(FinData._rev_jargon),
+                         "Checking each tag (and the directory) was requested once, none again by the parsing thread")
+        self.assertTrue(ut.tag_index.is_missing("0000000001", "SalesRevenueNet"),
+                        "Checking tags that weren't found were recorded as such")
+        statement = self.run_async('get_statement', 'SYN', ['revenue', 'net_profit'], 2016, 1, 2019, 4)
+        cross_section = self.run_async('get_cross_section', 'revenue', 2019, 4, output='columns')
+        FinData._default_series_cache.clear()
+        fin_data = FinData()
+        self.assertTrue((revenue == fin_data.get_revenue('SYN', 2016, 1, 2019, 4)).all())
+        self.assertTrue((statement['net_profit'] == fin_data.get_net_profit('SYN', 2016, 1, 2019, 4)).all())
+        self.assertEqual(cross_section["value"].tolist(),
+                         fin_data.get_cross_section('revenue', 2019, 4, output='columns')["value"].tolist())
+
+    def test_series_expiring_after_planning(self):
+        async def run(method, *args):
+            async with AsyncFinData(series_cache=series_cache) as fin_data_test_subject:
+                return await getattr(fin_data_test_subject, method)(*args)
+        series_cache = ExpiringSeriesCache()
+        statement = asyncio.run(run('get_statement', 'SYN', ['revenue', 'net_profit'], 2016, 1, 2019, 4))
+        revenue = asyncio.run(run('get_revenue', 'ALT', 2016, 1, 2019, 4))
+        del self.server.requests[:]
+        self.assertEqual(asyncio.run(run('get_statement', 'SYN', ['revenue', 'net_profit'], 2016, 1, 2019, 4))
+                         ['net_profit'].tolist(), statement['net_profit'].tolist())
+        self.assertEqual(asyncio.run(run('get_revenue', 'ALT', 2016, 1, 2019, 4)).tolist(), revenue.tolist())
+        self.assertEqual(self.server.requests, [], "Checking the series found cached while planning the requests were "
+                                                   "used by the call, although they expired")
+
+    def test_get_many(self):
+        data, errors = self.run_async('get_many', ['SYN', 'ALT', 'NOD', 'qwerty'], 'revenue', 2016, 1, 2019, 4)
+        self.assertEqual(sorted(data), ['ALT', 'SYN'])
+        self.assertEqual(data['ALT'][1][1], 1050, "Checking the second company's data")
+        self.assertIsInstance(errors['NOD'], NotFoundError)
+        self.assertIsInstance(errors['qwerty'], InvalidTickerError)
+        self.assertIsNone(self.run_async('get_eps', 'NOD', mute_warnings=True))
+
+    def test_requests_overlap(self):
+        self.run_async('get_revenue', 'NOD', mute_warnings=True)  # Loads the directory
+        self.server.delay = 0.2
+
+        async def run():
+            async with AsyncFinData() as fin_data_test_subject:
+                return await asyncio.gather(fin_data_test_subject.get_revenue('SYN'),
+                                            fin_data_test_subject.get_net_profit('ALT', mute_warnings=True))
+        start = time.perf_counter()
+        revenue, net_profit = asyncio.run(run())
+        self.assertLess(time.perf_counter() - start, 0.2 * (len(FinData._rev_jargon) + 1) / 2,
+                        "Checking the requests of both calls were made concurrently")
+        self.assertIsNotNone(revenue)
+        self.assertIsNone(net_profit)
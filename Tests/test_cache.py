@@ -0,0 +1,105 @@
+import os
+import time
+import datetime
+import tempfile
+from unittest import TestCase
+import numpy as np
+import historicalFinancialData.utils as ut
+from historicalFinancialData.cache import ResponseCache, SeriesCache, _object_array_bytes
+from historicalFinancialData.columnar import CompactSeries
+from stand_in_server import StandInServer
+
+"""
+test_cache.py - Testing script for the persistent SEC response cache, runs against a local stand-in for the SEC API, and
+                the in-memory cache of cleaned series
+"""
+
+CONCEPT_PATH = "/api/xbrl/companyconcept/CIK0000000001/us-gaap/Revenues.json"
+CONCEPT_PAYLOAD = {"cik": 1, "tag": "Revenues", "units": {"USD": [{"fy": 2020, "fp": "Q1", "form": "10-Q", "val": 5,
+                                                                    "start": "2020-01-01", "end": "2020-03-31"}]}}
+
+
+class TestResponseCache(TestCase):
+    def setUp(self):
+        self._cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._cache_dir.cleanup)
+        self.addCleanup(setattr, ut, 'response_cache', None)
+
+    def test_warm_run_makes_no_requests(self):
+        ut.response_cache = ResponseCache(self._cache_dir.name)
+        with StandInServer({CONCEPT_PATH: CONCEPT_PAYLOAD}) as server:
+            cold = ut.get_url_data(server.url + CONCEPT_PATH)
+            warm = ut.get_url_data(server.url + CONCEPT_PATH)
+        self.assertEqual(cold, CONCEPT_PAYLOAD, "Checking the payload is returned as served")
+        self.assertEqual(warm, CONCEPT_PAYLOAD, "Checking the cached payload is returned unchanged")
+        self.assertEqual(len(server.requests), 1, "Checking the warm run didn't hit the network")
+
+    def test_stale_entry_is_revalidated(self):
+        ut.response_cache = ResponseCache(self._cache_dir.name, ttl=0)
+        with StandInServer({CONCEPT_PATH: CONCEPT_PAYLOAD}) as server:
+            ut.get_url_data(server.url + CONCEPT_PATH)
+            revalidated = ut.get_url_data(server.url + CONCEPT_PATH)
+        self.assertEqual(revalidated, CONCEPT_PAYLOAD, "Checking the revalidated payload is returned unchanged")
+        self.assertEqual(server.not_modified, 1, "Checking the stale entry was revalidated with a conditional request")
+
+    def test_eviction_keeps_cache_under_size(self):
+        cache = ResponseCache(self._cache_dir.name, max_bytes=600)
+        for i in range(10):
+            cache.store("http://localhost/api/entry" + str(i) + ".json", b"x" * 100, {})
+        sizes = [os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(self._cache_dir.name)
+                 for name in files]
+        self.assertLessEqual(sum(sizes), 600, "Checking the cache evicted entries to stay under its size bound")
+        self.assertIsNotNone(cache.lookup("http://localhost/api/entry9.json"), "Checking the newest entry was kept")
+        self.assertIsNone(cache.lookup("http://localhost/api/entry0.json"), "Checking the oldest entry was evicted")
+
+
+class TestSeriesCache(TestCase):
+    @staticmethod
+    def series(quarters):
+        return np.array([["2019Q" + str(i % 4 + 1), i, None, None] for i in range(quarters)], dtype=object)
+
+    def test_hits_and_misses(self):
+        cache = SeriesCache()
+        self.assertIsNone(cache.get(("1", "revenue")), "Checking an empty cache misses")
+        series = self.series(4)
+        cache.put(("1", "revenue"), series)
+        self.assertIs(cache.get(("1", "revenue")), series, "Checking the cached series is returned")
+        self.assertIn(("1", "revenue"), cache, "Checking membership of a cached series")
+        self.assertEqual(cache.stats()["hits"], 1, "Checking the hit was counted")
+        self.assertEqual(cache.stats()["misses"], 1, "Checking the miss was counted, but not the membership test")
+
+    def test_lru_eviction_keeps_cache_under_size(self):
+        probe = SeriesCache()
+        probe.put("probe", self.series(8))
+        cache = SeriesCache(max_bytes=probe.stats()["bytes"] * 2)
+        for key in ("first", "second"):
+            cache.put(key, self.series(8))
+        cache.get("first")  # Now the second series is the least recently used one
+        cache.put("third", self.series(8))
+        self.assertLessEqual(cache.stats()["bytes"], cache.max_bytes, "Checking the cache stayed under its size bound")
+        self.assertEqual(cache.stats()["evictions"], 1, "Checking a single series was evicted")
+        self.assertNotIn("second", cache, "Checking the least recently used series was evicted")
+        self.assertIn("first", cache, "Checking the recently used series was kept")
+
+    def test_outdated_series_are_dropped(self):
+        cache = SeriesCache(ttl=0.05)
+        cache.put("key", self.series(4))
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("key"), "Checking the outdated series isn't served")
+        self.assertEqual(cache.stats()["series"], 0, "Checking the outdated series was dropped")
+
+    def test_compact_series(self):
+        series = np.array([[str(2010 + i // 4) + "Q" + str(i % 4 + 1), 1000000 * i + (0.5 if i % 2 else 0),
+                            datetime.datetime(2010, 1, 1) + datetime.timedelta(days=91 * i),
+                            datetime.datetime(2010, 3, 31) + datetime.timedelta(days=91 * i)] for i in range(40)],
+                          dtype=object)
+        series[0, 2] = None
+        compact = CompactSeries(series)
+        self.assertEqual(compact.rows().tolist(), series.tolist(), "Checking the rows are converted back as they were")
+        self.assertEqual([type(value) for value in compact.rows()[:2, 1]], [int, float],
+                         "Checking integers stay integers")
+        self.assertEqual(compact.rows(compact.columns["period"] == "2019Q2")[:, 1].tolist(), [37000000.5])
+        self.assertLess(compact.nbytes * 3, _object_array_bytes(series), "Checking it is several times smaller")
+        cache = SeriesCache()
+        cache.put("key", compact)
+        self.assertEqual(cache.stats()["bytes"], compact.nbytes)
@@ -0,0 +1,101 @@
+from unittest import TestCase
+import numpy as np
+from historicalFinancialData.main import FinData
+from historicalFinancialData.exceptions import InvalidTickerError, NotFoundError
+from historicalFinancialData.derived import QuarterGrid, lag, ttm, yoy
+from stand_in_server import StandInServer, synthetic_sec_payloads, point_library_at
+
+"""
+test_derived.py - Testing script for the metrics derived from the base ones, partly against a local stand-in for the SEC
+"""
+
+COMPANIES = {"SYN": (1, ["Revenues", "NetIncomeLoss", "Assets", "Liabilities"]), "NOD": (3, [])}
+
+
+"Typed columns of a series, as to_columns returns them, with the given values from the given first period"
+def series(first_year, first_quarter, values):
+    periods = [str(first_year + (first_quarter - 1 + i) // 4) + "Q" + str((first_quarter - 1 + i) % 4 + 1)
+               for i in range(len(values))]
+    return {"period": np.array(periods, dtype='U6'), "value": np.array(values, dtype=float),
+            "start": np.full(len(values), np.datetime64('NaT'), dtype='M8[D]'),
+            "end": np.full(len(values), np.datetime64('NaT'), dtype='M8[D]')}
+
+
+class TestWindows(TestCase):
+    def test_windows(self):
+        values = np.array([[1.0, 2, 3, 4, 5, np.nan, 7, 8, 9, 10]])
+        np.testing.assert_array_equal(lag(values, 2)[0, :3], [np.nan, np.nan, 1])
+        np.testing.assert_array_equal(ttm(values)[0], [np.nan] * 3 + [10, 14] + [np.nan] * 4 + [34],
+                                      "Checking trailing sums are only known when all four quarters are")
+        self.assertEqual(yoy(values)[0, 4], 4, "Checking growth is relative to four quarters before")
+
+    def test_grid_aligns_by_quarter(self):
+        grid = QuarterGrid([{"revenue": series(2019, 3, [10, 20, 30]), "net_profit": series(2020, 1, [2, 3])},
+                            {"revenue": series(2018, 4, [5]), "net_profit": None}])
+        self.assertEqual(grid.periods.tolist(), ["2018Q4", "2019Q1", "2019Q2", "2019Q3", "2019Q4", "2020Q1",
+                                                 "2020Q2"])
+        margin = grid.evaluate(("net_profit", "revenue"), lambda net_profit, revenue: net_profit / revenue)
+        np.testing.assert_array_equal(margin[0], [np.nan] * 5 + [2 / 30, np.nan])
+        self.assertTrue(np.isnan(margin[1]).all(), "Checking companies without a metric have no derived values")
+
+
+class TestCalendarGrid(TestCase):
+    def test_fiscal_quarters_move_to_calendar_quarters(self):
+        # A calendar year filer and one whose fiscal year ends in January (i.e. a retailer), its Q1 being Feb-Apr
+        calendar_filer = series(2019, 1, [10, 20])
+        calendar_filer["start"] = np.array(['2019-01-01', '2019-04-01'], dtype='M8[D]')
+        calendar_filer["end"] = np.array(['2019-03-31', '2019-06-30'], dtype='M8[D]')
+        retailer = series(2020, 1, [5, 6, 7])
+        retailer["start"] = np.array(['2019-02-01', '2019-05-01', 'NaT'], dtype='M8[D]')
+        retailer["end"] = np.array(['2019-04-30', '2019-07-31', '2019-10-31'], dtype='M8[D]')
+        grid = QuarterGrid([{"revenue": calendar_filer}, {"revenue": retailer}]).calendar()
+        self.assertEqual(grid.periods.tolist(), ["2019Q1", "2019Q2", "2019Q3"])
+        np.testing.assert_array_equal(grid.values["revenue"], [[10, 20, np.nan], [5, 6, 7]])
+        self.assertEqual(grid.end[1, 0], np.datetime64('2019-04-30'), "Checking the dates move along with the values")
+
+
+class TestDerived(TestCase):
+    def setUp(self):
+        self.server = StandInServer(synthetic_sec_payloads(COMPANIES)).__enter__()
+        self.addCleanup(self.server.__exit__)
+        point_library_at(self, self.server)
+        self.fin_data_test_subject = FinData()
+
+    def test_get_derived(self):
+        formulas = {"revenue_run_rate": (("revenue",), 'Revenue Run Rate', lambda revenue: revenue * 4)}
+        data, errors = self.fin_data_test_subject.get_derived(
+            ['SYN', 'NOD', 'BAD'], ['revenue_ttm', 'revenue_yoy', 'net_margin', 'leverage', 'revenue_run_rate'],
+            2016, 1, 2016, 4, formulas=formulas)
+        self.assertIsInstance(errors['BAD'], InvalidTickerError)
+        self.assertIsInstance(errors['NOD'], NotFoundError)
+        ttm_revenue = data['SYN']['revenue_ttm']
+        self.assertEqual(ttm_revenue.shape, (5, 4), "Checking the four quarters of 2016 plus names")
+        self.assertEqual(ttm_revenue[0][1], 'Revenue (TTM)')
+        self.assertEqual(ttm_revenue[1][1], 1020 + 1030 + 1040 + 1050, "Checking the window reaches back into 2015")
+        self.assertAlmostEqual(data['SYN']['revenue_yoy'][1][1], 1050 / 1010 - 1)
+        self.assertAlmostEqual(data['SYN']['net_margin'][4][1], 2080 / 1080, msg="Checking the filled Q4 is used")
+        self.assertAlmostEqual(data['SYN']['leverage'][1][1], 4050 / 3050)
+        self.assertEqual(data['SYN']['revenue_run_rate'][1][1], 1050 * 4, "Checking custom formulas are computed")
+        revenue_requests = [path for path in self.server.requests
+                            if path.endswith("CIK0000000001/us-gaap/Revenues.json")]
+        self.assertEqual(len(revenue_requests), 1, "Checking each base series was fetched once")
+
+    def test_unknown_metric(self):
+        with self.assertRaises(ValueError):
+            self.fin_data_test_subject.get_derived(['SYN'], ['ebitda_margin'])
+
+    def test_get_panel(self):
+        panel, errors = self.fin_data_test_subject.get_panel(['SYN', 'NOD', 'BAD'], ['revenue', 'total_assets'], 2016,
+                                                             1, 2016, 4)
+        self.assertIsInstance(errors['BAD'], InvalidTickerError)
+        self.assertIsInstance(errors['NOD'], NotFoundError)
+        self.assertEqual(panel["values"].shape, (3, 4, 2), "Checking the tickers x quarters x metrics shape")
+        self.assertEqual(panel["periods"].tolist(), ["2016Q1", "2016Q2", "2016Q3", "2016Q4"])
+        self.assertEqual(panel["values"][0, :, 0].tolist(), [1050, 1060, 1070, 1080])
+        self.assertEqual(panel["mask"].sum(axis=(1, 2)).tolist(), [8, 0, 0], "Checking failed tickers are masked")
+        fiscal_panel, _ = self.fin_data_test_subject.get_panel(['SYN'], ['revenue'], 2016, 1, 2016, 4, calendar=False)
+        np.testing.assert_array_equal(fiscal_panel["values"][0], panel["values"][:1, :, 0].T,
+                                      "Checking a calendar year filer's quarters are the same either way")
+        facts_requests = [path for path in self.server.requests if "/companyfacts/" in path]
+        self.assertEqual(len(facts_requests), 2, "Checking a single request per valid ticker")
+        self.assertFalse([path for path in self.server.requests if "/companyconcept/" in path])
@@ -0,0 +1,91 @@
+import os
+import csv
+import tempfile
+import unittest
+from unittest import TestCase
+from historicalFinancialData.main import FinData
+from historicalFinancialData.export import CHECKPOINT_FILE_NAME, export, pyarrow, read_tickers
+from historicalFinancialData.cli import main
+from stand_in_server import StandInServer, synthetic_sec_payloads, point_library_at
+
+"""
+test_export.py - Testing script for the batch export (and the hfd command), against a local stand-in for the SEC API
+"""
+
+COMPANIES = {"SYN": (1, ["Revenues", "NetIncomeLoss"]), "ALT": (2, ["SalesRevenueNet"]), "NOD": (3, [])}
+
+
+class TestExport(TestCase):
+    def setUp(self):
+        self.server = StandInServer(synthetic_sec_payloads(COMPANIES)).__enter__()
+        self.addCleanup(self.server.__exit__)
+        point_library_at(self, self.server)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = directory.name
+
+    def read_csv(self, *path):
+        with open(os.path.join(self.output, *path), newline='') as f:
+            return list(csv.DictReader(f))
+
+    def test_export_resumes(self):
+        class Interrupted(Exception):
+            pass
+
+        def interrupt(done, total, rows, seconds):
+            raise Interrupted()
+        with self.assertRaises(Interrupted):
+            export(FinData(), ['SYN', 'ALT', 'NOD', 'BAD'], ['revenue', 'net_profit'], self.output, workers=1,
+                   progress=interrupt)
+        rows = self.read_csv("ticker=SYN", "revenue.csv")
+        self.assertEqual(rows[0], {"ticker": "SYN", "metric": "revenue", "period": "2015Q1", "value": "1010.0",
+                                   "start": "2015-01-01", "end": "2015-03-31"})
+        self.assertFalse(os.path.exists(os.path.join(self.output, "ticker=SYN", "net_profit.csv")),
+                         "Checking the export stopped after the first batch")
+
+        del self.server.requests[:]
+        exported, no_data, failed, failures = export(FinData(), ['SYN', 'ALT', 'NOD', 'BAD'],
+                                                     ['revenue', 'net_profit'], self.output, workers=1)
+        self.assertEqual((exported, no_data, failed), (1, 3, 0), "Checking only the second metric was left to export")
+        self.assertFalse([path for path in self.server.requests if "Revenues" in path],
+                         "Checking the exported metric wasn't requested again")
+        self.assertEqual(len(self.read_csv("ticker=SYN", "net_profit.csv")), 24)
+        with open(os.path.join(self.output, CHECKPOINT_FILE_NAME)) as f:
+            self.assertEqual(len(f.readlines()), 1 + 8, "Checking every (ticker, metric) was checkpointed once, after "
+                                                        "the export's parameters")
+
+    def test_resuming_needs_the_same_parameters(self):
+        export(FinData(), ['SYN'], ['revenue'], self.output)
+        with self.assertRaises(ValueError, msg="Checking another partitioning doesn't resume the export"):
+            export(FinData(), ['SYN', 'ALT'], ['revenue'], self.output, partition="year")
+        with self.assertRaises(ValueError, msg="Checking other bounds don't resume the export"):
+            export(FinData(), ['SYN', 'ALT'], ['revenue'], self.output, start_year=2019)
+        self.assertEqual(export(FinData(), ['SYN', 'ALT'], ['revenue'], self.output)[0], 1,
+                         "Checking the same parameters still resume it")
+        self.assertEqual(export(FinData(), ['SYN'], ['revenue'], self.output, start_year=2019, restart=True)[0], 1,
+                         "Checking a restart exports with the new parameters")
+        tickers_path = os.path.join(self.output, "tickers.txt")
+        with open(tickers_path, 'w') as f:
+            f.write("SYN\n")
+        with self.assertRaises(SystemExit, msg="Checking hfd export refuses to resume with other parameters"):
+            main(["export", tickers_path, self.output, "--metrics", "revenue"])
+
+    def test_hfd_export_by_year(self):
+        tickers_path = os.path.join(self.output, "tickers.txt")
+        with open(tickers_path, 'w') as f:
+            f.write("# Companies to export\nSYN, ALT\n\nSYN\n")
+        self.assertEqual(read_tickers(tickers_path), ['SYN', 'ALT'])
+        self.assertEqual(main(["export", tickers_path, os.path.join(self.output, "export"), "--metrics", "revenue",
+                               "--partition", "year", "--start-year", "2019"]), 0)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.output, "export"))),
+                         [CHECKPOINT_FILE_NAME, "year=2019", "year=2020"])
+        rows = self.read_csv("export", "year=2020", "ALT.revenue.csv")
+        self.assertEqual([row["period"] for row in rows], ["2020Q1", "2020Q2", "2020Q3", "2020Q4"])
+
+    @unittest.skipUnless(pyarrow, "Parquet output requires pyarrow")
+    def test_parquet(self):
+        export(FinData(), ['SYN'], ['revenue'], self.output, file_format="parquet")
+        table = pyarrow.parquet.read_table(os.path.join(self.output, "ticker=SYN", "revenue.parquet"))
+        self.assertEqual(table.column_names, ["ticker", "metric", "period", "value", "start", "end"])
+        self.assertEqual(table.num_rows, 24)
+        self.assertEqual(table.column("value")[0].as_py(), 1010)
@@ -0,0 +1,60 @@
+import datetime
+from unittest import TestCase
+import numpy as np
+from historicalFinancialData.main import FinData
+from historicalFinancialData.frames import frame_period
+from stand_in_server import StandInServer, synthetic_concept_payload, synthetic_frame_payloads, point_library_at
+
+"""
+test_frames.py - Testing script for cross sections out of the frames API, runs against a local stand-in for the SEC API
+"""
+
+# CIK, tag and base value of the concepts the stand-in's frames are made of. BIG also reports a tag that comes later in
+# the revenue jargon, with larger values that shouldn't be used, and the last company has no ticker
+CONCEPTS = [(5, "SalesRevenueNet", 3000), (5, "Revenues", 9000), (6, "Revenues", 5000), (7, "Revenues", 1000)]
+TICKERS = {"0": {"cik_str": 5, "ticker": "BIG", "title": "Big Company"},
+           "1": {"cik_str": 6, "ticker": "SML", "title": "Small Company"}}
+
+
+class TestFrames(TestCase):
+    def setUp(self):
+        concepts = {"/api/xbrl/companyconcept/CIK" + str(cik).zfill(10) + "/us-gaap/" + tag + ".json":
+                    synthetic_concept_payload(cik, tag, 2015, 2020, base_value=base_value)
+                    for cik, tag, base_value in CONCEPTS}
+        self.server = StandInServer(synthetic_frame_payloads(concepts) |
+                                    {"/files/company_tickers.json": TICKERS}).__enter__()
+        self.addCleanup(self.server.__exit__)
+        point_library_at(self, self.server)
+        self.fin_data_test_subject = FinData()
+
+    def test_frame_period(self):
+        self.assertEqual(frame_period(2019, 1), "CY2019Q1")
+        self.assertEqual(frame_period(2019), "CY2019")
+        self.assertEqual(frame_period(2019, 4, instant=True), "CY2019Q4I")
+
+    def test_cross_section(self):
+        cross_section = self.fin_data_test_subject.get_cross_section('revenue', 2019, 1)
+        self.assertEqual(cross_section[0].tolist(), ['Ticker', 'CIK', 'Company', 'Revenue', 'Start of Quarter',
+                                                     'End of Quarter'])
+        self.assertEqual(cross_section[1:, 0].tolist(), ['SML', 'BIG', None], "Checking companies are ranked by value")
+        self.assertEqual(cross_section[1:, 3].tolist(), [5170, 3170, 1170],
+                         "Checking the first tag of the jargon a company reports is used")
+        self.assertEqual(cross_section[1][4], datetime.datetime(2019, 1, 1), "Checking the start date")
+        self.assertEqual(len(self.server.requests) - 1, len(FinData._rev_jargon),
+                         "Checking a single request per tag (and the directory) was made")
+
+    def test_fourth_quarter_is_derived(self):
+        columns = self.fin_data_test_subject.get_cross_section('revenue', 2019, 4, output='columns')
+        self.assertEqual(columns["value"].tolist(), [5200, 3200, 1200],
+                         "Checking Q4 is the yearly value minus the first three quarters")
+        self.assertEqual(columns["start"][0], np.datetime64("2019-10-01"), "Checking Q4 starts after Q3 ended")
+        self.assertEqual(columns["cik"].tolist(), ["0000000006", "0000000005", "0000000007"])
+        self.assertIsNone(self.fin_data_test_subject.get_cross_section('revenue', 2019, 4, fill_fourth_quarter=False,
+                                                                       mute_warnings=True),
+                          "Checking nothing is returned when Q4 isn't derived, as no company reports it")
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            self.fin_data_test_subject.get_cross_section('ebitda', 2019, 1)
+        with self.assertRaises(ValueError):
+            self.fin_data_test_subject.get_cross_section('revenue', 2019, 5)
@@ -0,0 +1,47 @@
+import os
+import time
+import tempfile
+import threading
+import multiprocessing
+from unittest import TestCase
+from historicalFinancialData.limiter import TokenBucket
+
+"""
+test_limiter.py - Testing script for the token-bucket rate limiter shared by threads and processes
+"""
+
+
+def _acquire_from_shared_bucket(path, acquisitions):
+    bucket = TokenBucket(20, capacity=2, path=path)
+    for _ in range(acquisitions):
+        bucket.acquire()
+
+
+class TestTokenBucket(TestCase):
+    def test_threads_share_the_budget(self):
+        bucket = TokenBucket(20, capacity=5)
+        threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(6)]) for _ in range(5)]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 30 acquisitions with a burst of 5 at 20 a second need at least 25/20 seconds
+        self.assertGreaterEqual(time.time() - start, 1.2, "Checking the threads were held to the rate together")
+        stats = bucket.stats()
+        self.assertEqual(stats["acquired"], 30, "Checking every acquisition was counted")
+        self.assertGreater(stats["throttled_seconds"], 0, "Checking the time spent throttled was counted")
+
+    def test_processes_share_the_budget(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "sec.bucket")
+        processes = [multiprocessing.Process(target=_acquire_from_shared_bucket, args=(path, 10)) for _ in range(2)]
+        start = time.time()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        # 20 acquisitions with a burst of 2 at 20 a second need at least 18/20 seconds, if each process had its own
+        # bucket they would be done in about half that time
+        self.assertGreaterEqual(time.time() - start, 0.85, "Checking the processes were held to the rate together")
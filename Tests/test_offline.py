@@ -0,0 +1,153 @@
+import os
+import json
+import zipfile
+import datetime
+import tempfile
+from unittest import TestCase
+import numpy as np
+from historicalFinancialData.main import FinData
+from historicalFinancialData.exceptions import InvalidTickerError, NotFoundError
+import historicalFinancialData.store as store_module
+from historicalFinancialData.store import ColumnarStore, ingest_company_facts_archive
+from historicalFinancialData.directory import CompanyDirectory
+from historicalFinancialData.sync import sync_store
+from stand_in_server import StandInServer, ExpiringSeriesCache, synthetic_sec_payloads, point_library_at
+
+"""
+test_offline.py - Testing script for the public facing methods in main.py against a local stand-in for the SEC API
+"""
+
+COMPANIES = {"SYN": (1, ["Revenues", "NetIncomeLoss", "Assets"]), "ALT": (2, ["SalesRevenueNet"]), "NOD": (3, [])}
+
+
+class TestOfflineFinData(TestCase):
+    def setUp(self):
+        self.server = StandInServer(synthetic_sec_payloads(COMPANIES)).__enter__()
+        self.addCleanup(self.server.__exit__)
+        point_library_at(self, self.server)
+        self.fin_data_test_subject = FinData()
+
+    def test_get_statement(self):
+        statement = self.fin_data_test_subject.get_statement('SYN', ['revenue', 'net_profit', 'gross_profit'],
+                                                             2016, 1, 2019, 4)
+        company_facts_requests = [path for path in self.server.requests if "companyfacts" in path]
+        self.assertEqual(len(company_facts_requests), 1, "Checking the statement needs a single companyfacts request")
+        self.assertFalse([path for path in self.server.requests if "companyconcept" in path],
+                         "Checking no per tag requests were made")
+        self.assertEqual(statement['revenue'].shape, (17, 4), "16 quarters between SOY 2016 and EOY 2019 plus names")
+        self.assertEqual(statement['revenue'][4][1], 1080, "Checking the Q4 revenue was filled from the 10-K")
+        self.assertEqual(statement['net_profit'][1][1], 2050, "Checking a second metric came from the same document")
+        self.assertIsNone(statement['gross_profit'], "Checking unreported metrics are None")
+
+    def test_get_statement_series_expiring(self):
+        fin_data = FinData(series_cache=ExpiringSeriesCache())
+        expected = fin_data.get_statement('SYN', ['revenue', 'net_profit'], 2016, 1, 2019, 4)
+        del self.server.requests[:]
+        statement = fin_data.get_statement('SYN', ['revenue', 'net_profit'], 2016, 1, 2019, 4)
+        self.assertEqual(self.server.requests, [], "Checking the series found cached were used, although they expired")
+        self.assertEqual(statement['revenue'].tolist(), expected['revenue'].tolist())
+        self.assertEqual(statement['net_profit'].tolist(), expected['net_profit'].tolist())
+
+    def test_get_statement_wrong_ticker(self):
+        self.assertIsNone(self.fin_data_test_subject.get_statement('qwerty', mute_warnings=True),
+                          "Checking a bad ticker returns None")
+
+    def write_bulk_archive(self):
+        """Lays the payloads out like the SEC's bulk companyfacts.zip archive and company_tickers.json download, returns
+        the directory they are in and their paths"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        archive_path, tickers_path = os.path.join(directory.name, "companyfacts.zip"), \
+            os.path.join(directory.name, "company_tickers.json")
+        with zipfile.ZipFile(archive_path, 'w') as archive:
+            for path, payload in self.server.payloads.items():
+                if "companyfacts" in path:
+                    archive.writestr(path.rsplit("/", 1)[1], json.dumps(payload))
+        with open(tickers_path, 'w') as f:
+            json.dump(self.server.payloads["/files/company_tickers.json"], f)
+        return directory, archive_path, tickers_path
+
+    def test_store_from_bulk_archive(self):
+        directory, archive_path, tickers_path = self.write_bulk_archive()
+        store = ColumnarStore(os.path.join(directory.name, "store"))
+        ingested, failures = ingest_company_facts_archive(archive_path, store, tickers_path=tickers_path)
+        self.assertEqual((ingested, failures), (3, []), "Checking the companies were ingested without failures")
+        self.assertEqual(sync_store(store), ([], []), "Checking the ingested companies don't need to be synced")
+
+        del self.server.requests[:]
+        stored_revenue = FinData(store=store).get_revenue('SYN', 2016, 1, 2019, 4)
+        self.assertEqual(self.server.requests, [], "Checking the store is used without any network access")
+        revenue = self.fin_data_test_subject.get_revenue('SYN', 2016, 1, 2019, 4)
+        self.assertEqual(stored_revenue.shape, revenue.shape, "Checking the stored data has the same shape")
+        self.assertTrue((stored_revenue[1:, [0, 2, 3]] == revenue[1:, [0, 2, 3]]).all(), "Checking the stored dates")
+        self.assertEqual(stored_revenue.tolist(), revenue.tolist(), "Checking the stored values")
+        self.assertEqual([type(value) for value in stored_revenue[1:, 1]], [int] * 16,
+                         "Checking integers are returned as integers, as they are off the SEC")
+        self.assertIsNone(FinData(store=store).get_revenue('SYN', 2030, 1, mute_warnings=True),
+                          "Checking bounds without any stored quarter return nothing, as they do off the SEC")
+
+    def test_parallel_ingestion(self):
+        directory, archive_path, tickers_path = self.write_bulk_archive()
+        self.addCleanup(setattr, store_module, 'INGEST_CHUNK_SIZE', store_module.INGEST_CHUNK_SIZE)
+        store_module.INGEST_CHUNK_SIZE = 1  # A chunk per company so every worker gets some
+        progress = []
+        stores = [ColumnarStore(os.path.join(directory.name, "store" + str(workers))) for workers in (1, 2)]
+        self.assertEqual(ingest_company_facts_archive(archive_path, stores[0]), (3, []))
+        self.assertEqual(ingest_company_facts_archive(archive_path, stores[1], workers=2,
+                                                      progress=lambda done, total: progress.append((done, total))),
+                         (3, []), "Checking the workers ingested every company")
+        self.assertEqual(progress, [(1, 3), (2, 3), (3, 3)], "Checking progress was reported as chunks finished")
+        self.assertEqual(stores[1].read_sync_state(), stores[0].read_sync_state())
+        for metric, columns in stores[0].read_company("0000000001").items():
+            for name, column in columns.items():
+                np.testing.assert_array_equal(stores[1].read_series("0000000001", metric)[name], column)
+
+    def test_get_many(self):
+        data, errors = self.fin_data_test_subject.get_many(['SYN', 'ALT', 'NOD', 'qwerty'], 'revenue', 2016, 1, 2019, 4)
+        self.assertEqual(sorted(data), ['ALT', 'SYN'], "Checking the tickers with data were returned")
+        self.assertTrue((data['SYN'] == self.fin_data_test_subject.get_revenue('SYN', 2016, 1, 2019, 4)).all(),
+                        "Checking the data is the same as when fetched by itself")
+        self.assertEqual(data['ALT'][1][1], 1050, "Checking the second company's data")
+        self.assertIsInstance(errors['NOD'], NotFoundError, "Checking a company without data is reported as such")
+        self.assertIsInstance(errors['qwerty'], InvalidTickerError, "Checking a bad ticker is reported as such")
+
+    def test_directory_is_lazy_and_persisted(self):
+        self.assertEqual(self.server.requests, [], "Checking constructing FinData made no request")
+        temp_directory = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_directory.cleanup)
+        directory_path = os.path.join(temp_directory.name, "company_tickers.json")
+        directory = CompanyDirectory(directory_path)
+        self.assertEqual(directory.cik('SYN'), "0000000001", "Checking the lookup by ticker")
+        self.assertEqual(directory.ticker(1), 'SYN', "Checking the reverse lookup by CIK")
+        self.assertEqual(directory.ticker("0000000002"), 'ALT', "Checking the reverse lookup by zero-padded CIK")
+        self.assertIsNone(directory.ticker("CIK2"), "Checking a malformed CIK has no ticker")
+        self.assertEqual(directory.cik_by_name('synthetic company, 2'), "0000000002", "Checking the lookup by name")
+        del self.server.requests[:]
+        self.assertEqual(CompanyDirectory(directory_path).cik('ALT'), "0000000002", "Checking the persisted directory")
+        self.assertEqual(self.server.requests, [], "Checking the persisted directory was used without a download")
+        with self.assertRaises(InvalidTickerError, msg="Checking a bad ticker raises"):
+            directory.cik('qwerty')
+
+    def test_typed_output(self):
+        revenue = self.fin_data_test_subject.get_revenue('SYN', 2016, 1, 2019, 4)
+        structured = self.fin_data_test_subject.get_revenue('SYN', 2016, 1, 2019, 4, output='structured')
+        self.assertEqual(structured.dtype, np.dtype([('period', 'U6'), ('value', 'f8'), ('start', 'M8[D]'),
+                                                     ('end', 'M8[D]')]), "Checking the structured array is typed")
+        self.assertEqual(structured['period'].tolist(), revenue[1:, 0].tolist(), "Checking the periods")
+        self.assertEqual(structured['value'].tolist(), revenue[1:, 1].tolist(), "Checking the values")
+        self.assertEqual(structured['start'][0], np.datetime64('2016-01-01'), "Checking the start dates")
+        dates = self.fin_data_test_subject.get_dates('SYN', 2016, 1, 2019, 4, output='columns')
+        self.assertEqual(sorted(dates), ['end', 'period', 'start'], "Checking dates come without a value column")
+        self.assertEqual(dates['end'][-1], np.datetime64(datetime.date(2019, 12, 31)), "Checking the end dates")
+
+    def test_overlapping_ranges_are_sliced_from_memory(self):
+        earlier = self.fin_data_test_subject.get_revenue('SYN', 2016, 1, 2018, 4)
+        requests = len(self.server.requests)
+        later = self.fin_data_test_subject.get_revenue('SYN', 2017, 1, 2019, 4)
+        dates = self.fin_data_test_subject.get_dates('SYN', 2017, 3, 2017, 4)
+        self.assertEqual(len(self.server.requests), requests, "Checking the overlapping ranges made no request")
+        self.assertEqual(self.fin_data_test_subject.series_cache.stats()["hits"], 2, "Checking both were cache hits")
+        self.assertTrue((earlier[5:] == later[1:9]).all(), "Checking the overlap is the same in both ranges")
+        self.assertEqual(dates[1:].tolist(), later[3:5, [0, 2, 3]].tolist(), "Checking the dates come from the series")
+        self.assertIsNone(self.fin_data_test_subject.get_revenue('SYN', 2030, 1, 2031, 4, mute_warnings=True),
+                          "Checking a range outside the series returns None")
@@ -0,0 +1,47 @@
+import datetime
+from unittest import TestCase
+import numpy as np
+import historicalFinancialData.utils as ut
+from historicalFinancialData.parser import decode_facts
+
+"""
+test_parser.py - Testing script for the decoding of companyconcept facts and the vectorized selections over them
+"""
+
+FACTS = [{"start": "2018-10-01", "end": "2018-12-31", "val": 10, "fy": 2019, "fp": "Q1", "form": "10-Q",
+          "filed": "2019-02-01", "frame": "CY2018Q4"},
+         # Year-to-date duration, not a quarter
+         {"start": "2018-10-01", "end": "2019-03-31", "val": 21, "fy": 2019, "fp": "Q2", "form": "10-Q",
+          "filed": "2019-05-01"},
+         {"start": "2019-01-01", "end": "2019-03-31", "val": 11, "fy": 2019, "fp": "Q2", "form": "10-Q",
+          "filed": "2019-05-01", "frame": "CY2019Q1"},
+         # Re-reported in a current report
+         {"start": "2019-01-01", "end": "2019-03-31", "val": 11, "fy": 2019, "fp": "Q2", "form": "8-K",
+          "filed": "2019-05-02"},
+         {"start": "2018-10-01", "end": "2019-09-30", "val": 46, "fy": 2019, "fp": "FY", "form": "10-K",
+          "filed": "2019-11-01", "frame": "CY2019"},
+         # Instant without a fiscal year
+         {"end": "2019-09-30", "val": 5, "fp": "FY", "form": "10-K", "filed": "2019-11-01"}]
+
+
+class TestParser(TestCase):
+    def test_decode_facts(self):
+        facts = decode_facts(FACTS)
+        self.assertIs(decode_facts(facts), facts, "Checking decoded facts aren't decoded again")
+        self.assertEqual(facts.has_start.tolist(), [True] * 5 + [False], "Checking the instant has no start")
+        self.assertTrue(np.isnat(facts.start[5]), "Checking missing dates are NaT")
+        self.assertEqual(facts.has_fy.tolist(), [True] * 5 + [False], "Checking the missing fiscal year is marked")
+        self.assertEqual(facts.end[4], np.datetime64("2019-09-30"), "Checking the dates were parsed")
+        self.assertEqual(facts.frame[1], "", "Checking facts without a frame have an empty one")
+
+    def test_selections(self):
+        facts = decode_facts(FACTS)
+        self.assertEqual(ut.yr_is_valid(facts, 2018, 2020).tolist(), [False] * 4 + [True, False],
+                         "Checking only the full year 10-K fact is yearly data")
+        quarters = ut.get_explicit_quarter_data(facts, 2018, 2020)
+        self.assertEqual(quarters[:, 0].tolist(), ["2019Q1", "2019Q2"], "Checking only the 10-Q quarters were kept")
+        self.assertEqual(quarters[1].tolist(), ["2019Q2", 11, datetime.datetime(2019, 1, 1),
+                                                datetime.datetime(2019, 3, 31)], "Checking the row's types")
+        frames = ut.get_frame_quarter_data(facts, 2018, 2020, {"2019Q1": 1})
+        self.assertEqual(frames[:, 0].tolist(), ["2018Q4"], "Checking quarters already found are skipped")
+        self.assertEqual(len(ut.get_explicit_quarter_data(facts, 2021, 2022)), 0, "Checking out of bound years")
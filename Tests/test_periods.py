@@ -0,0 +1,39 @@
+import datetime
+from unittest import TestCase
+import numpy as np
+from historicalFinancialData.periods import TimePeriodIndex
+
+"""
+test_periods.py - Testing script for the index of missing time periods used to fill gaps in quarterly data
+"""
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def day(month, date):
+    return datetime.datetime(2019, month, date)
+
+
+class TestTimePeriodIndex(TestCase):
+    def test_matching_and_filling(self):
+        index = TimePeriodIndex(np.array([[day(1, 1), day(3, 31)], [day(7, 1), day(9, 30)]], dtype=object))
+        self.assertTrue(index.matches(day(7, 1), day(9, 29)), "Checking quarters starting on a period's start match")
+        self.assertTrue(index.matches(day(12, 1), day(3, 31)), "Checking quarters ending on a period's end match")
+        self.assertFalse(index.matches(day(3, 31), day(1, 1)), "Checking starts don't match ends and vice versa")
+        index.fill(day(1, 1), day(3, 31), ONE_DAY)
+        self.assertEqual(index.time_periods().tolist(), [[day(7, 1), day(9, 30)]], "Checking the period was filled")
+        index.fill(day(7, 1), day(9, 30), ONE_DAY)
+        self.assertIsNone(index.time_periods(), "Checking None is returned once every period was filled")
+
+    def test_partial_fill(self):
+        # A half year long gap of which only the first quarter is found
+        index = TimePeriodIndex(np.array([day(1, 1), day(6, 30)], dtype=object))
+        index.fill(day(1, 1), day(3, 31), ONE_DAY)
+        self.assertEqual(index.time_periods().tolist(), [[day(4, 1), day(6, 30)]],
+                         "Checking the rest of the gap starts the day after the quarter found")
+        self.assertTrue(index.matches(day(4, 1), day(6, 30)), "Checking the rest of the gap can be filled")
+
+    def test_unchanged_periods_are_returned_as_given(self):
+        time_periods = np.array([[day(7, 1), day(9, 30)], [day(1, 1), day(3, 31)]], dtype=object)
+        self.assertIs(TimePeriodIndex(time_periods).time_periods(), time_periods,
+                      "Checking the periods (and their order) are kept when nothing matched")
@@ -0,0 +1,92 @@
+import threading
+from unittest import TestCase
+import numpy as np
+import historicalFinancialData.utils as ut
+from historicalFinancialData.main import FinData
+from historicalFinancialData.limiter import SingleFlight
+from historicalFinancialData.service import FinDataClient, FinDataService
+from historicalFinancialData.exceptions import InvalidTickerError, NotFoundError
+from stand_in_server import StandInServer, synthetic_sec_payloads, point_library_at
+
+"""
+test_service.py - Testing script for the service mode and its client, against a local stand-in for the SEC API
+"""
+
+COMPANIES = {"SYN": (1, ["Revenues", "NetIncomeLoss"]), "ALT": (2, ["SalesRevenueNet"]), "NOD": (3, [])}
+
+
+class TestSingleFlight(TestCase):
+    def test_concurrent_calls_are_coalesced(self):
+        single_flight, started, release, calls = SingleFlight(), threading.Event(), threading.Event(), []
+
+        def call():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return len(calls)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(single_flight.do("key", call))) for _ in range(5)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        while single_flight.stats()["coalesced"] < 4:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [1] * 5, "Checking every caller got the single call's result")
+        self.assertEqual(single_flight.do("key", call), 2, "Checking a later call is made afresh")
+
+
+class TestService(TestCase):
+    def setUp(self):
+        self.server = StandInServer(synthetic_sec_payloads(COMPANIES)).__enter__()
+        self.addCleanup(self.server.__exit__)
+        point_library_at(self, self.server)
+        self.addCleanup(setattr, ut, 'single_flight', ut.single_flight)
+        ut.single_flight = SingleFlight()
+        self.service = FinDataService(FinData(), port=0).__enter__()
+        self.addCleanup(self.service.__exit__)
+        self.client = FinDataClient(self.service.url)
+        self.addCleanup(self.client.close)
+
+    def test_same_results_as_fin_data(self):
+        fin_data = FinData()
+        revenue = self.client.get_revenue('SYN', 2016, 1, 2019, 4)
+        self.assertEqual(revenue.tolist(), fin_data.get_revenue('SYN', 2016, 1, 2019, 4).tolist(),
+                         "Checking the labeled array, its value and date types included")
+        columns = self.client.get_net_profit('SYN', output='columns')
+        self.assertEqual(columns["end"].dtype, np.dtype('M8[D]'))
+        self.assertTrue((columns["value"] == fin_data.get_net_profit('SYN', output='columns')["value"]).all())
+        statement = self.client.get_statement('SYN', ['revenue', 'net_profit'], output='structured')
+        self.assertEqual(statement['revenue'].dtype.names, ('period', 'value', 'start', 'end'))
+        data, errors = self.client.get_many(['SYN', 'ALT', 'NOD', 'qwerty'], 'revenue', 2016, 1, 2019, 4)
+        self.assertEqual(data['ALT'][1][1], 1050)
+        self.assertIsInstance(errors['NOD'], NotFoundError)
+        self.assertIsInstance(errors['qwerty'], InvalidTickerError)
+        self.assertIsNone(self.client.get_eps('NOD', mute_warnings=True))
+        panel, _ = self.client.get_panel(['SYN', 'ALT'], ['revenue'])
+        np.testing.assert_array_equal(panel["values"], fin_data.get_panel(['SYN', 'ALT'], ['revenue'])[0]["values"])
+        with self.assertRaises(TypeError, msg="Checking the service's exceptions are raised by the client"):
+            self.client.get_revenue('SYN', unknown_argument=1)
+
+    def test_identical_concurrent_calls_cost_one_request(self):
+        self.client.get_revenue('NOD', mute_warnings=True)  # Loads the directory
+        del self.server.requests[:]
+        self.server.delay = 0.05
+        results = []
+
+        def call():
+            with FinDataClient(self.service.url) as client:
+                results.append(client.get_revenue('SYN'))
+        threads = [threading.Thread(target=call) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 8)
+        self.assertTrue(all((result == results[0]).all() for result in results))
+        self.assertEqual(sorted(self.server.requests), sorted(set(self.server.requests)),
+                         "Checking each tag was requested from the SEC once for all the calls")
+        self.assertGreater(ut.single_flight.stats()["coalesced"], 0)
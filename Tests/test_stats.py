@@ -0,0 +1,63 @@
+import json
+import time
+import logging
+from unittest import TestCase
+import historicalFinancialData.utils as ut
+from historicalFinancialData.main import FinData
+from historicalFinancialData.stats import Stats, logging_hook
+from stand_in_server import StandInServer, synthetic_sec_payloads, point_library_at
+
+"""
+test_stats.py - Testing script for the instrumentation of the library, runs against a local stand-in for the SEC API
+"""
+
+COMPANIES = {"SYN": (1, ["Revenues"])}
+
+
+class TestStats(TestCase):
+    def setUp(self):
+        self.server = StandInServer(synthetic_sec_payloads(COMPANIES)).__enter__()
+        self.addCleanup(self.server.__exit__)
+        point_library_at(self, self.server)
+        self.addCleanup(setattr, ut, 'stats', ut.stats)
+
+    def test_disabled_by_default(self):
+        ut.stats = None
+        self.assertIsNone(FinData().stats(), "Checking nothing is recorded unless asked for")
+
+    def test_stats_of_a_call(self):
+        events = []
+        fin_data = FinData(stats=Stats(hooks=[events.append]))
+        revenue = fin_data.get_revenue('SYN', 2016, 1, 2019, 4)
+        fin_data.get_revenue('SYN', 2017, 1, 2017, 4)
+        stats = fin_data.stats()
+        self.assertEqual(stats["requests_by_tag"]["Revenues"], 1, "Checking the requests were counted by tag")
+        self.assertEqual(stats["responses_by_status"]["404"], len(FinData._rev_jargon) - 1,
+                         "Checking the revenue tags the company doesn't report were counted as 404s")
+        self.assertGreater(stats["bytes_downloaded"], 0, "Checking the bytes downloaded were counted")
+        self.assertEqual(stats["rows_produced"], len(revenue) - 1 + 4, "Checking the quarters returned were counted")
+        self.assertEqual((stats["cache"]["series_cache.miss"], stats["cache"]["series_cache.hit"]), (1, 1),
+                         "Checking the second call was answered by the series cache")
+        for stage in ("throttle", "network", "decode_json", "get_spec_data_given_url", "fill_data", "get_data"):
+            self.assertGreater(stats["stages"][stage]["calls"], 0, "Checking the " + stage + " stage was timed")
+        self.assertGreaterEqual(stats["rate_limiter"]["acquired"], stats["requests"],
+                                "Checking the rate limiter's counters are included")
+        self.assertEqual(sum(event["event"] == "request" for event in events), stats["requests"],
+                         "Checking every request was passed to the hooks")
+
+    def test_stage_timings_are_exclusive(self):
+        stats = Stats()
+        stats.timed("outer", lambda: stats.timed("inner", time.sleep, 0.05))
+        timings = stats.snapshot()["stages"]
+        self.assertGreaterEqual(timings["inner"]["seconds"], 0.05, "Checking the nested stage was timed")
+        self.assertLess(timings["outer"]["seconds"], 0.05, "Checking the nested stage isn't counted twice")
+
+    def test_logging_hook(self):
+        stats = Stats(hooks=[logging_hook()])
+        with self.assertLogs("historicalFinancialData", level=logging.INFO) as logs:
+            stats.record_request("https://data.sec.gov/api/xbrl/companyconcept/CIK0000000001/us-gaap/Revenues.json",
+                                 404, 0)
+            stats.record_stage("fill_data", 0.1)
+        self.assertEqual(len(logs.records), 1, "Checking stage timings aren't logged by default")
+        self.assertEqual(json.loads(logs.records[0].getMessage())["subject"], "Revenues",
+                         "Checking the event was logged as json")
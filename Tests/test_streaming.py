@@ -0,0 +1,76 @@
+import json
+import tempfile
+from unittest import TestCase, mock
+import numpy as np
+import historicalFinancialData.utils as ut
+import historicalFinancialData.streaming as streaming
+from historicalFinancialData.cache import ResponseCache
+from historicalFinancialData.parser import COLUMNS, FactTable
+from historicalFinancialData.streaming import decode_document
+from stand_in_server import StandInServer, synthetic_concept_payload
+
+"""
+test_streaming.py - Testing script for the incremental decoding of SEC documents, fact lists straight into FactTables
+"""
+
+CONCEPT_PATH = "/api/xbrl/companyconcept/CIK0000000001/us-gaap/Revenues.json"
+
+
+"Splits the body into chunks of the given size, which cut through values, strings and multi-byte characters alike"
+def chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+class TestStreaming(TestCase):
+    def setUp(self):
+        units = synthetic_concept_payload(1, "Revenues", 2010, 2020)["units"]
+        instants = synthetic_concept_payload(1, "Assets", 2010, 2020)["units"]["USD"]
+        for fact in instants:
+            del fact["start"]
+        self.company_facts = {"cik": 1, "entityName": "Company ]},{ Ünïcode", "shares": 12345678901234,
+                              "facts": {"us-gaap": {"Revenues": {"label": "Revenues", "units": units},
+                                                    "Assets": {"label": "Assets", "units": {"USD": instants}},
+                                                    "Empty": {"label": "Empty", "units": {"USD": []}}}}}
+
+    def assertTablesEqual(self, table, facts):
+        expected = FactTable(facts)
+        for column in COLUMNS:
+            decoded, reference = getattr(table, column), getattr(expected, column)
+            if reference.dtype.kind == 'M':
+                decoded, reference = decoded.view(np.int64), reference.view(np.int64)
+            self.assertTrue(np.array_equal(decoded, reference), "Checking the " + column + " column")
+
+    def test_decodes_like_json_loads(self):
+        for separators in ((',', ':'), (', ', ': ')):
+            body = json.dumps(self.company_facts, separators=separators, ensure_ascii=False).encode('utf-8')
+            for chunk_size in (7, 1000, len(body)):
+                # Small batches so fact lists are decoded in several parts
+                with mock.patch.object(streaming, 'FACT_BATCH_SIZE', 10):
+                    document = decode_document(chunked(body, chunk_size))
+                self.assertEqual(document["entityName"], self.company_facts["entityName"],
+                                 "Checking strings are decoded across chunks")
+                self.assertEqual(document["shares"], 12345678901234, "Checking numbers aren't cut at chunk ends")
+                for tag, concept in self.company_facts["facts"]["us-gaap"].items():
+                    self.assertEqual(document["facts"]["us-gaap"][tag]["label"], concept["label"])
+                    self.assertTablesEqual(document["facts"]["us-gaap"][tag]["units"]["USD"], concept["units"]["USD"])
+
+    def test_malformed_documents_raise(self):
+        for body in (b'{"units": {"USD": [{"val": 1}, {"val": 2}', b'{"cik": 1} {', b'{"cik": tru}', b''):
+            with self.assertRaises(ValueError, msg="Checking " + repr(body) + " is rejected"):
+                decode_document(chunked(body, 4))
+
+    def test_get_url_data_streams_and_caches(self):
+        payload = synthetic_concept_payload(1, "Revenues", 2015, 2020)
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.addCleanup(setattr, ut, 'response_cache', None)
+        ut.response_cache = ResponseCache(cache_dir.name)
+        with StandInServer({CONCEPT_PATH: payload}) as server:
+            streamed = ut.get_url_data(server.url + CONCEPT_PATH, fact_tables=True)
+            cached = ut.get_url_data(server.url + CONCEPT_PATH, fact_tables=True)
+            with mock.patch.object(ut, 'streaming_decode', False):
+                whole = ut.get_url_data(server.url + CONCEPT_PATH, fact_tables=True)
+        self.assertTablesEqual(streamed["units"]["USD"], payload["units"]["USD"])
+        self.assertTablesEqual(cached["units"]["USD"], payload["units"]["USD"])
+        self.assertEqual(len(server.requests), 1, "Checking the streamed body was cached whole")
+        self.assertEqual(whole, payload, "Checking the fact lists are left as is when streaming is off")
@@ -0,0 +1,67 @@
+import tempfile
+from unittest import TestCase
+import historicalFinancialData.utils as ut
+from historicalFinancialData.cache import ResponseCache
+from historicalFinancialData.store import ColumnarStore
+from historicalFinancialData.sync import sync_store
+from stand_in_server import StandInServer, synthetic_sec_payloads, synthetic_submissions_payload, point_library_at
+
+"""
+test_sync.py - Testing script for the incremental refresh of a local store, runs against a local stand-in for the SEC API
+"""
+
+COMPANIES = {"SYN": (1, ["Revenues", "NetIncomeLoss"]), "ALT": (2, ["SalesRevenueNet"])}
+SYN_FACTS_PATH = "/api/xbrl/companyfacts/CIK0000000001.json"
+
+
+def company_facts_requests(server):
+    return sorted(path for path in server.requests if "companyfacts" in path)
+
+
+class TestSync(TestCase):
+    def setUp(self):
+        self.server = StandInServer(synthetic_sec_payloads(COMPANIES)).__enter__()
+        self.addCleanup(self.server.__exit__)
+        point_library_at(self, self.server)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = ColumnarStore(directory.name + "/store")
+        self.addCleanup(setattr, ut, 'response_cache', ut.response_cache)
+        ut.response_cache = ResponseCache(directory.name + "/cache")
+
+    def file_new_quarter(self):
+        """Adds a 10-Q for the first quarter of 2021 to SYN's revenue, as if it had just been filed"""
+        facts = self.server.payloads[SYN_FACTS_PATH]["facts"]["us-gaap"]
+        facts["Revenues"]["units"]["USD"].append(
+            {"start": "2021-01-01", "end": "2021-03-31", "val": 5000, "accn": "0000000000-21-000001", "fy": 2021,
+             "fp": "Q1", "form": "10-Q", "filed": "2021-04-28", "frame": "CY2021Q1"})
+        self.server.payloads["/submissions/CIK0000000001.json"] = synthetic_submissions_payload(1, facts)
+
+    def test_only_companies_that_filed_are_refreshed(self):
+        refreshed, failures = sync_store(self.store, [1, 2])
+        self.assertEqual((refreshed, failures), (["0000000001", "0000000002"], []),
+                         "Checking companies never synced are added to the store")
+        self.assertEqual(self.store.ciks(), ["0000000001", "0000000002"], "Checking the companies were stored")
+
+        del self.server.requests[:]
+        self.assertEqual(sync_store(self.store), ([], []), "Checking nothing is refreshed without new filings")
+        self.assertEqual(company_facts_requests(self.server), [], "Checking no companyfacts document was downloaded")
+        self.assertEqual(self.server.not_modified, 2, "Checking the cached submissions were revalidated with the SEC")
+
+        self.file_new_quarter()
+        del self.server.requests[:]
+        self.assertEqual(sync_store(self.store), (["0000000001"], []), "Checking only the filer was refreshed")
+        self.assertEqual(company_facts_requests(self.server), [SYN_FACTS_PATH],
+                         "Checking only the filer's companyfacts document was downloaded")
+        revenue = self.store.read_series("0000000001", "revenue")
+        self.assertEqual((str(revenue["period"][-1]), revenue["value"][-1]), ("2021Q1", 5000),
+                         "Checking the new quarter was merged into the store")
+        self.assertEqual(self.store.read_sync_state()["0000000001"], ["2021-04-28", "0000000000-21-000001"],
+                         "Checking the new filing was recorded")
+
+    def test_failures_are_reported_per_company(self):
+        del self.server.payloads["/submissions/CIK0000000002.json"]
+        refreshed, failures = sync_store(self.store, [1, 2])
+        self.assertEqual(refreshed, ["0000000001"], "Checking the other company was still refreshed")
+        self.assertEqual([(cik, metric) for cik, metric, _ in failures], [("0000000002", None)],
+                         "Checking the company that failed was reported")
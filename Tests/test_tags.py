@@ -0,0 +1,84 @@
+import os
+import time
+import tempfile
+from unittest import TestCase
+from historicalFinancialData.main import FinData
+from historicalFinancialData.cache import SeriesCache
+from historicalFinancialData.tags import TagIndex
+from stand_in_server import StandInServer, synthetic_sec_payloads, point_library_at
+
+"""
+test_tags.py - Testing script for the index of the tags each company reports, runs against a local stand-in for the SEC
+"""
+
+COMPANIES = {"SYN": (1, ["Revenues", "NetIncomeLoss"])}
+
+
+def concept_requests(server):
+    return [path for path in server.requests if "companyconcept" in path]
+
+
+class TestTagIndex(TestCase):
+    def setUp(self):
+        self._index_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._index_dir.cleanup)
+        self.path = os.path.join(self._index_dir.name, "tag_index.json")
+
+    def test_learned_tags_are_persisted(self):
+        index = TagIndex(self.path)
+        index.record("0000000001", "SalesRevenueNet", False)
+        index.record("0000000001", "Revenues", True)
+        index.flush()
+        self.assertTrue(TagIndex(self.path).is_missing("0000000001", "SalesRevenueNet"), "Checking the persisted 404")
+        self.assertFalse(TagIndex(self.path).is_missing("0000000001", "Revenues"), "Checking found tags aren't missing")
+        self.assertFalse(index.is_missing("0000000002", "Revenues"), "Checking unknown companies aren't skipped")
+
+    def test_changes_are_written_in_batches(self):
+        writes = []
+
+        class CountingTagIndex(TagIndex):
+            def _save(self, content):
+                writes.append(content)
+                super()._save(content)
+        index = CountingTagIndex(self.path, flush_every=100, flush_interval=float('inf'))
+        for company in range(100):
+            for tag in range(10):
+                index.record(str(company).zfill(10), "Tag" + str(tag), False)
+        self.assertEqual(len(writes), 10, "Checking 1000 404s were written every 100 changes rather than each")
+        index.record("0000000001", "Revenues", False)
+        index.flush()
+        index.flush()
+        self.assertEqual(len(writes), 11, "Checking flush writes pending changes, and only them")
+        self.assertTrue(TagIndex(self.path).is_missing("0000000099", "Tag9"), "Checking every change was persisted")
+
+    def test_seeded_from_company_facts(self):
+        index = TagIndex(self.path)
+        index.seed("0000000001", {"facts": {"us-gaap": {"Revenues": {}}}})
+        self.assertTrue(index.is_missing("0000000001", "SalesRevenueNet"), "Checking unlisted tags are missing")
+        self.assertFalse(index.is_missing("0000000001", "Revenues"), "Checking listed tags aren't missing")
+        index.invalidate("0000000001")
+        self.assertFalse(index.is_missing("0000000001", "SalesRevenueNet"), "Checking the company was forgotten")
+
+    def test_outdated_knowledge_is_forgotten(self):
+        index = TagIndex(None, max_age=0.05)
+        index.record("0000000001", "SalesRevenueNet", False)
+        time.sleep(0.1)
+        self.assertFalse(index.is_missing("0000000001", "SalesRevenueNet"), "Checking newly adopted tags are retried")
+
+    def test_known_missing_tags_are_not_requested(self):
+        with StandInServer(synthetic_sec_payloads(COMPANIES)) as server:
+            point_library_at(self, server)
+            fin_data = FinData(series_cache=SeriesCache(max_bytes=0))
+            first = fin_data.get_revenue('SYN', 2016, 1, 2019, 4)
+            first_requests = len(concept_requests(server))
+            del server.requests[:]
+            second = fin_data.get_revenue('SYN', 2016, 1, 2019, 4)
+            self.assertEqual(concept_requests(server), ["/api/xbrl/companyconcept/CIK0000000001/us-gaap/Revenues.json"],
+                             "Checking only the reported tag was requested again")
+            self.assertGreater(first_requests, 1, "Checking the first call had to try the other revenue tags")
+            self.assertTrue((first == second).all(), "Checking skipping the missing tags didn't change the data")
+            fin_data.get_statement('SYN', ['revenue'])
+            del server.requests[:]
+            fin_data.get_net_profit('SYN', 2016, 1, 2019, 4)
+            self.assertEqual(len(concept_requests(server)), 1,
+                             "Checking the companyfacts document seeded the tags of metrics never asked for")
@@ -0,0 +1,44 @@
+from unittest import TestCase
+import historicalFinancialData.utils as ut
+from historicalFinancialData.transport import Transport
+from historicalFinancialData.exceptions import HttpError, NotFoundError
+from stand_in_server import StandInServer
+
+"""
+test_transport.py - Testing script for the pooled, retrying HTTP layer, runs against a local stand-in for the SEC API
+"""
+
+PATH = "/api/xbrl/companyconcept/CIK0000000001/us-gaap/Revenues.json"
+PAYLOAD = {"cik": 1, "tag": "Revenues", "units": {"USD": []}}
+
+
+class TestTransport(TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, ut, 'transport', ut.transport)
+
+    def test_transient_failures_are_retried(self):
+        ut.transport = Transport(backoff=0.01)
+        with StandInServer({PATH: PAYLOAD}) as server:
+            server.failures[PATH] = 2
+            self.assertEqual(ut.get_url_data(server.url + PATH), PAYLOAD, "Checking the data survived the failures")
+        self.assertEqual(len(server.requests), 3, "Checking the request was retried until it succeeded")
+
+    def test_persistent_failures_are_raised(self):
+        ut.transport = Transport(max_retries=1, backoff=0.01)
+        with StandInServer({PATH: PAYLOAD}) as server:
+            server.failures[PATH] = 5
+            with self.assertRaises(HttpError, msg="Checking a persistent failure isn't silently dropped"):
+                ut.get_url_data(server.url + PATH)
+        self.assertEqual(len(server.requests), 2, "Checking the request was retried as many times as configured")
+
+    def test_streamed_failures_release_their_connection(self):
+        ut.transport = Transport(backoff=0.01)
+        missing = "/api/xbrl/companyconcept/CIK0000000001/us-gaap/SalesRevenueNet.json"
+        with StandInServer({PATH: PAYLOAD}, keep_alive=True) as server:
+            server.failures[PATH] = 2
+            for _ in range(20):
+                with self.assertRaises(NotFoundError):
+                    ut.get_url_data(server.url + missing, fact_tables=True)
+            self.assertIn("USD", ut.get_url_data(server.url + PATH, fact_tables=True)["units"])
+        self.assertEqual(len(server.requests), 23)
+        self.assertEqual(server.connections, 1, "Checking streamed 404s and retried 503s left the connection reusable")
@@ -6,6 +6,15 @@ A library for public companies' historical financial data reported on a quarterl
 
 from . import main
 from historicalFinancialData.main import FinData
+from historicalFinancialData.async_main import AsyncFinData
+from historicalFinancialData.cache import ResponseCache, SeriesCache
+from historicalFinancialData.store import ColumnarStore
+from historicalFinancialData.limiter import TokenBucket
+from historicalFinancialData.transport import Transport, AsyncTransport
+from historicalFinancialData.directory import CompanyDirectory
+from historicalFinancialData.tags import TagIndex
+from historicalFinancialData.stats import Stats, logging_hook
+from historicalFinancialData.service import FinDataService, FinDataClient
 
 __version__ = "0.1.3"
 __author__ = 'Daniel Mistrik'
@@ -0,0 +1,126 @@
+"""
+asof.py - Point-in-time (as-of) series: a company's quarters as they were known on a given date, from the filings made
+          up to it, instead of the latest (possibly restated) values. Every version of a series' facts is indexed once
+          by the date it was filed, so any date is then answered by a binary search rather than by cleaning the facts
+          again, i.e. for the thousands of dates of a backtest
+"""
+import contextvars
+import numpy as np
+import historicalFinancialData.utils as ut
+from historicalFinancialData.exceptions import *
+from historicalFinancialData.parser import decode_facts, concatenate_tables, distinct_mask
+from historicalFinancialData.columnar import COLUMN_DTYPES
+from historicalFinancialData.store import PERIODIC_FORMS
+
+
+"Carries the last known value of every column forward over the rows (dates) where it isn't known, NaN before the first"
+def forward_fill(values):
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return values[rows, np.arange(values.shape[1])]
+
+
+class VersionIndex:
+    """
+    VersionIndex - Every version of a cleaned series' quarters by filing date: a (dates x quarters) array holding the
+    value each quarter had as of each date a fact of the series was filed, NaN while it wasn't reported yet. Quarters
+    the company only reports through its 10-K (i.e. most Q4s) are the yearly value less the other three quarters as
+    known on each date. Quarters whose facts can't be found keep their latest value from the last filing date on only,
+    so no value is ever known earlier than it was
+    """
+    def __init__(self, columns, tables, allow_negatives=True):
+        """
+        :param columns: Typed columns (see columnar.py) of the series' latest cleaned values, as get_data returns them
+        :param tables: FactTables of the tags the series was cleaned out of
+        :param allow_negatives: Whether quarters worked out from the yearly value can be negative, as in get_data
+        """
+        self.periods, self.start, self.end = columns["period"], columns["start"], columns["end"]
+        facts = concatenate_tables([table for table in tables if len(table)] or [decode_facts([])])
+        durations = (facts.end - facts.start).astype(np.int64)
+        # Only the facts of periodic reports are versions of the series' quarters
+        periodic = distinct_mask(facts.form, lambda form: form in PERIODIC_FORMS) & ~np.isnat(facts.filed)
+        quarterly = periodic & (~facts.has_start | ((60 < durations) & (durations < 100)))
+        yearly = periodic & facts.has_start & (330 < durations) & (durations < 380)
+        self.dates = np.unique(facts.filed[quarterly | yearly])
+        # Facts are matched to the quarter of the series ending on the same day
+        known_ends = ~np.isnat(self.end)
+        by_end = np.flatnonzero(known_ends)[np.argsort(self.end[known_ends], kind='stable')]
+        reported = self._versions(facts, quarterly, by_end)
+        yearly_values = self._versions(facts, yearly, by_end)
+        values = forward_fill(reported)
+        yearly_values = forward_fill(yearly_values)
+        # Quarters without any reported version are worked out from their year, once all of its parts are known
+        years = self.periods.astype('U4')
+        for column in np.flatnonzero(np.isnan(reported).all(axis=0)):
+            in_year = np.flatnonzero(years == years[column])
+            if len(in_year) != 4:
+                continue
+            year_end = in_year[np.argmax(self.end[in_year].astype(np.int64))]
+            others = in_year[in_year != column]
+            derived = yearly_values[:, year_end] - values[:, others].sum(axis=1)
+            if not allow_negatives:
+                derived[derived <= 0] = np.nan
+            values[:, column] = derived
+        # As of the last filing the series is the latest cleaned one, quarters not found above being known from then on
+        if len(values):
+            unknown = np.isnan(values[-1])
+            values[-1, unknown] = columns["value"][unknown]
+        self.values = values
+
+    def _versions(self, facts, mask, by_end):
+        """(dates x quarters) array of the masked facts' values, on the date each was filed, NaN elsewhere. Of several
+        versions filed the same day the one listed last wins, as in unique()"""
+        versions = np.full((len(self.dates), len(self.periods)), np.nan)
+        indices = np.flatnonzero(mask)
+        if not len(indices) or not len(by_end):
+            return versions
+        ends = self.end[by_end]
+        positions = np.minimum(np.searchsorted(ends, facts.end[indices]), len(ends) - 1)
+        matched = ends[positions] == facts.end[indices]
+        indices, columns = indices[matched], by_end[positions[matched]]
+        rows = np.searchsorted(self.dates, facts.filed[indices])
+        # Keeps the last of the facts landing on the same date and quarter
+        keys = (rows * len(self.periods) + columns)[::-1]
+        _, last = np.unique(keys, return_index=True)
+        last = len(keys) - 1 - last
+        versions[rows[last], columns[last]] = facts.val[indices[last]].astype(float)
+        return versions
+
+    @property
+    def nbytes(self):
+        return self.periods.nbytes + self.start.nbytes + self.end.nbytes + self.dates.nbytes + self.values.nbytes
+
+    def as_of(self, date):
+        """Returns the typed columns of the quarters known on the date (a date, datetime64 or ISO string), valued as
+        they were then"""
+        row = np.searchsorted(self.dates, np.datetime64(date, 'D'), side='right') - 1
+        if row < 0:
+            return {"period": self.periods[:0], "value": np.empty(0, dtype=COLUMN_DTYPES["value"]),
+                    "start": self.start[:0], "end": self.end[:0]}
+        known = ~np.isnan(self.values[row])
+        return {"period": self.periods[known], "value": self.values[row][known], "start": self.start[known],
+                "end": self.end[known]}
+
+
+"""Returns a company's full cleaned series, as get_data does, along with the FactTables of the tags it was cleaned
+    out of. Each tag is requested once, get_data being answered out of the same responses"""
+def get_versioned_series(cik, jargon_terms, data_title, allow_negatives=True):
+    responses, tables = dict(ut.prefetched_responses.get() or {}), []
+    for tag in jargon_terms:
+        if ut.tag_index is not None and ut.tag_index.is_missing(cik, tag):
+            continue  # get_data skips it as well
+        url = ut.sec_url.format(cik, tag)
+        try:
+            payload = ut.get_url_data(url, fact_tables=True)
+        except NotFoundError as e:
+            responses[url] = e
+            continue
+        # Like get_spec_data_given_url only the first unit is used, decoded once for both
+        unit, facts = next(iter(payload["units"].items()))
+        table = decode_facts(facts)
+        responses[url] = {"units": {unit: table}}
+        tables.append(table)
+    context = contextvars.copy_context()
+    context.run(ut.prefetched_responses.set, responses)
+    series = context.run(ut.get_data, cik, jargon_terms, data_title, allow_negatives=allow_negatives)
+    return series, tables
@@ -0,0 +1,260 @@
+import asyncio
+import functools
+import contextvars
+import historicalFinancialData.utils as ut
+import historicalFinancialData.frames as frames
+from historicalFinancialData.exceptions import *
+from historicalFinancialData.main import FinData
+from historicalFinancialData.transport import AsyncTransport
+from historicalFinancialData.derived import DERIVED_METRICS
+
+"""
+async_main.py - AsyncFinData, FinData for asyncio services. Every SEC request a call needs is made concurrently on the
+                event loop, sharing the library's rate limiter, then the call itself (parsing and filling the data,
+                which is CPU bound) runs in a worker thread out of the retrieved responses so the loop is never blocked
+"""
+
+
+class AsyncFinData(FinData):
+    """
+    AsyncFinData - The same public methods as FinData, as coroutines. Many calls can be awaited at the same time, i.e.
+    with asyncio.gather, and their requests overlap within the SEC's limit. Requires aiohttp, the async extra
+    """
+    # Transport shared by the AsyncFinData objects that aren't given one, created on first use
+    _default_transport = None
+
+    def __init__(self, cache=None, store=None, rate_limiter=None, transport=None, directory=None, series_cache=None,
+                 tag_index=None, stats=None):
+        """
+        :param transport: Optional AsyncTransport, the pooled aiohttp session the requests go through, to configure its
+        pool size, retries and timeouts. By default one is shared by every AsyncFinData object. Unlike FinData's it
+        doesn't replace the library's (synchronous) transport
+        The other parameters are FinData's, the cache, rate limiter, tag index and stats being shared with FinData
+        """
+        super().__init__(cache, store, rate_limiter, None, directory, series_cache, tag_index, stats)
+        if transport is None:
+            if AsyncFinData._default_transport is None:
+                AsyncFinData._default_transport = AsyncTransport()
+            transport = AsyncFinData._default_transport
+        self.transport = transport
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        """Closes the transport's session of the running event loop"""
+        await self.transport.close()
+
+    async def _get_url_data(self, url, fact_tables=False):
+        """Helper function retrieving and decoding a response like get_url_data does, through the response cache, but
+        requesting it on the event loop. Decoding and disk access happen in worker threads"""
+        stream = fact_tables and ut.streaming_decode
+        cache = ut.response_cache
+        cached = await asyncio.to_thread(cache.lookup, url) if cache is not None else None
+        if cached is not None and cache.is_fresh(cached):
+            if ut.stats is not None:
+                ut.stats.record_cache("response_cache", "hit")
+            return await asyncio.to_thread(ut.decode_json, cached.content, stream)
+        if ut.stats is not None and cache is not None:
+            ut.stats.record_cache("response_cache", "miss" if cached is None else "stale")
+        r = await self.transport.get(url, cached.validators() if cached is not None else None, ut.rate_limiter,
+                                     ut.stats)
+        if ut.stats is not None:
+            ut.stats.record_request(url, r.status_code, len(r.content))
+        ut.raise_for_status(r, cached is not None)
+        if r.status_code == 304:
+            await asyncio.to_thread(cache.refresh, url, cached)
+            return await asyncio.to_thread(ut.decode_json, cached.content, stream)
+        if cache is not None:
+            await asyncio.to_thread(cache.store, url, r.content, r.headers)
+        return await asyncio.to_thread(ut.decode_json, r.content, stream)
+
+    async def _prefetch(self, urls, fact_tables=False):
+        """Helper function retrieving the URLs concurrently, returns {url: payload} with the library's exceptions in
+        place of the payloads that failed, which get_url_data raises again when the call asks for them"""
+
+        async def fetch(url):
+            try:
+                return await self._get_url_data(url, fact_tables)
+            except (HttpError, ForbiddenError) as e:
+                return e
+        urls = list(dict.fromkeys(urls))
+        return dict(zip(urls, await asyncio.gather(*[fetch(url) for url in urls])))
+
+    async def _run(self, method, plan_urls, *args, fact_tables=False, **kwargs):
+        """Helper function prefetching the URLs plan_urls returns (it is called in a worker thread, as resolving tickers
+        can read the disk) then running FinData's method in a worker thread, where every request it makes for one of
+        them is answered out of the prefetched responses. Those it didn't foresee are still made, synchronously. The
+        series plan_urls found in the series cache are the ones the method uses, so that a series expiring in between
+        can't leave the method without its requests"""
+        series = {}
+
+        def plan():
+            ut.prefetched_series.set(series)
+            return plan_urls()
+        responses = await self._prefetch(await asyncio.to_thread(plan), fact_tables)
+        context = contextvars.copy_context()
+        context.run(ut.prefetched_responses.set, responses)
+        context.run(ut.prefetched_series.set, series)
+        return await asyncio.get_running_loop().run_in_executor(
+            None, context.run, functools.partial(method, self, *args, **kwargs))
+
+    def _concept_urls(self, tickers, metrics, as_of=None):
+        """Helper function returning the companyconcept URLs the metrics of the tickers are fetched from: every tag of
+        their jargon that the tag index doesn't know to be missing, unless the series (or for as_of, its versions) is
+        in the series cache"""
+        if self._store is not None:
+            return []
+        urls = []
+        for ticker in tickers:
+            try:
+                cik = self._get_cik(ticker)
+            except (InvalidTickerError, HttpError, ForbiddenError):
+                continue  # The call itself reports it
+            for metric in metrics:
+                key = (cik, metric) if as_of is None else (cik, metric, "versions")
+                if metric not in self._metrics or self._lookup_series(key) is not None:
+                    continue
+                urls += [ut.sec_url.format(cik, tag) for tag in self._metrics[metric][0]
+                         if ut.tag_index is None or not ut.tag_index.is_missing(cik, tag)]
+        return urls
+
+    def _company_facts_urls(self, ticker, metrics):
+        """Helper function returning the companyfacts URL get_statement reads the metrics from, if it needs it"""
+        metrics = list(self._metrics) if metrics is None else metrics
+        try:
+            cik = self._get_cik(ticker)
+        except (InvalidTickerError, HttpError, ForbiddenError):
+            return []
+        if self._store is not None or all(self._lookup_series((cik, metric)) is not None for metric in metrics):
+            return []
+        return [ut.company_facts_url.format(cik)]
+
+    def _panel_urls(self, tickers, metrics):
+        """Helper function returning the companyfacts URLs get_panel reads the tickers' metrics from"""
+        return [url for ticker in dict.fromkeys(tickers) for url in self._company_facts_urls(ticker, metrics)]
+
+    def _frame_urls(self, metric, year, quarter, fill_fourth_quarter):
+        """Helper function returning the frames URLs get_cross_section requests for the metric"""
+        if metric not in self._metrics or quarter not in (1, 2, 3, 4):
+            return []
+        instant = metric in self._instant_metrics
+        periods = [frames.frame_period(year, quarter, instant)]
+        if quarter == 4 and not instant and fill_fourth_quarter:
+            periods += [frames.frame_period(year)] + [frames.frame_period(year, i) for i in range(1, 4)]
+        unit = self._frame_units.get(metric, "USD")
+        return [ut.frames_url.format(tag, unit, period) for tag in self._metrics[metric][0] for period in periods]
+
+    async def get_revenue(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
+                          mute_warnings=False, output='array', as_of=None):
+        """get_revenue - Awaitable FinData.get_revenue, see it for the parameters and return"""
+        return await self._run(FinData.get_revenue, functools.partial(self._concept_urls, [ticker], ["revenue"], as_of),
+                               ticker, start_year, start_quarter, end_year, end_quarter, mute_warnings, output,
+                               as_of, fact_tables=True)
+
+    async def get_dates(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5, mute_warnings=False,
+                        output='array', as_of=None):
+        """get_dates - Awaitable FinData.get_dates, see it for the parameters and return"""
+        return await self._run(FinData.get_dates, functools.partial(self._concept_urls, [ticker], ["revenue"], as_of),
+                               ticker, start_year, start_quarter, end_year, end_quarter, mute_warnings, output,
+                               as_of, fact_tables=True)
+
+    async def get_cost_of_revenue(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
+                                  mute_warnings=False, output='array', as_of=None):
+        """get_cost_of_revenue - Awaitable FinData.get_cost_of_revenue, see it for the parameters and return"""
+        return await self._run(FinData.get_cost_of_revenue,
+                               functools.partial(self._concept_urls, [ticker], ["cost_of_revenue"], as_of),
+                               ticker, start_year, start_quarter, end_year, end_quarter, mute_warnings, output,
+                               as_of, fact_tables=True)
+
+    async def get_gross_profit(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
+                               mute_warnings=False, output='array', as_of=None):
+        """get_gross_profit - Awaitable FinData.get_gross_profit, see it for the parameters and return"""
+        return await self._run(FinData.get_gross_profit,
+                               functools.partial(self._concept_urls, [ticker], ["gross_profit"], as_of),
+                               ticker, start_year, start_quarter, end_year, end_quarter, mute_warnings, output,
+                               as_of, fact_tables=True)
+
+    async def get_operating_income(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
+                                   mute_warnings=False, output='array', as_of=None):
+        """get_operating_income - Awaitable FinData.get_operating_income, see it for the parameters and return"""
+        return await self._run(FinData.get_operating_income,
+                               functools.partial(self._concept_urls, [ticker], ["operating_income"], as_of),
+                               ticker, start_year, start_quarter, end_year, end_quarter, mute_warnings, output,
+                               as_of, fact_tables=True)
+
+    async def get_net_profit(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
+                             mute_warnings=False, output='array', as_of=None):
+        """get_net_profit - Awaitable FinData.get_net_profit, see it for the parameters and return"""
+        return await self._run(FinData.get_net_profit,
+                               functools.partial(self._concept_urls, [ticker], ["net_profit"], as_of),
+                               ticker, start_year, start_quarter, end_year, end_quarter, mute_warnings, output,
+                               as_of, fact_tables=True)
+
+    async def get_eps(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5, is_diluted=False,
+                      mute_warnings=False, output='array', as_of=None):
+        """get_eps - Awaitable FinData.get_eps, see it for the parameters and return"""
+        metric = "eps_diluted" if is_diluted else "eps_basic"
+        return await self._run(FinData.get_eps, functools.partial(self._concept_urls, [ticker], [metric], as_of),
+                               ticker, start_year, start_quarter, end_year, end_quarter, is_diluted, mute_warnings,
+                               output, as_of, fact_tables=True)
+
+    async def get_total_assets(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
+                               mute_warnings=False, output='array', as_of=None):
+        """get_total_assets - Awaitable FinData.get_total_assets, see it for the parameters and return"""
+        return await self._run(FinData.get_total_assets,
+                               functools.partial(self._concept_urls, [ticker], ["total_assets"], as_of),
+                               ticker, start_year, start_quarter, end_year, end_quarter, mute_warnings, output,
+                               as_of, fact_tables=True)
+
+    async def get_total_liabilities(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
+                                    mute_warnings=False, output='array', as_of=None):
+        """get_total_liabilities - Awaitable FinData.get_total_liabilities, see it for the parameters and return"""
+        return await self._run(FinData.get_total_liabilities,
+                               functools.partial(self._concept_urls, [ticker], ["total_liabilities"], as_of),
+                               ticker, start_year, start_quarter, end_year, end_quarter, mute_warnings, output,
+                               as_of, fact_tables=True)
+
+    async def get_statement(self, ticker, metrics=None, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
+                            mute_warnings=False, output='array'):
+        """get_statement - Awaitable FinData.get_statement, see it for the parameters and return"""
+        return await self._run(FinData.get_statement, functools.partial(self._company_facts_urls, ticker, metrics),
+                               ticker, metrics, start_year, start_quarter, end_year, end_quarter, mute_warnings,
+                               output, fact_tables=True)
+
+    async def get_many(self, tickers, metric, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
+                       max_workers=8, output='array'):
+        """get_many - Awaitable FinData.get_many, see it for the parameters and return. Every ticker's requests are made
+        concurrently, max_workers only bounds the threads parsing them"""
+        return await self._run(FinData.get_many, functools.partial(self._concept_urls, tickers, [metric]),
+                               tickers, metric, start_year, start_quarter, end_year, end_quarter, max_workers, output,
+                               fact_tables=True)
+
+    async def get_derived(self, tickers, metrics, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
+                          formulas=None, max_workers=8, output='array'):
+        """get_derived - Awaitable FinData.get_derived, see it for the parameters and return. Every base series'
+        requests are made concurrently, max_workers only bounds the threads parsing them"""
+        derived_metrics = DERIVED_METRICS if formulas is None else DERIVED_METRICS | formulas
+        base_metrics = list(dict.fromkeys(base_metric for metric in metrics if metric in derived_metrics
+                                          for base_metric in derived_metrics[metric][0]))
+        return await self._run(FinData.get_derived, functools.partial(self._concept_urls, tickers, base_metrics),
+                               tickers, metrics, start_year, start_quarter, end_year, end_quarter, formulas,
+                               max_workers, output, fact_tables=True)
+
+    async def get_panel(self, tickers, metrics=None, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
+                        calendar=True, max_workers=8):
+        """get_panel - Awaitable FinData.get_panel, see it for the parameters and return. Every ticker's companyfacts
+        document is requested concurrently, max_workers only bounds the threads parsing them"""
+        return await self._run(FinData.get_panel, functools.partial(self._panel_urls, tickers, metrics), tickers,
+                               metrics, start_year, start_quarter, end_year, end_quarter, calendar, max_workers,
+                               fact_tables=True)
+
+    async def get_cross_section(self, metric, year, quarter, fill_fourth_quarter=True, mute_warnings=False,
+                                output='array'):
+        """get_cross_section - Awaitable FinData.get_cross_section, see it for the parameters and return"""
+        return await self._run(FinData.get_cross_section,
+                               functools.partial(self._frame_urls, metric, year, quarter, fill_fourth_quarter),
+                               metric, year, quarter, fill_fourth_quarter, mute_warnings, output)
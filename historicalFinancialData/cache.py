@@ -0,0 +1,235 @@
+"""
+cache.py - Persistent on-disk cache for SEC API responses. Entries are keyed by the request path, so for companyconcept
+           calls one entry corresponds to one (CIK, us-gaap tag) pair, and are stored as one file each so several
+           processes can share the same cache directory without any locking. Also holds the in-memory cache of cleaned
+           series, which saves re-cleaning the data (not only re-downloading it) when a company is asked for again
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+import numpy as np
+
+# Prefix of the files being written, they are skipped by lookups and eviction until they are atomically renamed
+_TEMP_PREFIX = ".tmp-"
+
+
+class CachedResponse:
+    """A single cached SEC response, its body and the validators needed to revalidate it with the SEC"""
+
+    def __init__(self, content, fetched, etag=None, last_modified=None):
+        self.content = content
+        self.fetched = fetched
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def validators(self):
+        """Returns the conditional request headers that let the SEC answer with a 304 if the data hasn't changed"""
+        headers = {}
+        if self.etag is not None:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified is not None:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    ResponseCache - Stores raw SEC responses on disk. Fresh entries (younger than the TTL) are served without touching
+    the network, stale entries are revalidated with a conditional request and the least recently used entries are
+    evicted once the cache grows past max_bytes. Writes go to a temporary file that is atomically renamed into place,
+    so concurrent readers and writers, in the same or different processes, never see a partially written entry.
+    """
+
+    def __init__(self, directory, ttl=24 * 60 * 60, max_bytes=1024 ** 3):
+        """
+        :param directory: The directory the cache lives in, it is created if it doesn't exist
+        :param ttl: Number of seconds a response is served as is before being revalidated with the SEC, default is a day
+        :param max_bytes: Size the cache directory is kept under by evicting the least recently used entries
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._approx_bytes = None  # Lazily computed, other processes can also write so it is only an estimate
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url):
+        """Maps a url to its cache file, ignoring the host so a stand-in server shares the same entries"""
+        parsed = urlparse(url)
+        parts = [part for part in parsed.path.split('/') if part]
+        if parsed.query:
+            parts[-1] += '_' + parsed.query.replace('/', '_').replace('&', '_')
+        if not parts or any(part in ('.', '..') for part in parts):
+            raise ValueError("Url cannot be mapped to a cache entry: " + url)
+        return os.path.join(self.directory, *parts)
+
+    def lookup(self, url):
+        """Returns the CachedResponse for the url or None if there is no (readable) entry"""
+        path = self._path(url)
+        try:
+            with open(path, 'rb') as f:
+                metadata = json.loads(f.readline())
+                content = f.read()
+            # Mark the entry as recently used for the eviction order
+            os.utime(path)
+        except (OSError, ValueError):
+            return None  # Missing, evicted by another process in the meantime or corrupted, all count as a miss
+        return CachedResponse(content, metadata["fetched"], metadata.get("etag"), metadata.get("last_modified"))
+
+    def is_fresh(self, entry):
+        """Whether the entry can be used without asking the SEC if it changed"""
+        return time.time() - entry.fetched < self.ttl
+
+    def store(self, url, content, headers):
+        """Stores the response body along with the validators found in the response headers"""
+        entry = CachedResponse(content, time.time(), headers.get('ETag'), headers.get('Last-Modified'))
+        self._write(self._path(url), entry)
+
+    def refresh(self, url, entry):
+        """Restarts the TTL of an entry the SEC confirmed (304) is still up-to-date"""
+        entry.fetched = time.time()
+        self._write(self._path(url), entry)
+
+    def _write(self, path, entry):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        metadata = {"fetched": entry.fetched, "etag": entry.etag, "last_modified": entry.last_modified}
+        header = json.dumps(metadata).encode('utf-8') + b'\n'
+        fd, temp_path = tempfile.mkstemp(prefix=_TEMP_PREFIX, dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(header)
+                f.write(entry.content)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        if self._approx_bytes is not None:
+            self._approx_bytes += len(header) + len(entry.content)
+        self._evict_if_needed()
+
+    def _entries(self):
+        """Returns (last used time, size, path) of every entry in the cache"""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith(_TEMP_PREFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict_if_needed(self):
+        # Only walk the directory when our running estimate says we might be over the limit
+        if self._approx_bytes is not None and self._approx_bytes <= self.max_bytes:
+            return
+        entries = self._entries()
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Another process got to it first
+            total_bytes -= size
+        self._approx_bytes = total_bytes
+
+    def clear(self):
+        """Removes every entry in the cache"""
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._approx_bytes = 0
+
+
+"Approximate memory of an object array, including every (distinct) object it points to"
+def _object_array_bytes(data):
+    objects = {id(item): item for item in data.flat if item is not None}
+    return data.nbytes + sum(sys.getsizeof(item) for item in objects.values())
+
+
+class SeriesCache:
+    """
+    SeriesCache - Keeps the full cleaned quarterly series of (CIK, metric) pairs in memory, so any date range of them is
+    answered by slicing instead of requesting and cleaning the SEC's data again. The least recently used series are
+    evicted once the cache holds more than max_bytes and series older than the TTL are fetched again, so new filings
+    show up in long running processes. Safe to share between threads
+    """
+
+    def __init__(self, max_bytes=64 * 1024 ** 2, ttl=24 * 60 * 60):
+        """
+        :param max_bytes: Approximate memory the cached series are kept under, 0 disables the cache
+        :param ttl: Number of seconds a series is served for before it is fetched again, default is a day
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # Key to (series, time it was stored, bytes), in least to most recently used order
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits, self._misses, self._evictions = 0, 0, 0
+
+    def _fresh_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is not None and time.time() - entry[1] >= self.ttl:
+            self._remove(key)
+            return None
+        return entry
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        """Returns the cached series or None if it isn't cached (or is outdated), counting a hit or a miss"""
+        with self._lock:
+            entry = self._fresh_entry(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def __contains__(self, key):
+        """Whether the series is cached and up-to-date, without counting a hit or a miss"""
+        with self._lock:
+            return self._fresh_entry(key) is not None
+
+    def put(self, key, series):
+        """Caches the series, a CompactSeries or an object array (or any object reporting its nbytes, i.e. a
+        VersionIndex), evicting the least recently used ones if the cache grows too large"""
+        size = _object_array_bytes(series) if isinstance(series, np.ndarray) else series.nbytes
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return  # It would evict everything else and still not fit
+            self._entries[key] = (series, time.time(), size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def stats(self):
+        """Returns the number of hits, misses and evictions so far, the number of cached series and their bytes"""
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses, "evictions": self._evictions,
+                    "series": len(self._entries), "bytes": self._bytes}
+
+    def clear(self):
+        """Removes every cached series"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
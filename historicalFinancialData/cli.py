@@ -0,0 +1,29 @@
+"""
+cli.py - The hfd command, a single entry point to the library's command line tools, each of which also runs on its own
+         with python -m historicalFinancialData.<module>
+
+         Usage: hfd export ... | hfd ingest ... | hfd sync ... | hfd serve ... (hfd <command> --help describes each
+                command's arguments)
+"""
+import sys
+import importlib
+
+# The modules implementing each command, imported only when their command is run
+COMMANDS = {"export": ("historicalFinancialData.export", "Export metrics of many tickers into partitioned files"),
+            "ingest": ("historicalFinancialData.store", "Ingest the SEC's bulk companyfacts.zip archive into a store"),
+            "sync": ("historicalFinancialData.sync", "Refresh a store with the companies that filed since"),
+            "serve": ("historicalFinancialData.service", "Serve the FinData methods over local HTTP/JSON")}
+
+
+def main(args=None):
+    args = sys.argv[1:] if args is None else args
+    if not args or args[0] not in COMMANDS:
+        print("Usage: hfd <command> [arguments]\n\nCommands:", file=sys.stderr)
+        for command, (_, description) in COMMANDS.items():
+            print("  " + command.ljust(8) + description, file=sys.stderr)
+        return 0 if args and args[0] in ("-h", "--help") else 2
+    return importlib.import_module(COMMANDS[args[0]][0]).main(args[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
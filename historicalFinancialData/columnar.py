@@ -0,0 +1,105 @@
+"""
+columnar.py - Conversions between the labeled object arrays the library returns and typed per-column arrays (U6 time
+              periods, float64 values and datetime64[D] dates) which are compact to store and fast to slice
+"""
+import numpy as np
+
+# Column names, in the order they appear in the library's labeled arrays
+COLUMNS = ("period", "value", "start", "end")
+COLUMN_DTYPES = {"period": "U6", "value": "f8", "start": "M8[D]", "end": "M8[D]"}
+# Fields of a CompactSeries, the columns and whether each value was an integer, shared so no series holds its own dtype
+COMPACT_DTYPE = np.dtype([(name, COLUMN_DTYPES[name]) for name in COLUMNS] + [("integral", "?")])
+
+
+"Converts a labeled array (first row is the column names) as returned by get_data into a dictionary of typed columns"
+def to_columns(data):
+    rows = data[1:]
+    return {"period": rows[:, 0].astype(COLUMN_DTYPES["period"]),
+            "value": rows[:, 1].astype(COLUMN_DTYPES["value"]),
+            # Dates the library couldn't work out are None, which become NaT
+            "start": np.array([np.datetime64('NaT') if x is None else x for x in rows[:, 2]], COLUMN_DTYPES["start"]),
+            "end": np.array([np.datetime64('NaT') if x is None else x for x in rows[:, 3]], COLUMN_DTYPES["end"])}
+
+
+"Converts typed NaT-able datetime64 dates back into the datetime objects (or None) the library returns"
+def _to_datetime_objects(dates):
+    objects = dates.astype('M8[us]').astype(object)
+    objects[np.isnat(dates)] = None
+    return objects
+
+
+"""Converts a dictionary of typed columns back into the library's labeled array, with data_title as the value column
+    name. If the columns include which values were integers (an integral column) those are returned as integers"""
+def from_columns(columns, data_title):
+    header = np.array(['Time-Period', data_title, 'Start of Quarter', 'End of Quarter'], dtype=object)
+    rows = np.empty((len(columns["period"]), 4), dtype=object)
+    rows[:, 0] = columns["period"].tolist()
+    rows[:, 1] = columns["value"].tolist()
+    if "integral" in columns:
+        # Values that were integers before being typed as float64 are returned as integers again
+        integral = columns["integral"]
+        rows[integral, 1] = columns["value"][integral].astype(np.int64).tolist()
+    rows[:, 2] = _to_datetime_objects(columns["start"])
+    rows[:, 3] = _to_datetime_objects(columns["end"])
+    return np.vstack([header, rows])
+
+
+"Vectorized equivalent of utils.is_in_date_bound, the mask of the time periods within the year and quarter bounds"
+def period_mask(periods, min_year, min_quarter, max_year, max_quarter):
+    periods = np.ascontiguousarray(periods, dtype=COLUMN_DTYPES["period"])
+    # Periods are always YYYYQN so the year is the first four characters and the quarter the sixth
+    years = periods.astype('U4').astype(int)
+    quarters = periods.view('U1').reshape(-1, 6)[:, 5].astype(int)
+    return (min_year <= years) & (years <= max_year) & ((min_year < years) | (min_quarter <= quarters)) & \
+           ((years < max_year) | (quarters <= max_quarter))
+
+
+"Vectorized equivalent of utils.correct_output, keeps the rows within the given year and quarter bounds"
+def slice_columns(columns, min_year, min_quarter, max_year, max_quarter):
+    mask = period_mask(columns["period"], min_year, min_quarter, max_year, max_quarter)
+    return {name: column[mask] for name, column in columns.items()}
+
+
+"Converts a dictionary of typed columns into a NumPy structured array with one field per column"
+def to_structured(columns):
+    structured = np.empty(len(columns["period"]), dtype=[(name, COLUMN_DTYPES[name]) for name in columns])
+    for name, column in columns.items():
+        structured[name] = column
+    return structured
+
+
+class CompactSeries:
+    """
+    CompactSeries - A cleaned series kept as a single structured array of fixed-width fields (U6 periods, float64
+    values, datetime64[D] dates) in place of the object array of boxed numbers and datetime objects get_data returns,
+    which takes several times the memory. Which values were integers is kept as a field too, so the rows converted back
+    are the very same the object array held
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, series):
+        """
+        :param series: The cleaned series as get_data returns it, without its column names row
+        """
+        columns = to_columns(np.vstack([np.empty(4, dtype=object), series]))
+        self.data = np.empty(len(series), dtype=COMPACT_DTYPE)
+        for name, column in columns.items():
+            self.data[name] = column
+        self.data["integral"] = [type(value) is int for value in series[:, 1].tolist()]
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes
+
+    @property
+    def columns(self):
+        """The series' typed columns, as to_columns returns them"""
+        return {name: self.data[name] for name in COLUMNS}
+
+    def rows(self, mask=None):
+        """Returns the (masked) rows as get_data's object array, without the column names row"""
+        data = self.data if mask is None else self.data[mask]
+        return from_columns({name: data[name] for name in COMPACT_DTYPE.names}, None)[1:]
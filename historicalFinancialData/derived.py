@@ -0,0 +1,143 @@
+"""
+derived.py - Metrics derived from the base ones (margins, trailing twelve months, growth, leverage), declared as formulas
+             over them. The base series of many companies are aligned, by fiscal quarter, on one grid of quarters so
+             every formula is evaluated once, vectorized over all of the companies and quarters at the same time. The
+             grid can be re-aligned by calendar quarter so companies with different fiscal years line up (get_panel)
+"""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from historicalFinancialData.columnar import COLUMN_DTYPES
+
+
+"The values of the quarters `quarters` before each quarter, NaN where there is no such quarter"
+def lag(values, quarters):
+    lagged = np.full(values.shape, np.nan)
+    lagged[:, quarters:] = values[:, :values.shape[1] - quarters]
+    return lagged
+
+
+"Sum of each quarter's value and the ones of the quarters before it, NaN unless every one of them is known"
+def rolling_sum(values, quarters):
+    sums = np.full(values.shape, np.nan)
+    if values.shape[1] >= quarters:
+        sums[:, quarters - 1:] = sliding_window_view(values, quarters, axis=1).sum(axis=-1)
+    return sums
+
+
+"Trailing twelve months, the sum of the last four quarters"
+def ttm(values):
+    return rolling_sum(values, 4)
+
+
+"Year over year growth, relative to the same quarter of the previous fiscal year"
+def yoy(values):
+    return values / lag(values, 4) - 1
+
+
+# Derived metrics that can be requested by name, each with the base metrics (see FinData._metrics) it is computed from,
+# its data title and its formula, which is given the base metrics' (companies x quarters) arrays in the same order
+DERIVED_METRICS = {
+    "gross_margin": (("revenue", "cost_of_revenue"), 'Gross Margin',
+                     lambda revenue, cost_of_revenue: (revenue - cost_of_revenue) / revenue),
+    "operating_margin": (("operating_income", "revenue"), 'Operating Margin',
+                         lambda operating_income, revenue: operating_income / revenue),
+    "net_margin": (("net_profit", "revenue"), 'Net Margin', lambda net_profit, revenue: net_profit / revenue),
+    "revenue_ttm": (("revenue",), 'Revenue (TTM)', ttm),
+    "net_profit_ttm": (("net_profit",), 'Net Profit (TTM)', ttm),
+    "eps_diluted_ttm": (("eps_diluted",), 'EPS (Diluted, TTM)', ttm),
+    "revenue_yoy": (("revenue",), 'Revenue Growth (YoY)', yoy),
+    "net_profit_yoy": (("net_profit",), 'Net Profit Growth (YoY)', yoy),
+    "leverage": (("total_liabilities", "total_assets"), 'Leverage (Liabilities/Assets)',
+                 lambda total_liabilities, total_assets: total_liabilities / total_assets)}
+
+
+"Index of YYYYQN time periods on a grid of consecutive quarters"
+def quarter_index(periods):
+    periods = np.ascontiguousarray(periods, dtype=COLUMN_DTYPES["period"])
+    return periods.astype('U4').astype(np.int64) * 4 + periods.view('U1').reshape(-1, 6)[:, 5].astype(np.int64) - 1
+
+
+"The YYYYQN time periods of quarter indices"
+def quarter_periods(indices):
+    return np.array([str(index // 4) + "Q" + str(index % 4 + 1) for index in indices.tolist()],
+                    dtype=COLUMN_DTYPES["period"])
+
+
+"""Index (as quarter_index) of the calendar quarter each fiscal quarter falls into, the one holding its midpoint (i.e.
+    the one it overlaps the most) like the SEC's frames. Quarters without a start date are taken to be 91 days long"""
+def calendar_quarter_index(start, end):
+    midpoint = np.where(np.isnat(start), end - np.timedelta64(45, 'D'), start + (end - start) // 2)
+    months = midpoint.astype('M8[M]').astype(np.int64)  # Since January 1970
+    return (months // 12 + 1970) * 4 + months % 12 // 3
+
+
+class QuarterGrid:
+    """
+    QuarterGrid - The series (typed columns, see columnar.py) of several base metrics for several companies, aligned by
+    fiscal quarter into (companies x quarters) arrays spanning every quarter any of them has, NaN where a company has
+    no value. Start and end dates are taken from the first metric that has the quarter
+    """
+    def __init__(self, series):
+        """
+        :param series: List, one per company, of dictionaries from base metric to its typed columns (or None if the
+        company doesn't report it)
+        """
+        indices = [quarter_index(columns["period"]) for company in series for columns in company.values()
+                   if columns is not None and len(columns["period"])]
+        self.first = min(index.min() for index in indices) if indices else 0
+        quarters = max(index.max() for index in indices) - self.first + 1 if indices else 0
+        self.periods = quarter_periods(np.arange(self.first, self.first + quarters))
+        self.values = {}
+        self.start = np.full((len(series), quarters), np.datetime64('NaT'), dtype=COLUMN_DTYPES["start"])
+        self.end = np.full((len(series), quarters), np.datetime64('NaT'), dtype=COLUMN_DTYPES["end"])
+        for company, metrics in enumerate(series):
+            for metric, columns in metrics.items():
+                values = self.values.setdefault(metric, np.full((len(series), quarters), np.nan))
+                if columns is None or not len(columns["period"]):
+                    continue
+                index = quarter_index(columns["period"]) - self.first
+                values[company, index] = columns["value"]
+                # Quarters whose dates are still unknown take them from this metric
+                unknown = np.isnat(self.end[company, index])
+                self.start[company, index[unknown]] = columns["start"][unknown]
+                self.end[company, index[unknown]] = columns["end"][unknown]
+
+    def calendar(self):
+        """Returns the grid re-aligned by calendar quarter (see calendar_quarter_index). Quarters whose dates are
+        unknown are left out and of two fiscal quarters falling into the same calendar quarter the later one is kept"""
+        companies, quarters = np.nonzero(~np.isnat(self.end))
+        order = np.argsort(self.end[companies, quarters], kind='stable')
+        companies, quarters = companies[order], quarters[order]
+        indices = calendar_quarter_index(self.start[companies, quarters], self.end[companies, quarters])
+        grid = QuarterGrid.__new__(QuarterGrid)
+        grid.first = indices.min() if len(indices) else 0
+        size = indices.max() - grid.first + 1 if len(indices) else 0
+        grid.periods = quarter_periods(np.arange(grid.first, grid.first + size))
+        # Keeps the last (latest ending) fiscal quarter landing on each company's calendar quarter
+        keys = (companies * size + indices - grid.first)[::-1]
+        _, last = np.unique(keys, return_index=True)
+        last = len(keys) - 1 - last
+        companies, quarters, columns = companies[last], quarters[last], indices[last] - grid.first
+        shape = (self.end.shape[0], size)
+        grid.values = {}
+        for metric, values in self.values.items():
+            grid.values[metric] = np.full(shape, np.nan)
+            grid.values[metric][companies, columns] = values[companies, quarters]
+        grid.start = np.full(shape, np.datetime64('NaT'), dtype=COLUMN_DTYPES["start"])
+        grid.end = np.full(shape, np.datetime64('NaT'), dtype=COLUMN_DTYPES["end"])
+        grid.start[companies, columns] = self.start[companies, quarters]
+        grid.end[companies, columns] = self.end[companies, quarters]
+        return grid
+
+    def evaluate(self, inputs, formula):
+        """Evaluates the formula over the inputs' arrays, non-finite results (i.e. divisions by zero) are NaN"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.asarray(formula(*[self.values[metric] for metric in inputs]), dtype=float)
+        values[~np.isfinite(values)] = np.nan
+        return values
+
+    def columns(self, company, values, mask):
+        """Returns the company's row of the values, as typed columns, for the known quarters within the mask"""
+        mask = mask & ~np.isnan(values[company])
+        return {"period": self.periods[mask], "value": values[company][mask], "start": self.start[company][mask],
+                "end": self.end[company][mask]}
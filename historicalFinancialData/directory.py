@@ -0,0 +1,125 @@
+"""
+directory.py - The SEC's directory of companies (ticker, CIK and name). Loaded lazily on the first lookup, persisted
+               locally and only downloaded again once it is older than its maximum age or when explicitly refreshed
+"""
+import os
+import re
+import sys
+import json
+import time
+import tempfile
+import threading
+import historicalFinancialData.utils as ut
+from historicalFinancialData.exceptions import *
+
+
+"Normalises a company name so lookups ignore case, punctuation and spacing, i.e. 'Apple Inc.' becomes 'apple inc'"
+def normalise_name(name):
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", name.casefold()).split())
+
+
+class CompanyDirectory:
+    """
+    CompanyDirectory - Maps tickers, CIKs and normalised company names to each other with dictionary (O(1)) lookups.
+    Constructing it is free, the SEC's company_tickers.json is only read (from the local copy if it is recent enough,
+    otherwise from the SEC) once a lookup needs it. CIKs are held as integers and tickers are interned, so the whole
+    SEC universe stays resident in a fraction of the memory zero-padded strings take; they are only padded on lookup.
+    """
+    url = "https://www.sec.gov/files/company_tickers.json"
+    default_path = os.path.join(os.path.expanduser("~"), ".cache", "historicalFinancialData", "company_tickers.json")
+
+    def __init__(self, path=default_path, max_age=7 * 24 * 60 * 60, tickers=None):
+        """
+        :param path: File the directory is persisted to, None to keep it in memory only
+        :param max_age: Seconds after which the directory is downloaded from the SEC again, default is a week
+        :param tickers: Optional company_tickers.json payload to use instead of the SEC's, it is never refreshed
+        """
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._ticker_cik_map, self._cik_ticker_map, self._name_cik_map = {}, {}, {}
+        if tickers is not None:
+            self._load(tickers, float('inf'))
+
+    def _load(self, json_output, loaded_at):
+        ticker_cik_map, cik_ticker_map, name_cik_map = {}, {}, {}
+        # The SEC returns an output of a dictionary with string numbers as keys, in order of the companies' size
+        for company in json_output.values():
+            ticker = sys.intern(company["ticker"])
+            company_cik = int(company["cik_str"])
+            ticker_cik_map[ticker] = company_cik
+            # Companies can have several tickers (i.e. share classes), the first (main) one is kept for reverse lookups
+            cik_ticker_map.setdefault(company_cik, ticker)
+            name_cik_map.setdefault(normalise_name(company["title"]), company_cik)
+        self._ticker_cik_map, self._cik_ticker_map, self._name_cik_map = ticker_cik_map, cik_ticker_map, name_cik_map
+        self._loaded_at = loaded_at
+
+    def _download(self):
+        r = ut.request_url(self.url)
+        if r.status_code != 200:
+            raise HttpError("Could not download the company directory from the SEC")
+        json_output = json.loads(r.content.decode('utf-8'))
+        if self.path is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(os.path.abspath(self.path)))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(r.content)
+            os.replace(temp_path, self.path)
+        return json_output
+
+    def refresh(self):
+        """Downloads the directory from the SEC again, regardless of its age"""
+        with self._lock:
+            self._load(self._download(), time.time())
+
+    def _ensure_loaded(self):
+        if self._loaded_at is not None and time.time() - self._loaded_at < self.max_age:
+            return
+        with self._lock:
+            if self._loaded_at is not None and time.time() - self._loaded_at < self.max_age:
+                return  # Another thread loaded it while we waited
+            # Prefer the local copy if it is recent enough
+            if self.path is not None and os.path.exists(self.path) and \
+                    time.time() - os.path.getmtime(self.path) < self.max_age:
+                with open(self.path, 'rb') as f:
+                    self._load(json.loads(f.read().decode('utf-8')), os.path.getmtime(self.path))
+                return
+            try:
+                self._load(self._download(), time.time())
+            except (HttpError, ForbiddenError):
+                # An outdated directory is better than none, only raise if there is nothing to fall back to
+                if self._loaded_at is None and self.path is not None and os.path.exists(self.path):
+                    with open(self.path, 'rb') as f:
+                        self._load(json.loads(f.read().decode('utf-8')), time.time())
+                elif self._loaded_at is not None:
+                    self._loaded_at = time.time()  # Keep the outdated directory instead of retrying on every lookup
+                else:
+                    raise
+
+    def cik(self, ticker):
+        """Returns the zero-padded CIK of the ticker, raises InvalidTickerError if there is no such ticker"""
+        self._ensure_loaded()
+        try:
+            return str(self._ticker_cik_map[ticker]).zfill(10)  # To make it compatible with SEC API calls
+        except KeyError:
+            raise InvalidTickerError("The ticker you have provided is not valid or does not exist")
+
+    def ticker(self, cik):
+        """Returns the (main) ticker of the company with the given CIK, zero-padded or not, or None if it has none"""
+        self._ensure_loaded()
+        try:
+            return self._cik_ticker_map.get(int(cik))
+        except ValueError:
+            return None
+
+    def cik_by_name(self, name):
+        """Returns the zero-padded CIK of the company with the given name, ignoring case and punctuation, or None"""
+        self._ensure_loaded()
+        company_cik = self._name_cik_map.get(normalise_name(name))
+        return None if company_cik is None else str(company_cik).zfill(10)
+
+    def tickers(self):
+        """Returns every ticker in the directory"""
+        self._ensure_loaded()
+        return list(self._ticker_cik_map)
@@ -13,3 +13,7 @@ class ForbiddenError(Exception):
 
 class NotFoundError(HttpError):
     pass
+
+
+class InvalidTickerError(Exception):
+    pass
@@ -0,0 +1,223 @@
+"""
+export.py - Batch export of metrics for many tickers into files partitioned by ticker or by fiscal year, as CSV or
+            Parquet (which needs pyarrow, the parquet extra). Tickers are fetched concurrently a batch at a time, so
+            memory stays bounded however many there are, and every (ticker, metric) exported is checkpointed so an
+            interrupted export resumes where it stopped. Throughput is reported as it runs.
+
+            Usage: hfd export tickers.txt output_directory --metrics revenue,eps_diluted [--format parquet]
+                   [--partition year] [--start-year 2015] [--end-year 2020] [--workers 8] [--restart]
+"""
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+from historicalFinancialData.exceptions import *
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Only Parquet output needs it, it is the parquet extra's dependency
+    pyarrow = None
+
+# Columns of every exported file, the ticker and metric first so partitions can be concatenated
+EXPORT_COLUMNS = ("ticker", "metric", "period", "value", "start", "end")
+# Name of the checkpoint, in the output directory, recording every (ticker, metric) already exported
+CHECKPOINT_FILE_NAME = "export_checkpoint.jsonl"
+# Number of tickers fetched per batch for every worker, the batch being all that is held in memory
+TICKERS_PER_WORKER = 4
+
+
+"Reads a file of tickers, one per line (or separated by commas), ignoring blank lines and # comments"
+def read_tickers(path):
+    with open(path) as f:
+        lines = [line.split("#", 1)[0] for line in f]
+    return list(dict.fromkeys(ticker.strip() for line in lines for ticker in line.split(",") if ticker.strip()))
+
+
+class Checkpoint:
+    """
+    Checkpoint - Append-only record of the (ticker, metric) pairs an export finished, either exported or known to have
+    no data. A line is only appended once the pair's files were written, so a pair is either fully exported or redone.
+    The first line holds the parameters of the export (its partitioning, format and bounds), which a run resuming it
+    must share so the output directory never mixes files of different layouts or ranges
+    """
+
+    def __init__(self, path, parameters, restart=False):
+        """
+        :param path: Path of the checkpoint file, created if it doesn't exist
+        :param parameters: Dictionary of the export's parameters, which must be those of the checkpoint if it exists
+        :param restart: Whether to forget what earlier runs exported and start from scratch
+        """
+        self.path = path
+        self.finished = {}
+        if restart and os.path.exists(path):
+            os.remove(path)
+        header = None
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        if isinstance(record, dict):
+                            header = record.get("parameters")
+                            continue
+                        ticker, metric, status = record
+                    except ValueError:
+                        continue  # A line cut short by the interruption, that pair is redone
+                    self.finished[(ticker, metric)] = status
+        # Checkpoints of runs that didn't record their parameters can't be told apart from other runs' either
+        if (header is not None or self.finished) and header != parameters:
+            raise ValueError("The output directory holds an export made with other parameters (" + json.dumps(header) +
+                             "), export again with the same ones or restart it")
+        self._file = open(path, 'a')
+        if header is None:
+            self._write({"parameters": parameters})
+
+    def _write(self, record):
+        self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def __contains__(self, pair):
+        return pair in self.finished
+
+    def record(self, ticker, metric, status):
+        """Records the pair as finished with the status ('exported' or 'no_data'), flushed to disk right away"""
+        self.finished[(ticker, metric)] = status
+        self._write([ticker, metric, status])
+
+    def close(self):
+        self._file.close()
+
+
+"Writes typed columns into a file atomically, as CSV or Parquet, so an interrupted write never leaves half a file"
+def write_columns(path, columns, file_format):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+    try:
+        if file_format == "parquet":
+            os.close(fd)
+            pyarrow.parquet.write_table(pyarrow.table({name: columns[name] for name in EXPORT_COLUMNS}), temp_path)
+        else:
+            with os.fdopen(fd, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(EXPORT_COLUMNS)
+                writer.writerows(zip(*[[value if value != "NaT" else "" for value in columns[name].astype(str)]
+                                       if columns[name].dtype.kind == "M" else columns[name].tolist()
+                                       for name in EXPORT_COLUMNS]))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+"""Writes a (ticker, metric)'s typed columns into the output directory, partitioned by ticker (one file per metric in
+    ticker=AAPL/) or by fiscal year (one file per ticker and metric in year=2019/). Returns the number of rows
+    written"""
+def write_series(output, ticker, metric, columns, partition, file_format):
+    rows = len(columns["period"])
+    columns = {"ticker": np.full(rows, ticker), "metric": np.full(rows, metric)} | columns
+    if partition == "ticker":
+        write_columns(os.path.join(output, "ticker=" + ticker, metric + "." + file_format), columns, file_format)
+        return rows
+    years = columns["period"].astype('U4')
+    for year in np.unique(years):
+        in_year = years == year
+        write_columns(os.path.join(output, "year=" + year, ticker + "." + metric + "." + file_format),
+                      {name: column[in_year] for name, column in columns.items()}, file_format)
+    return rows
+
+
+"""Exports the metrics of the tickers into the output directory, skipping the (ticker, metric) pairs the checkpoint
+    says were already exported. Raises ValueError if they were exported with another partitioning, format or bounds,
+    unless restart. Returns the number of pairs exported, without data and failed (which, unlike the others, are retried
+    by the next run) along with the failures as (ticker, metric, error)"""
+def export(fin_data, tickers, metrics, output, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
+           partition="ticker", file_format="csv", workers=8, restart=False, progress=None):
+    if file_format == "parquet" and pyarrow is None:
+        raise ImportError("Parquet output requires pyarrow, pip install historicalFinancialData[parquet]")
+    os.makedirs(output, exist_ok=True)
+    parameters = {"partition": partition, "format": file_format, "start_year": start_year,
+                  "start_quarter": start_quarter, "end_year": end_year, "end_quarter": end_quarter}
+    checkpoint = Checkpoint(os.path.join(output, CHECKPOINT_FILE_NAME), parameters, restart)
+    counts, failures = {"exported": 0, "no_data": 0, "failed": 0, "rows": 0}, []
+    pending = [(metric, [ticker for ticker in tickers if (ticker, metric) not in checkpoint]) for metric in metrics]
+    total = sum(len(metric_tickers) for _, metric_tickers in pending)
+    start, batch_size = time.perf_counter(), max(1, workers * TICKERS_PER_WORKER)
+    try:
+        for metric, metric_tickers in pending:
+            for i in range(0, len(metric_tickers), batch_size):
+                data, errors = fin_data.get_many(metric_tickers[i:i + batch_size], metric, start_year, start_quarter,
+                                                 end_year, end_quarter, max_workers=workers, output='columns')
+                for ticker, columns in data.items():
+                    counts["rows"] += write_series(output, ticker, metric, columns, partition, file_format)
+                    checkpoint.record(ticker, metric, "exported")
+                    counts["exported"] += 1
+                for ticker, error in errors.items():
+                    if isinstance(error, (InvalidTickerError, NotFoundError)):
+                        checkpoint.record(ticker, metric, "no_data")
+                        counts["no_data"] += 1
+                    else:
+                        failures.append((ticker, metric, error))
+                        counts["failed"] += 1
+                if progress is not None:
+                    progress(counts["exported"] + counts["no_data"] + counts["failed"], total, counts["rows"],
+                             time.perf_counter() - start)
+    finally:
+        checkpoint.close()
+    return counts["exported"], counts["no_data"], counts["failed"], failures
+
+
+def main(args=None):
+    # Imported here so the command's help doesn't wait on the whole library
+    from historicalFinancialData.main import FinData
+    parser = argparse.ArgumentParser(prog="hfd export", description="Exports metrics of many tickers into files "
+                                                                    "partitioned by ticker or fiscal year")
+    parser.add_argument("tickers", help="File of the tickers to export, one per line")
+    parser.add_argument("output", help="Directory the files (and the checkpoint) are written to")
+    parser.add_argument("--metrics", default=",".join(FinData._metrics),
+                        help="Comma separated metrics to export, default is all of them: " +
+                        ", ".join(FinData._metrics))
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv", help="Format of the files")
+    parser.add_argument("--partition", choices=("ticker", "year"), default="ticker",
+                        help="Whether files are partitioned by ticker or by fiscal year")
+    parser.add_argument("--start-year", type=int, default=0, help="First fiscal year exported")
+    parser.add_argument("--end-year", type=int, default=3000, help="Last fiscal year exported (inclusive)")
+    parser.add_argument("--workers", type=int, default=8, help="Number of tickers fetched at the same time")
+    parser.add_argument("--cache", help="Directory of a persistent cache for SEC responses")
+    parser.add_argument("--store", help="Directory of a ColumnarStore to export from instead of the SEC")
+    parser.add_argument("--restart", action="store_true", help="Ignore what earlier runs exported and start over")
+    args = parser.parse_args(args)
+    metrics = [metric.strip() for metric in args.metrics.split(",") if metric.strip()]
+    unknown_metrics = [metric for metric in metrics if metric not in FinData._metrics]
+    if unknown_metrics:
+        parser.error("Unknown metrics: " + ", ".join(unknown_metrics))
+    if args.format == "parquet" and pyarrow is None:
+        parser.error("Parquet output requires pyarrow, pip install historicalFinancialData[parquet]")
+
+    def report_progress(done, total, rows, seconds):
+        print("Exported " + str(done) + "/" + str(total) + " series, " + str(rows) + " rows (" +
+              format(done / seconds if seconds else 0, ".1f") + " series/s)", file=sys.stderr)
+
+    try:
+        exported, no_data, failed, failures = export(
+            FinData(cache=args.cache, store=args.store), read_tickers(args.tickers), metrics, args.output,
+            args.start_year, 0, args.end_year, 5, args.partition, args.format, args.workers, args.restart,
+            report_progress)
+    except ValueError as e:
+        parser.error(str(e) + " with --restart")
+    for ticker, metric, error in failures:
+        print("WARNING: Could not export " + metric + " for " + ticker + ": " + repr(error), file=sys.stderr)
+    print("Exported " + str(exported) + " series, " + str(no_data) + " without data, " + str(failed) +
+          " failed (run again to retry them)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+frames.py - Cross sections of a concept: every filer's value for one calendar period, out of the SEC's XBRL frames API
+            which answers it in a single request per tag instead of one request (and whole history to parse) per company
+"""
+import datetime
+import numpy as np
+import historicalFinancialData.utils as ut
+from historicalFinancialData.exceptions import *
+from historicalFinancialData.columnar import _to_datetime_objects
+
+# Typed columns of a cross section, the company name's width depends on the longest name so it is left to NumPy
+COLUMNS = ("ticker", "cik", "company", "value", "start", "end")
+COLUMN_DTYPES = {"ticker": "U", "cik": "U10", "company": "U", "value": "f8", "start": "M8[D]", "end": "M8[D]"}
+
+
+"""Returns the frames API's name of a calendar period: CY2019Q1 for a quarter's duration, CY2019 for a year's and
+    CY2019Q1I for the instant at the end of a quarter"""
+def frame_period(year, quarter=None, instant=False):
+    return "CY" + str(year) + ("Q" + str(quarter) if quarter is not None else "") + ("I" if instant else "")
+
+
+"Returns the frame's values of the tag by CIK, {cik: fact}, which is empty if no filer reported the tag in the period"
+def get_frame(tag, unit, period):
+    try:
+        frame = ut.get_url_data(ut.frames_url.format(tag, unit, period))
+    except NotFoundError:
+        return {}
+    return {str(fact["cik"]).zfill(10): fact for fact in frame["data"]}
+
+
+"""Returns a filer's Q4 out of its yearly value and its first three quarters, for filers which (as most do) only report
+    Q4 through their 10-K, like fill_financial_data does for a single company's data"""
+def derive_fourth_quarter(yearly, quarters, allow_negatives):
+    value = yearly["val"] - sum(quarter["val"] for quarter in quarters)
+    if not allow_negatives and value <= 0:
+        return None
+    start = datetime.date.fromisoformat(quarters[-1]["end"]) + ut.ONE_DAY_DATETIME
+    return {"cik": yearly["cik"], "entityName": yearly["entityName"], "val": value, "start": start.isoformat(),
+            "end": yearly["end"]}
+
+
+"""Returns every filer's value of the first of the tags it reported for the calendar quarter, by CIK. Durations that
+    aren't reported for Q4 are derived from the year's, unless fill_fourth_quarter is False"""
+def get_cross_section(tags, unit, year, quarter, instant=False, allow_negatives=True, fill_fourth_quarter=True):
+    facts = {}
+    for tag in tags:
+        frame = get_frame(tag, unit, frame_period(year, quarter, instant))
+        if quarter == 4 and not instant and fill_fourth_quarter:
+            yearly = get_frame(tag, unit, frame_period(year))
+            quarters = [get_frame(tag, unit, frame_period(year, i)) for i in range(1, 4)]
+            for cik, yearly_fact in yearly.items():
+                if cik not in frame and all(cik in earlier for earlier in quarters):
+                    fourth_quarter = derive_fourth_quarter(yearly_fact, [earlier[cik] for earlier in quarters],
+                                                           allow_negatives)
+                    if fourth_quarter is not None:
+                        frame[cik] = fourth_quarter
+        # Filers reporting several of the tags keep the first one's value, the tags being in order of preference
+        facts = frame | facts
+    if not facts:
+        raise NotFoundError("No filer reported the metric for the period")
+    return facts
+
+
+"""Converts the cross section's facts into typed columns, with the given {cik: ticker} tickers ("" for companies
+    without one), sorted from the largest value to the smallest"""
+def to_columns(facts, tickers):
+    ciks = list(facts)
+    values = np.array([facts[cik]["val"] for cik in ciks], dtype=COLUMN_DTYPES["value"])
+    order = np.argsort(-values, kind='stable')
+    columns = {"ticker": np.array([tickers.get(cik) or "" for cik in ciks], dtype=COLUMN_DTYPES["ticker"]),
+               "cik": np.array(ciks, dtype=COLUMN_DTYPES["cik"]),
+               "company": np.array([facts[cik].get("entityName", "") for cik in ciks], dtype=COLUMN_DTYPES["company"]),
+               "value": values,
+               # Instants have no start
+               "start": np.array([facts[cik].get("start", "NaT") for cik in ciks], dtype=COLUMN_DTYPES["start"]),
+               "end": np.array([facts[cik]["end"] for cik in ciks], dtype=COLUMN_DTYPES["end"])}
+    return {name: column[order] for name, column in columns.items()}
+
+
+"Converts the cross section's typed columns into a labeled array, with data_title as the value column name"
+def from_columns(columns, data_title):
+    header = np.array(['Ticker', 'CIK', 'Company', data_title, 'Start of Quarter', 'End of Quarter'], dtype=object)
+    rows = np.empty((len(columns["cik"]), len(header)), dtype=object)
+    rows[:, 0] = [ticker or None for ticker in columns["ticker"].tolist()]
+    rows[:, 1] = columns["cik"].tolist()
+    rows[:, 2] = columns["company"].tolist()
+    rows[:, 3] = columns["value"].tolist()
+    rows[:, 4] = _to_datetime_objects(columns["start"])
+    rows[:, 5] = _to_datetime_objects(columns["end"])
+    return np.vstack([header, rows])
+
+
+"Converts the cross section's typed columns into a NumPy structured array with one field per column"
+def to_structured(columns):
+    structured = np.empty(len(columns["cik"]), dtype=[(name, column.dtype) for name, column in columns.items()])
+    for name, column in columns.items():
+        structured[name] = column
+    return structured
@@ -0,0 +1,168 @@
+"""
+limiter.py - Blocking token-bucket rate limiter for the SEC API. The bucket is shared by every thread using it and, when
+             backed by a file, by every process on the host using the same file. Coroutines can wait on the same bucket
+             without blocking their event loop. Also holds the single-flight coalescing of identical concurrent calls,
+             which keeps the budget from being spent twice on the same request
+"""
+import os
+import asyncio
+import time
+import struct
+import threading
+from concurrent.futures import Future
+
+try:
+    import fcntl
+except ImportError:  # Windows has no fcntl, it locks files through msvcrt instead
+    fcntl = None
+    import msvcrt
+
+# Bucket state kept in the file: the number of tokens left and the time they were counted at
+_STATE = struct.Struct("<dd")
+
+
+class TokenBucket:
+    """
+    TokenBucket - Allows `rate` acquisitions a second with bursts of up to `capacity`. Acquiring blocks (sleeps) until a
+    token is available rather than raising, and the time spent waiting is recorded in the bucket's counters.
+    """
+
+    def __init__(self, rate=10, capacity=None, path=None):
+        """
+        :param rate: Number of tokens added to the bucket every second
+        :param capacity: Maximum number of tokens in the bucket, i.e. the largest allowed burst, default is the rate
+        :param path: Optional file through which the bucket is shared by several processes, created if it doesn't exist
+        """
+        self.rate = rate
+        self.capacity = rate if capacity is None else capacity
+        self.path = path
+        self._lock = threading.Lock()
+        self._tokens, self._updated = self.capacity, time.time()
+        # Counters
+        self.acquired = 0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+
+    def _refill(self, tokens, updated, now):
+        return min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+
+    def _take_from_state(self, tokens, updated, now):
+        """Returns the new state and how long to wait before retrying (0 if a token was taken)"""
+        tokens = self._refill(tokens, updated, now)
+        if tokens >= 1:
+            return tokens - 1, now, 0.0
+        return tokens, now, (1 - tokens) / self.rate
+
+    def _take_shared(self, now):
+        """Takes a token from the file-backed state, holding an exclusive lock on the file while doing so"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if fcntl is not None:
+                fcntl.lockf(fd, fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, _STATE.size)
+            try:
+                raw_state = os.read(fd, _STATE.size)
+                tokens, updated = _STATE.unpack(raw_state) if len(raw_state) == _STATE.size else (self.capacity, now)
+                tokens, updated, wait = self._take_from_state(tokens, updated, now)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.write(fd, _STATE.pack(tokens, updated))
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, _STATE.size)
+        finally:
+            os.close(fd)
+        return wait
+
+    def _take(self):
+        """Tries to take a token, returns how long to wait before trying again (0 if a token was taken)"""
+        with self._lock:
+            now = time.time()
+            if self.path is not None:
+                wait = self._take_shared(now)
+            else:
+                self._tokens, self._updated, wait = self._take_from_state(self._tokens, self._updated, now)
+            if wait <= 0:
+                self.acquired += 1
+            return wait
+
+    def _record_wait(self, wait, first_wait):
+        with self._lock:
+            self.throttled += first_wait
+            self.throttled_seconds += wait
+
+    def acquire(self):
+        """Blocks until a token is available and takes it"""
+        first_wait = True
+        while True:
+            wait = self._take()
+            if wait <= 0:
+                return
+            self._record_wait(wait, first_wait)
+            first_wait = False
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Waits, without blocking the event loop, until a token is available and takes it. Threads and coroutines
+        share the same tokens"""
+        first_wait = True
+        while True:
+            wait = self._take()
+            if wait <= 0:
+                return
+            self._record_wait(wait, first_wait)
+            first_wait = False
+            await asyncio.sleep(wait)
+
+    def stats(self):
+        """Returns the bucket's counters: tokens acquired, acquisitions that had to wait and the total time waited"""
+        with self._lock:
+            return {"acquired": self.acquired, "throttled": self.throttled, "throttled_seconds": self.throttled_seconds}
+
+
+class SingleFlight:
+    """
+    SingleFlight - Coalesces identical concurrent calls: while a call for a key is in flight, other threads calling for
+    the same key wait for its result (or exception) instead of making the call again. Nothing is kept once the call
+    returns, so later calls are made afresh. Safe to share between threads
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Key to the Future of the call in flight for it
+        self._calls = {}
+        # Counters
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key, function):
+        """Returns function(), called only if no call for the key is already in flight, otherwise that call's result"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = self._calls[key] = Future()
+                self.calls += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+        if not leader:
+            return future.result()
+        try:
+            result = function()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+        future.set_result(result)
+        return result
+
+    def stats(self):
+        """Returns the number of calls made and of calls coalesced into one already in flight"""
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced}
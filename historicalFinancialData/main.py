@@ -1,8 +1,19 @@
-import requests
-import json
+import contextvars
 import historicalFinancialData.utils as ut
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from historicalFinancialData.exceptions import *
+from historicalFinancialData.cache import ResponseCache, SeriesCache
+from historicalFinancialData.limiter import TokenBucket
+from historicalFinancialData.directory import CompanyDirectory
+from historicalFinancialData.store import ColumnarStore
+from historicalFinancialData.tags import TagIndex
+from historicalFinancialData.stats import Stats
+from historicalFinancialData.columnar import CompactSeries, from_columns, period_mask, slice_columns, to_columns, \
+    to_structured
+import historicalFinancialData.frames as frames
+from historicalFinancialData.derived import DERIVED_METRICS, QuarterGrid
+from historicalFinancialData.asof import VersionIndex, get_versioned_series
 
 """
 main.py - The public facing script which includes the main public class (FinData) and all the public, and useful, methods
@@ -18,48 +29,271 @@ class FinData:
     _op_inc_jargon = ["OperatingIncomeLoss"]
     _eps_basic_jargon, _eps_diluted_jargon = ["EarningsPerShareBasic"], ["EarningsPerShareDiluted"]
     _t_assets_jargon, _t_liab_jargon = ["Assets"], ["Liabilities"]
-    _cik_map_url = "https://www.sec.gov/files/company_tickers.json"
-    _ticker_cik_map = {}
-    _name_cik_map = {}
-    _cik_ticker_map = {}
-
-    def _fill_cik_map(self):
-        """Helper function that fills in the various cik maps the SEC uses to classify company financials"""
-        r = requests.get(self._cik_map_url)
-        json_output = json.loads(r.content.decode('utf-8'))
-        i = 0
-        while str(i) in json_output:  # The SEC returns an output of a dictionary with string numbers as keys
-            ticker = json_output[str(i)]["ticker"]
-            company_cir = str(json_output[str(i)]["cik_str"])
-            company_cir = "0" * (10 - len(company_cir)) + company_cir  # To make it compatible with SEC API calls
-            self._ticker_cik_map[ticker] = company_cir
-            self._cik_ticker_map[company_cir] = ticker
-            i += 1
+    # Metrics that can be requested by name, each with its jargon, data title and whether negative values are allowed
+    _metrics = {"revenue": (_rev_jargon, 'Revenue', True), "cost_of_revenue": (_cor_jargon, 'Cost of Revenue', True),
+                "gross_profit": (_g_profit_jargon, 'Gross Profit', True),
+                "operating_income": (_op_inc_jargon, 'Operating Income', True),
+                "net_profit": (_n_profit_jargon, 'Net Profit', True),
+                "eps_basic": (_eps_basic_jargon, 'EPS (Basic)', True),
+                "eps_diluted": (_eps_diluted_jargon, 'EPS (Diluted)', True),
+                "total_assets": (_t_assets_jargon, 'Total Assets', False),
+                "total_liabilities": (_t_liab_jargon, 'Total Liabilities', False)}
+    # Metrics reported as balance sheet instants rather than durations, and the units of those not reported in USD, as
+    # the frames API names them
+    _instant_metrics = ("total_assets", "total_liabilities")
+    _frame_units = {"eps_basic": "USD-per-shares", "eps_diluted": "USD-per-shares"}
+    _invalid_ticker_warning = "WARNING: The ticker you have provided is not valid or does not exist"
+    _no_data_warning = "WARNING: The company you searched for does not file the necessary documents, 10-Q/A/K, to " \
+                       "the SEC so this library cannot return any financial data for it"
+    _http_error_warning = "WARNING: The SEC kept failing to return the data, please try again later"
+    _no_cross_section_warning = "WARNING: No company reported the metric for the quarter you have provided"
+    # Mapping from human-understandable tickers to SEC identification numbers, shared and lazily loaded
+    _default_directory = None
+    # In-memory cache of the companies' full cleaned series, shared and created on first use
+    _default_series_cache = None
+
+    def _get_cik(self, ticker):
+        """Helper function returning the SEC's identification number for the ticker"""
+        return self.directory.cik(ticker)
+
+    def _fetch_data(self, ticker, jargon_terms, data_title, start_year, start_quarter, end_year, end_quarter,
+                    allow_negatives=True, as_of=None):
+        """Helper function to retrieve the actual data, raising InvalidTickerError or NotFoundError if there is none"""
+        cik = self._get_cik(ticker)
+        if as_of is not None:
+            return self._get_as_of_data(cik, jargon_terms, data_title, start_year, start_quarter, end_year, end_quarter,
+                                        allow_negatives, as_of)
+        if self._store is not None:
+            return self._get_stored_data(cik, self._get_metric(jargon_terms), data_title, start_year, start_quarter,
+                                         end_year, end_quarter)
+        return self._get_series_data(
+            cik, self._get_metric(jargon_terms), data_title, start_year, start_quarter, end_year, end_quarter,
+            lambda: ut.get_data(cik, jargon_terms, data_title, allow_negatives=allow_negatives))
+
+    def _get_series_data(self, cik, metric, data_title, start_year, start_quarter, end_year, end_quarter, fetch_series):
+        """Helper function answering the date bounds out of the company's full series, memoized in the series cache.
+        fetch_series returns the full series, as get_data does without bounds, if it isn't cached"""
+        series = self._lookup_series((cik, metric))
+        if series is None:
+            series = self._load_series(cik, metric, fetch_series)
+        return self._slice_series(series, data_title, start_year, start_quarter, end_year, end_quarter)
+
+    def _lookup_series(self, key):
+        """Helper function returning the series (or version index) out of the series cache, None if it isn't cached.
+        Within a call that set prefetched_series (see utils) each key is only looked up once, the entry found then
+        being used throughout the call even if it expires in the meantime"""
+        prefetched = ut.prefetched_series.get()
+        if prefetched is not None and key in prefetched:
+            return prefetched[key]
+        series = self.series_cache.get(key)
+        if ut.stats is not None:
+            ut.stats.record_cache("series_cache", "miss" if series is None else "hit")
+        self._remember_series(key, series)
+        return series
+
+    @staticmethod
+    def _remember_series(key, series):
+        """Helper function recording the series the call looked up or fetched, if it set prefetched_series"""
+        prefetched = ut.prefetched_series.get()
+        if prefetched is not None:
+            prefetched[key] = series
+
+    def _load_series(self, cik, metric, fetch_series):
+        """Helper function fetching the company's full series with fetch_series and caching it. Concurrent calls for
+        the same series (i.e. a hot ticker on the service) fetch and clean it once"""
+        def fetch_and_cache():
+            fetched = CompactSeries(fetch_series()[1:])
+            self.series_cache.put((cik, metric), fetched)
+            return fetched
+        series = fetch_and_cache() if ut.single_flight is None else \
+            ut.single_flight.do(("series", id(self.series_cache), cik, metric), fetch_and_cache)
+        self._remember_series((cik, metric), series)
+        return series
+
+    @staticmethod
+    def _slice_series(series, data_title, start_year, start_quarter, end_year, end_quarter):
+        """Helper function returning the quarters of the series within the date bounds as a labeled array"""
+        series = series.rows(period_mask(series.columns["period"], start_year, start_quarter, end_year, end_quarter))
+        if not len(series):
+            raise NotFoundError("No data was found within the given date bounds")
+        if ut.stats is not None:
+            ut.stats.record_rows(len(series))
+        return np.vstack([np.array(['Time-Period', data_title, 'Start of Quarter', 'End of Quarter']), series])
+
+    def _get_as_of_data(self, cik, jargon_terms, data_title, start_year, start_quarter, end_year, end_quarter,
+                        allow_negatives, as_of):
+        """Helper function answering the date bounds out of the company's series as known on the as_of date, through
+        the version index of the series which is memoized in the series cache along with the series itself"""
+        if self._store is not None:
+            raise ValueError("The store only holds the latest data, as_of needs the SEC's filing history")
+        metric = self._get_metric(jargon_terms)
+        index = self._lookup_series((cik, metric, "versions"))
+        if index is None:
+            series, tables = get_versioned_series(cik, jargon_terms, data_title, allow_negatives)
+            series = CompactSeries(series[1:])
+            index = VersionIndex(series.columns, tables, allow_negatives)
+            self.series_cache.put((cik, metric, "versions"), index)
+            self.series_cache.put((cik, metric), series)
+            self._remember_series((cik, metric, "versions"), index)
+            self._remember_series((cik, metric), series)
+        columns = slice_columns(index.as_of(as_of), start_year, start_quarter, end_year, end_quarter)
+        if not len(columns["period"]):
+            raise NotFoundError("No data was known on the as_of date within the given date bounds")
+        if ut.stats is not None:
+            ut.stats.record_rows(len(columns["period"]))
+        return from_columns(columns, data_title)
 
     def _get_data(self, ticker, jargon_terms, data_title, start_year, start_quarter, end_year, end_quarter,
-                  allow_negatives=True, mute_warnings=False):
+                  allow_negatives=True, mute_warnings=False, output='array', decimals=None, as_of=None):
         """Helper function to retrieve the actual data for the public facing functions"""
+        self._check_output(output)
         data = None
         try:
-            cik = self._ticker_cik_map[ticker]
-        except KeyError:
+            data = self._fetch_data(ticker, jargon_terms, data_title, start_year, start_quarter, end_year,
+                                    end_quarter, allow_negatives, as_of)
+            data = self._format_output(self._round_values(data, decimals), output)
+        except InvalidTickerError:
             if not mute_warnings:
-                print("WARNING: The ticker you have provided is not valid or does not exist")
-            return None
-        try:
-            data = ut.get_data(cik, jargon_terms, data_title, start_year, start_quarter, end_year, end_quarter,
-                               allow_negatives)
+                print(self._invalid_ticker_warning)
         except NotFoundError:
             if not mute_warnings:
-                print("WARNING: The company you searched for does not file the necessary documents, 10-Q/A/K, to the "
-                      "SEC so this library cannot return any financial data for it")
+                print(self._no_data_warning)
+        except HttpError:
+            if not mute_warnings:
+                print(self._http_error_warning)
+        return data
+
+    def _fetch_statement(self, ticker, metrics, start_year, start_quarter, end_year, end_quarter):
+        """Helper function retrieving several metrics of the ticker from a single request for its companyfacts document,
+        as labeled arrays with eps rounded (None for the metrics it doesn't report). Raises InvalidTickerError,
+        NotFoundError if the company has no companyfacts document or HttpError"""
+        cik = self._get_cik(ticker)
+        # The series are looked up once, an entry expiring after being found cached would otherwise be fetched without
+        # the companyfacts document, in a request per tag
+        cached = {} if self._store is not None else {metric: self._lookup_series((cik, metric)) for metric in metrics}
+        try:
+            # The store already holds parsed data, as does the series cache if every metric was asked for before, so
+            # there is no need for the companyfacts document
+            company_facts = None if all(series is not None for series in cached.values()) else \
+                ut.get_url_data(ut.company_facts_url.format(cik), fact_tables=True)
+        except NotFoundError:
+            # Without a companyfacts document the company doesn't report any tag
+            if ut.tag_index is not None:
+                ut.tag_index.seed(cik, None)
+            raise
+        if company_facts is not None and ut.tag_index is not None:
+            ut.tag_index.seed(cik, company_facts)
+        statement = {}
+        for metric in metrics:
+            jargon_terms, data_title, allow_negatives = self._metrics[metric]
+            try:
+                if self._store is not None:
+                    statement[metric] = self._get_stored_data(cik, metric, data_title, start_year, start_quarter,
+                                                              end_year, end_quarter)
+                else:
+                    series = cached[metric]
+                    if series is None:
+                        series = self._load_series(
+                            cik, metric, lambda: ut.get_data(cik, jargon_terms, data_title,
+                                                             allow_negatives=allow_negatives,
+                                                             company_facts=company_facts))
+                    statement[metric] = self._slice_series(series, data_title, start_year, start_quarter, end_year,
+                                                           end_quarter)
+            except NotFoundError:
+                statement[metric] = None
+            statement[metric] = self._round_values(statement[metric], 2 if metric.startswith("eps") else None)
+        return statement
+
+    def _get_metric(self, jargon_terms):
+        """Helper function returning the name of the metric the jargon terms belong to"""
+        return next(metric for metric, (jargon, _, _) in self._metrics.items() if jargon is jargon_terms)
+
+    def _get_stored_data(self, cik, metric, data_title, start_year, start_quarter, end_year, end_quarter):
+        """Helper function to retrieve data from the local store rather than the SEC, in the same format"""
+        columns = slice_columns(self._store.read_series(cik, metric), start_year, start_quarter, end_year,
+                                end_quarter)
+        if not len(columns["period"]):
+            raise NotFoundError("No data was found within the given date bounds")
+        if ut.stats is not None:
+            ut.stats.record_rows(len(columns["period"]))
+        return from_columns(columns, data_title)
+
+    @staticmethod
+    def _round_values(data, decimals=2):
+        """Helper function rounding the data column as the filling and floating point approx error can leave a weird
+        number"""
+        if data is not None and decimals is not None:
+            data[1:, 1] = [np.round(x, decimals) for x in data[1:, 1]]
         return data
 
-    def __init__(self):
-        # Fills in mapping from human-understandable tickers to SEC identification numbers
-        self._fill_cik_map()
+    @staticmethod
+    def _check_output(output):
+        if output not in ('array', 'structured', 'columns'):
+            raise ValueError("Unknown output format: " + str(output))
 
-    def get_revenue(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5, mute_warnings=False):
+    @staticmethod
+    def _format_output(data, output, has_values=True):
+        """Helper function converting the labeled array into the requested output format"""
+        if data is None or output == 'array':
+            return data
+        columns = to_columns(data)
+        if not has_values:
+            del columns["value"]
+        return columns if output == 'columns' else to_structured(columns)
+
+    def __init__(self, cache=None, store=None, rate_limiter=None, transport=None, directory=None, series_cache=None,
+                 tag_index=None, stats=None):
+        """
+        :param cache: Optional persistent cache for SEC responses, either a ResponseCache (or any object with the same
+        methods) or a directory path in which case a ResponseCache with the default TTL and size is created there.
+        The cache is shared by every FinData object as they all go through the same SEC API calls
+        :param store: Optional ColumnarStore, or its directory path, filled by ingesting the SEC's bulk companyfacts.zip
+        archive (see store.py). If given all data is read from the store and no request is ever made to the SEC
+        :param rate_limiter: Optional TokenBucket every SEC request waits on, or a file path in which case a bucket with
+        the SEC's limit of 10 requests a second is shared, through that file, with every process using the same path.
+        Like the cache it is shared by every FinData object
+        :param transport: Optional Transport, the pooled HTTP session every SEC request goes through, to configure its
+        pool size, retries and timeouts. Like the cache it is shared by every FinData object
+        :param directory: Optional CompanyDirectory mapping tickers to the SEC's identification numbers. By default one
+        persisted in the user's cache directory, downloaded from the SEC at most once a week, is shared by every FinData
+        object (or the one ingested into the store if a store is given). Constructing FinData never makes a request
+        :param series_cache: Optional SeriesCache holding the full cleaned series of the companies already asked for, so
+        any date bounds of them are answered by slicing in memory. By default one of up to 64 MB is shared by every
+        FinData object, SeriesCache(max_bytes=0) disables it
+        :param tag_index: Optional TagIndex, or its file path, recording which tags each company reports so requests
+        for the ones it doesn't are skipped. By default one persisted in the user's cache directory, forgetting what it
+        learned after a week, is used. Like the cache it is shared by every FinData object
+        :param stats: Optional Stats, or True for a new one, recording per-stage timings, requests by tag and status,
+        bytes downloaded, cache hits and rows produced (see the stats method). Nothing is recorded by default. Like the
+        cache it is shared by every FinData object
+        """
+        if cache is not None:
+            ut.response_cache = ResponseCache(cache) if isinstance(cache, str) else cache
+        if rate_limiter is not None:
+            ut.rate_limiter = TokenBucket(10, path=rate_limiter) if isinstance(rate_limiter, str) else rate_limiter
+        if transport is not None:
+            ut.transport = transport
+        if tag_index is not None:
+            ut.tag_index = TagIndex(tag_index) if isinstance(tag_index, str) else tag_index
+        if stats is not None:
+            ut.stats = Stats() if stats is True else stats
+        self._store = ColumnarStore(store) if isinstance(store, str) else store
+        stored_tickers = None if self._store is None or directory is not None else self._store.read_tickers()
+        if stored_tickers is not None:
+            directory = CompanyDirectory(None, tickers=stored_tickers)
+        elif directory is None:
+            if FinData._default_directory is None:
+                FinData._default_directory = CompanyDirectory()
+            directory = FinData._default_directory
+        self.directory = directory
+        if series_cache is None:
+            if FinData._default_series_cache is None:
+                FinData._default_series_cache = SeriesCache()
+            series_cache = FinData._default_series_cache
+        self.series_cache = series_cache
+
+    def get_revenue(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5, mute_warnings=False,
+                    output='array', as_of=None):
         """
         get_revenue - Returns the revenue for the provided ticker in the optional date bounds. Works off of SEC 10-Q/A
         and 10-K fillings so for some companies, notably banks, the function wont be able to return revenue
@@ -69,13 +303,18 @@ class FinData:
         :param end_year: The company's financial year you want to end data collection with as an integer (inclusive)
         :param end_quarter: The company's financial quarter you want to end data collection with as an integer (inclusive)
         :param mute_warnings: Whether the function should not print warning messages, default is False
+        :param output: Format of the returned data, 'array' (default) as described below, 'structured' for a NumPy
+        structured array or 'columns' for a dictionary of typed arrays (U6 periods, float64 values, datetime64[D] dates)
+        :param as_of: Optional date (a datetime.date, datetime64 or ISO string) to return the data as it was known on,
+        out of the filings made up to it so later restatements and quarters reported after it are left out
         :return: A numpy array with the first row being column names and the remainder being revenue data by quarter
         according to the companies financial calendar which may greatly differ from the normal calendar
         """
         return self._get_data(ticker, self._rev_jargon, 'Revenue', start_year, start_quarter, end_year, end_quarter,
-                              mute_warnings=mute_warnings)
+                              mute_warnings=mute_warnings, output=output, as_of=as_of)
 
-    def get_dates(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5, mute_warnings=False):
+    def get_dates(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5, mute_warnings=False,
+                  output='array', as_of=None):
         """
         get_dates - Returns the exact dates each financial quarter, as defined by the company, falls into. Works off
         of SEC 10-Q/A and 10-K fillings so for some companies, notably banks, the function wont be able to return dates
@@ -85,18 +324,28 @@ class FinData:
         :param end_year: The company's financial year you want to end data collection with as an integer (inclusive)
         :param end_quarter: The company's financial quarter you want to end data collection with as an integer (inclusive)
         :param mute_warnings: Whether the function should not print warning messages, default is False
+        :param output: Format of the returned data, 'array' (default) as described below, 'structured' for a NumPy
+        structured array or 'columns' for a dictionary of typed arrays (U6 periods, float64 values, datetime64[D] dates)
+        :param as_of: Optional date (a datetime.date, datetime64 or ISO string) to return the data as it was known on,
+        out of the filings made up to it so later restatements and quarters reported after it are left out
         :return: A numpy array with the first row being column names and the remainder being the start/end dates by
         quarter with the quarters being according to the companies financial calendar which may greatly differ from the
         normal calendar
         """
-        # To maximize code re-use I am using the same set-up as with get_revenues and then deleting the revenues after
+        # To maximize code re-use I am using the same set-up as with get_revenues and then deleting the revenues after,
+        # both are answered out of the same cached revenue series
+        self._check_output(output)
         raw_data = self._get_data(ticker, self._rev_jargon, None, start_year, start_quarter, end_year, end_quarter,
-                                  mute_warnings=mute_warnings)
+                                  mute_warnings=mute_warnings, as_of=as_of)
+        if raw_data is None:
+            return None
+        if output != 'array':
+            return self._format_output(raw_data, output, has_values=False)
         filtered_data = np.delete(raw_data, 1, 1)
         return filtered_data
 
     def get_cost_of_revenue(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
-                            mute_warnings=False):
+                            mute_warnings=False, output='array', as_of=None):
         """
         get_cost_of_revenue - Returns the company's cost of revenue, per company financial quarter, for the provided
         time bounds. Works off SEC 10-Q/A and 10-K fillings so for some companies, notably banks, the function won't be
@@ -108,15 +357,19 @@ class FinData:
         :param end_year: The company's financial year you want to end data collection with as an integer (inclusive)
         :param end_quarter: The company's financial quarter you want to end data collection with as an integer (inclusive)
         :param mute_warnings: Whether the function should not print warning messages, default is False
+        :param output: Format of the returned data, 'array' (default) as described below, 'structured' for a NumPy
+        structured array or 'columns' for a dictionary of typed arrays (U6 periods, float64 values, datetime64[D] dates)
+        :param as_of: Optional date (a datetime.date, datetime64 or ISO string) to return the data as it was known on,
+        out of the filings made up to it so later restatements and quarters reported after it are left out
         :return: A numpy array with the first row being column names and the remainder being the quarter data along with
         the cost of revenue according to the companies financial calendar which may greatly differ from the normal
         calendar
         """
         return self._get_data(ticker, self._cor_jargon, 'Cost of Revenue', start_year, start_quarter, end_year,
-                              end_quarter, mute_warnings=mute_warnings)
+                              end_quarter, mute_warnings=mute_warnings, output=output, as_of=as_of)
 
     def get_gross_profit(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
-                         mute_warnings=False):
+                         mute_warnings=False, output='array', as_of=None):
         """
         get_gross_profit - Returns the company's gross profit, per company financial quarter, for the provided time
         bounds. Works off SEC 10-Q/A and 10-K fillings so for some companies, notably banks, the function won't be able
@@ -127,14 +380,18 @@ class FinData:
         :param end_year: The company's financial year you want to end data collection with as an integer (inclusive)
         :param end_quarter: The company's financial quarter you want to end data collection with as an integer (inclusive)
         :param mute_warnings: Whether the function should not print warning messages, default is False
+        :param output: Format of the returned data, 'array' (default) as described below, 'structured' for a NumPy
+        structured array or 'columns' for a dictionary of typed arrays (U6 periods, float64 values, datetime64[D] dates)
+        :param as_of: Optional date (a datetime.date, datetime64 or ISO string) to return the data as it was known on,
+        out of the filings made up to it so later restatements and quarters reported after it are left out
         :return: A numpy array with the first row being column names and the remainder being the quarter data along with
         the gross profit according to the companies financial calendar which may greatly differ from the normal calendar
         """
         return self._get_data(ticker, self._g_profit_jargon, 'Gross Profit', start_year, start_quarter, end_year,
-                              end_quarter, mute_warnings=mute_warnings)
+                              end_quarter, mute_warnings=mute_warnings, output=output, as_of=as_of)
 
     def get_operating_income(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
-                             mute_warnings=False):
+                             mute_warnings=False, output='array', as_of=None):
         """
         get_operating_income - Returns the company's operating income, per company financial quarter, for the provided
         time. Works off SEC 10-Q/A and 10-K fillings so for some companies, notably banks, the function won't be able to
@@ -145,15 +402,19 @@ class FinData:
         :param end_year: The company's financial year you want to end data collection with as an integer (inclusive)
         :param end_quarter: The company's financial quarter you want to end data collection with as an integer (inclusive)
         :param mute_warnings: Whether the function should not print warning messages, default is False
+        :param output: Format of the returned data, 'array' (default) as described below, 'structured' for a NumPy
+        structured array or 'columns' for a dictionary of typed arrays (U6 periods, float64 values, datetime64[D] dates)
+        :param as_of: Optional date (a datetime.date, datetime64 or ISO string) to return the data as it was known on,
+        out of the filings made up to it so later restatements and quarters reported after it are left out
         :return: A numpy array with the first row being column names and the remainder being the quarter data along with
         the operating income according to the companies financial calendar which may greatly differ from the normal
         calendar
         """
         return self._get_data(ticker, self._op_inc_jargon, 'Operating Income', start_year, start_quarter, end_year,
-                              end_quarter, mute_warnings=mute_warnings)
+                              end_quarter, mute_warnings=mute_warnings, output=output, as_of=as_of)
 
     def get_net_profit(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
-                       mute_warnings=False):
+                       mute_warnings=False, output='array', as_of=None):
         """
         get_net_profit - Returns the company's net profit, per company financial quarter, for the provided time. Works
         off SEC 10-Q/A and 10-K fillings so for some companies, notably banks, the function won't be able to return
@@ -164,14 +425,18 @@ class FinData:
         :param end_year: The company's financial year you want to end data collection with as an integer (inclusive)
         :param end_quarter: The company's financial quarter you want to end data collection with as an integer (inclusive)
         :param mute_warnings: Whether the function should not print warning messages, default is False
+        :param output: Format of the returned data, 'array' (default) as described below, 'structured' for a NumPy
+        structured array or 'columns' for a dictionary of typed arrays (U6 periods, float64 values, datetime64[D] dates)
+        :param as_of: Optional date (a datetime.date, datetime64 or ISO string) to return the data as it was known on,
+        out of the filings made up to it so later restatements and quarters reported after it are left out
         :return: A numpy array with the first row being column names and the remainder being the quarter data along with
         the net profit according to the companies financial calendar which may greatly differ from the normal calendar
         """
         return self._get_data(ticker, self._n_profit_jargon, 'Net Profit', start_year, start_quarter, end_year,
-                              end_quarter, mute_warnings=mute_warnings)
+                              end_quarter, mute_warnings=mute_warnings, output=output, as_of=as_of)
 
     def get_eps(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5, is_diluted=False,
-                mute_warnings=False):
+                mute_warnings=False, output='array', as_of=None):
         """
         get_net_profit - Returns the company's earning per share (basic or diluted), per company financial quarter, for
         the provided time. Works off SEC 10-Q/A and 10-K fillings so for some companies, notably banks, the function
@@ -183,19 +448,20 @@ class FinData:
         :param end_quarter: The company's financial quarter you want to end data collection with as an integer (inclusive)
         :param is_diluted: Whether the EPS data returned is diluted or basic, default is basic.
         :param mute_warnings: Whether the function should not print warning messages, default is False
+        :param output: Format of the returned data, 'array' (default) as described below, 'structured' for a NumPy
+        structured array or 'columns' for a dictionary of typed arrays (U6 periods, float64 values, datetime64[D] dates)
+        :param as_of: Optional date (a datetime.date, datetime64 or ISO string) to return the data as it was known on,
+        out of the filings made up to it so later restatements and quarters reported after it are left out
         :return: A numpy array with the first row being column names and the remainder being the quarter data along with
         the EPS data according to the companies financial calendar which may greatly differ from the normal calendar
         """
         jargon_list = self._eps_diluted_jargon if is_diluted else self._eps_basic_jargon
         e_type = "Diluted" if is_diluted else "Basic"
-        data = self._get_data(ticker, jargon_list, 'EPS (' + e_type + ')', start_year, start_quarter, end_year,
-                              end_quarter, mute_warnings=mute_warnings)
-        # Round the data to 2 dp as the filling and floating point approx error can leave a weird number
-        data[1:, 1] = [np.round(x, 2) for x in data[1:, 1]]
-        return data
+        return self._get_data(ticker, jargon_list, 'EPS (' + e_type + ')', start_year, start_quarter, end_year,
+                              end_quarter, mute_warnings=mute_warnings, output=output, as_of=as_of, decimals=2)
 
     def get_total_assets(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
-                         mute_warnings=False):
+                         mute_warnings=False, output='array', as_of=None):
         """
         get_total_assets - Returns the company's total assets, per company financial quarter, for the provided time.
         Works off SEC 10-Q/A and 10-K fillings so for some companies, notably banks, the function won't be able to
@@ -206,14 +472,19 @@ class FinData:
         :param end_year: The company's financial year you want to end data collection with as an integer (inclusive)
         :param end_quarter: The company's financial quarter you want to end data collection with as an integer (inclusive)
         :param mute_warnings: Whether the function should not print warning messages, default is False
+        :param output: Format of the returned data, 'array' (default) as described below, 'structured' for a NumPy
+        structured array or 'columns' for a dictionary of typed arrays (U6 periods, float64 values, datetime64[D] dates)
+        :param as_of: Optional date (a datetime.date, datetime64 or ISO string) to return the data as it was known on,
+        out of the filings made up to it so later restatements and quarters reported after it are left out
         :return: A numpy array with the first row being column names and the remainder being the quarter data along with
         the total assets according to the companies financial calendar which may greatly differ from the normal calendar
         """
         return self._get_data(ticker, self._t_assets_jargon, 'Total Assets', start_year, start_quarter, end_year,
-                              end_quarter, allow_negatives=False, mute_warnings=mute_warnings)
+                              end_quarter, allow_negatives=False, mute_warnings=mute_warnings,
+                              output=output, as_of=as_of)
 
     def get_total_liabilities(self, ticker, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
-                              mute_warnings=False):
+                              mute_warnings=False, output='array', as_of=None):
         """
         get_total_liabilities - Returns the company's total liabilities, per company financial quarter, for the provided
         time. Works off SEC 10-Q/A and 10-K fillings so for some companies, notably banks, the function won't be able to
@@ -224,9 +495,285 @@ class FinData:
         :param end_year: The company's financial year you want to end data collection with as an integer (inclusive)
         :param end_quarter: The company's financial quarter you want to end data collection with as an integer (inclusive)
         :param mute_warnings: Whether the function should not print warning messages, default is False
+        :param output: Format of the returned data, 'array' (default) as described below, 'structured' for a NumPy
+        structured array or 'columns' for a dictionary of typed arrays (U6 periods, float64 values, datetime64[D] dates)
+        :param as_of: Optional date (a datetime.date, datetime64 or ISO string) to return the data as it was known on,
+        out of the filings made up to it so later restatements and quarters reported after it are left out
         :return: A numpy array with the first row being column names and the remainder being the quarter data along with
         the total liabilities according to the companies financial calendar which may greatly differ from the normal
         calendar
         """
         return self._get_data(ticker, self._t_liab_jargon, 'Total Liabilities', start_year, start_quarter, end_year,
-                              end_quarter, allow_negatives=False, mute_warnings=mute_warnings)
+                              end_quarter, allow_negatives=False, mute_warnings=mute_warnings,
+                              output=output, as_of=as_of)
+
+    def get_statement(self, ticker, metrics=None, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
+                      mute_warnings=False, output='array'):
+        """
+        get_statement - Returns several metrics for the provided ticker at once. Unlike calling the individual methods,
+        which request every possible US-GAAP tag of a metric separately, this downloads the company's whole
+        companyfacts document from the SEC in a single request and parses every metric out of it. Works off SEC
+        10-Q/A and 10-K fillings so for some companies, notably banks, the function won't be able to return anything
+        :param ticker: The stock market ticker identifying your company of interest as a string.
+        :param metrics: List of the metrics to return, default is all of them. Possible metrics are 'revenue',
+        'cost_of_revenue', 'gross_profit', 'operating_income', 'net_profit', 'eps_basic', 'eps_diluted',
+        'total_assets' and 'total_liabilities'
+        :param start_year: The company's financial year you want to start data collection from as an integer
+        :param start_quarter: The company's financial quarter you want to start data collection from as an integer
+        :param end_year: The company's financial year you want to end data collection with as an integer (inclusive)
+        :param end_quarter: The company's financial quarter you want to end data collection with as an integer (inclusive)
+        :param mute_warnings: Whether the function should not print warning messages, default is False
+        :param output: Format of the returned data, 'array' (default) as described below, 'structured' for a NumPy
+        structured array or 'columns' for a dictionary of typed arrays (U6 periods, float64 values, datetime64[D] dates)
+        :return: A dictionary from metric to a numpy array in the same format the individual methods return, None for
+        metrics the company doesn't report. The whole return is None if there is no data for the company at all
+        """
+        self._check_output(output)
+        metrics = list(self._metrics) if metrics is None else metrics
+        unknown_metrics = [metric for metric in metrics if metric not in self._metrics]
+        if unknown_metrics:
+            raise ValueError("Unknown metrics: " + ", ".join(unknown_metrics))
+        try:
+            statement = self._fetch_statement(ticker, metrics, start_year, start_quarter, end_year, end_quarter)
+        except InvalidTickerError:
+            if not mute_warnings:
+                print(self._invalid_ticker_warning)
+            return None
+        except NotFoundError:
+            if not mute_warnings:
+                print(self._no_data_warning)
+            return None
+        except HttpError:
+            if not mute_warnings:
+                print(self._http_error_warning)
+            return None
+        return {metric: self._format_output(data, output) for metric, data in statement.items()}
+
+    def get_many(self, tickers, metric, start_year=0, start_quarter=0, end_year=3000, end_quarter=5, max_workers=8,
+                 output='array'):
+        """
+        get_many - Returns a metric for many tickers at once. The tickers are fetched concurrently by a pool of threads
+        which all share the library's single SEC rate limit (10 requests a second), so the throughput approaches that
+        limit instead of waiting on one request at a time. Nothing is printed, any problem is returned per ticker instead
+        :param tickers: List of the stock market tickers identifying your companies of interest as strings.
+        :param metric: The metric to return, one of those accepted by get_statement i.e. 'revenue' or 'eps_diluted'
+        :param start_year: The companies' financial year you want to start data collection from as an integer
+        :param start_quarter: The companies' financial quarter you want to start data collection from as an integer
+        :param end_year: The companies' financial year you want to end data collection with as an integer (inclusive)
+        :param end_quarter: The companies' financial quarter you want to end data collection with as an integer
+        (inclusive)
+        :param max_workers: Number of tickers fetched at the same time, default is 8
+        :param output: Format of the returned data, 'array' (default), 'structured' or 'columns' as in the other methods
+        :return: A tuple of two dictionaries, the first from ticker to the numpy array the individual method for the metric
+        returns, the second from ticker to the exception (i.e. InvalidTickerError or NotFoundError) that prevented its
+        data from being returned. Every ticker is in exactly one of the two
+        """
+        self._check_output(output)
+        if metric not in self._metrics:
+            raise ValueError("Unknown metric: " + metric)
+        jargon_terms, data_title, allow_negatives = self._metrics[metric]
+
+        def fetch(ticker):
+            data = self._fetch_data(ticker, jargon_terms, data_title, start_year, start_quarter, end_year, end_quarter,
+                                    allow_negatives)
+            return self._format_output(self._round_values(data, 2 if metric.startswith("eps") else None), output)
+
+        data, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Each thread runs in a copy of the caller's context, which may hold prefetched responses (see AsyncFinData)
+            futures = {ticker: executor.submit(contextvars.copy_context().run, fetch, ticker)
+                       for ticker in dict.fromkeys(tickers)}
+            for ticker, future in futures.items():
+                try:
+                    data[ticker] = future.result()
+                except Exception as e:
+                    errors[ticker] = e
+        return data, errors
+
+    def get_derived(self, tickers, metrics, start_year=0, start_quarter=0, end_year=3000, end_quarter=5, formulas=None,
+                    max_workers=8, output='array'):
+        """
+        get_derived - Returns metrics derived from the base ones, i.e. margins, trailing twelve months, growth or
+        leverage, for many tickers at once. Every base metric a ticker needs is fetched once (concurrently, like
+        get_many, and through the series cache), the series are aligned by fiscal quarter and every formula is computed
+        for all the tickers at once. Windows (TTM, YoY) use the quarters before the date bounds too. Nothing is printed
+        :param tickers: List of the stock market tickers identifying your companies of interest as strings.
+        :param metrics: List of the derived metrics to return. Built-in ones are 'gross_margin', 'operating_margin',
+        'net_margin', 'revenue_ttm', 'net_profit_ttm', 'eps_diluted_ttm', 'revenue_yoy', 'net_profit_yoy' and 'leverage'
+        :param start_year: The companies' financial year you want to start data collection from as an integer
+        :param start_quarter: The companies' financial quarter you want to start data collection from as an integer
+        :param end_year: The companies' financial year you want to end data collection with as an integer (inclusive)
+        :param end_quarter: The companies' financial quarter you want to end data collection with as an integer
+        (inclusive)
+        :param formulas: Optional dictionary declaring more derived metrics, by name, as (base metrics, data title,
+        formula). The formula is given a (tickers x quarters) float array of each base metric, in the same order, with
+        NaN where a company has no value, and returns the derived array i.e. lambda revenue: revenue * 4. The window
+        helpers of derived.py (lag, rolling_sum, ttm and yoy) work over those arrays
+        :param max_workers: Number of series fetched at the same time, default is 8
+        :param output: Format of the returned data, 'array' (default), 'structured' or 'columns' as in the other methods
+        :return: A tuple of two dictionaries, the first from ticker to a dictionary from metric to a numpy array in the
+        same format the individual methods return (None where the ticker's data doesn't allow computing the metric),
+        the second from ticker to the exception (i.e. InvalidTickerError or NotFoundError) that prevented its data from
+        being returned. Every ticker is in exactly one of the two
+        """
+        self._check_output(output)
+        derived_metrics = DERIVED_METRICS if formulas is None else DERIVED_METRICS | formulas
+        unknown_metrics = [metric for metric in metrics if metric not in derived_metrics or
+                           any(base_metric not in self._metrics for base_metric in derived_metrics[metric][0])]
+        if unknown_metrics:
+            raise ValueError("Unknown derived metrics: " + ", ".join(unknown_metrics))
+        base_metrics = list(dict.fromkeys(base_metric for metric in metrics for base_metric in
+                                          derived_metrics[metric][0]))
+        tickers = list(dict.fromkeys(tickers))
+
+        def fetch(ticker, metric):
+            jargon_terms, data_title, allow_negatives = self._metrics[metric]
+            return to_columns(self._fetch_data(ticker, jargon_terms, data_title, 0, 0, 3000, 5, allow_negatives))
+
+        series, errors = {ticker: {} for ticker in tickers}, {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {(ticker, metric): executor.submit(contextvars.copy_context().run, fetch, ticker, metric)
+                       for ticker in tickers for metric in base_metrics}
+            for (ticker, metric), future in futures.items():
+                try:
+                    series[ticker][metric] = future.result()
+                except NotFoundError:
+                    series[ticker][metric] = None
+                except Exception as e:
+                    errors.setdefault(ticker, e)
+        for ticker in tickers:
+            if ticker not in errors and all(columns is None for columns in series[ticker].values()):
+                errors[ticker] = NotFoundError("None of the metrics' data was found")
+        tickers = [ticker for ticker in tickers if ticker not in errors]
+        grid = QuarterGrid([series[ticker] for ticker in tickers])
+        in_bounds = period_mask(grid.periods, start_year, start_quarter, end_year, end_quarter)
+        data = {ticker: {} for ticker in tickers}
+        for metric in metrics:
+            base_metrics, data_title, formula = derived_metrics[metric]
+            values = grid.evaluate(base_metrics, formula)
+            for i, ticker in enumerate(tickers):
+                columns = grid.columns(i, values, in_bounds)
+                if not len(columns["period"]):
+                    data[ticker][metric] = None
+                elif output == 'array':
+                    data[ticker][metric] = from_columns(columns, data_title)
+                else:
+                    data[ticker][metric] = columns if output == 'columns' else to_structured(columns)
+        return data, errors
+
+    def get_panel(self, tickers, metrics=None, start_year=0, start_quarter=0, end_year=3000, end_quarter=5,
+                  calendar=True, max_workers=8):
+        """
+        get_panel - Returns several metrics of many tickers as one dense (tickers x quarters x metrics) array, i.e. for
+        cross-sectional models. Each ticker's metrics come from a single request for its companyfacts document (or none
+        if they were asked for before), fetched concurrently like get_many. With calendar, quarters are calendar
+        quarters so companies with different fiscal years (i.e. AAPL and WMT) line up: each fiscal quarter moves to the
+        calendar quarter holding its midpoint, worked out from the companies' own start and end dates. Nothing is
+        printed
+        :param tickers: List of the stock market tickers identifying your companies of interest as strings.
+        :param metrics: List of the metrics to return, default is all of them, as accepted by get_statement
+        :param start_year: The year you want to start data collection from as an integer, a calendar year with calendar
+        and otherwise the companies' financial year
+        :param start_quarter: The quarter you want to start data collection from as an integer
+        :param end_year: The year you want to end data collection with as an integer (inclusive)
+        :param end_quarter: The quarter you want to end data collection with as an integer (inclusive)
+        :param calendar: Whether quarters are calendar quarters (default) or the companies' fiscal quarters
+        :param max_workers: Number of tickers fetched at the same time, default is 8
+        :return: A tuple of two dictionaries. The first is the panel: 'tickers', 'periods' (U6 time periods) and
+        'metrics' label the axes of 'values', a float64 (tickers x quarters x metrics) array NaN where there is no
+        value, and of 'mask', True where there is one. 'start' and 'end' are the datetime64[D] dates of every ticker's
+        quarters. The second is from ticker to the exception (i.e. InvalidTickerError or NotFoundError) that prevented
+        its data from being returned, those tickers being masked out of the panel
+        """
+        metrics = list(self._metrics) if metrics is None else list(metrics)
+        unknown_metrics = [metric for metric in metrics if metric not in self._metrics]
+        if unknown_metrics:
+            raise ValueError("Unknown metrics: " + ", ".join(unknown_metrics))
+        tickers = list(dict.fromkeys(tickers))
+
+        def fetch(ticker):
+            statement = self._fetch_statement(ticker, metrics, 0, 0, 3000, 5)
+            return {metric: None if data is None else to_columns(data) for metric, data in statement.items()}
+
+        series, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {ticker: executor.submit(contextvars.copy_context().run, fetch, ticker) for ticker in tickers}
+            for ticker, future in futures.items():
+                try:
+                    series[ticker] = future.result()
+                except Exception as e:
+                    errors[ticker] = e
+                    continue
+                if all(columns is None for columns in series[ticker].values()):
+                    errors[ticker] = NotFoundError("None of the metrics' data was found")
+        grid = QuarterGrid([series[ticker] if ticker not in errors else dict.fromkeys(metrics) for ticker in tickers])
+        if calendar:
+            grid = grid.calendar()
+        in_bounds = period_mask(grid.periods, start_year, start_quarter, end_year, end_quarter)
+        values = np.stack([grid.values[metric][:, in_bounds] for metric in metrics], axis=-1) if metrics else \
+            np.empty((len(tickers), int(in_bounds.sum()), 0))
+        return {"tickers": np.array(tickers, dtype=str), "periods": grid.periods[in_bounds],
+                "metrics": np.array(metrics, dtype=str), "values": values, "mask": ~np.isnan(values),
+                "start": grid.start[:, in_bounds], "end": grid.end[:, in_bounds]}, errors
+
+    def get_cross_section(self, metric, year, quarter, fill_fourth_quarter=True, mute_warnings=False, output='array'):
+        """
+        get_cross_section - Returns a metric for every company that reported it for one calendar quarter, i.e. to rank
+        the whole market by revenue. Built on the SEC's frames API which returns every filer's value of a tag for a
+        period in one request, so a screen of thousands of companies takes a request per possible US-GAAP tag of the
+        metric rather than thousands. Unlike the other methods quarters are calendar quarters, the SEC aligning each
+        filer's fiscal quarters to the closest one, and the SEC is always requested even if a store is used
+        :param metric: The metric to return, one of those accepted by get_statement i.e. 'revenue' or 'eps_diluted'
+        :param year: The calendar year of the quarter as an integer
+        :param quarter: The calendar quarter as an integer from 1 to 4
+        :param fill_fourth_quarter: Whether a company's Q4, which most only report through their yearly 10-K, is derived
+        from its yearly value and first three quarters (as the other methods do) when it isn't reported, default is
+        True. This takes 4 more requests per tag. Balance sheet metrics are reported at the end of every quarter anyway
+        :param mute_warnings: Whether the function should not print warning messages, default is False
+        :param output: Format of the returned data, 'array' (default) as described below, 'structured' for a NumPy
+        structured array or 'columns' for a dictionary of typed arrays (tickers, U10 CIKs, company names, float64
+        values and datetime64[D] dates)
+        :return: A numpy array with the first row being column names and the remainder being the ticker (None for
+        companies without one), CIK, company name, value and start/end dates of every company, sorted from the largest
+        value to the smallest. None if no company reported the metric for the quarter
+        """
+        self._check_output(output)
+        if metric not in self._metrics:
+            raise ValueError("Unknown metric: " + metric)
+        if quarter not in (1, 2, 3, 4):
+            raise ValueError("Quarter must be between 1 and 4: " + str(quarter))
+        jargon_terms, data_title, allow_negatives = self._metrics[metric]
+        try:
+            facts = frames.get_cross_section(jargon_terms, self._frame_units.get(metric, "USD"), year, quarter,
+                                             metric in self._instant_metrics, allow_negatives, fill_fourth_quarter)
+        except NotFoundError:
+            if not mute_warnings:
+                print(self._no_cross_section_warning)
+            return None
+        except HttpError:
+            if not mute_warnings:
+                print(self._http_error_warning)
+            return None
+        columns = frames.to_columns(facts, {cik: self.directory.ticker(cik) for cik in facts})
+        if output == 'columns':
+            return columns
+        return frames.to_structured(columns) if output == 'structured' else frames.from_columns(columns, data_title)
+
+    def stats(self):
+        """
+        stats - Returns what the library recorded since stats started being collected (see the stats parameter) or were
+        last reset, i.e. to tell how much of a slow call was spent throttled, on the network, decoding, parsing or
+        filling the data. Stage timings are exclusive so they add up to the time spent in the library
+        :return: A dictionary with the seconds and calls of every stage, the number of requests (in total, by tag and by
+        status), the bytes downloaded, the cache hits and misses and the rows produced, along with the rate limiter's,
+        the series cache's and the single-flight coalescing's own counters. None if stats aren't being collected
+        """
+        if ut.stats is None:
+            return None
+        snapshot = ut.stats.snapshot()
+        snapshot["series_cache"] = self.series_cache.stats()
+        if ut.rate_limiter is not None:
+            snapshot["rate_limiter"] = ut.rate_limiter.stats()
+        if ut.single_flight is not None:
+            snapshot["single_flight"] = ut.single_flight.stats()
+        return snapshot
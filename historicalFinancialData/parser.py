@@ -0,0 +1,108 @@
+"""
+parser.py - Decodes the fact list of a companyconcept payload (or a tag of a companyfacts document) once into typed
+            column arrays, so the selection of yearly and quarterly data runs as vectorized masks instead of every
+            selection re-iterating the facts and re-parsing the same date strings
+"""
+import numpy as np
+from operator import itemgetter
+
+# Latest month (and day 7 of it) a quarter can start in and still belong to the fiscal year it is reported for
+LATEST_QUARTER_START_MONTH = {"Q1": 1, "Q2": 4, "Q3": 7, "Q4": 10}
+# Ordinal (days since 0001-01-01) of the datetime64 epoch and the integer NumPy stores NaT as
+EPOCH_ORDINAL = 719163
+NAT = np.iinfo(np.int64).min
+# Keys of a fact that are gathered together when decoding, start and frame are often absent so they are gathered apart
+REQUIRED_KEYS = itemgetter("fy", "fp", "form", "val", "end", "filed")
+# Columns of a FactTable
+COLUMNS = ("fy", "has_fy", "fp", "has_fp", "form", "frame", "val", "start", "has_start", "end", "filed")
+
+
+class FactTable:
+    """
+    FactTable - The facts of a tag's unit as columns: fy (int64, 0 when absent), fp, form and frame (str objects, None,
+    None and "" when absent), val (the reported numbers kept as Python objects so the library's output types don't
+    change) and start, end and filed (datetime64[D], NaT when absent). has_fy, has_fp and has_start mark which facts
+    had those keys. String columns are kept as objects as building fixed width string arrays costs more than the
+    selection saves, the masks over them are evaluated once per distinct value (see distinct_mask)
+    """
+    def __init__(self, facts):
+        """
+        :param facts: List of fact dictionaries, as found under a companyconcept payload's units
+        """
+        try:
+            # Facts nearly always have every one of these keys, which are then gathered in C rather than key by key
+            fy, fp, form, val, end, filed = zip(*map(REQUIRED_KEYS, facts)) if facts else [()] * 6
+        except KeyError:
+            fy, fp, form, val, end, filed = zip(*[(item.get("fy"), item.get("fp"), item.get("form"), item["val"],
+                                                   item["end"], item.get("filed", "NaT")) for item in facts])
+        start = [item.get("start", "NaT") for item in facts]
+        frame = [item.get("frame", "") for item in facts]
+        try:
+            self.fy = np.array(fy, dtype=np.int64)
+            self.has_fy = np.ones(len(self.fy), dtype=bool)
+        except TypeError:
+            # Some facts have no (or a null) fiscal year
+            self.fy = np.array(fy, dtype=object)
+            self.has_fy = np.not_equal(self.fy, None)
+            self.fy[~self.has_fy] = 0
+            self.fy = self.fy.astype(np.int64)
+        self.fp = np.array(fp, dtype=object)
+        self.has_fp = np.not_equal(self.fp, None)
+        self.form = np.array(form, dtype=object)
+        self.frame = np.array(frame, dtype=object)
+        self.val = np.empty(len(val), dtype=object)
+        self.val[:] = val
+        # NumPy parses the ISO dates in bulk
+        self.start = np.array(start, dtype='M8[D]')
+        self.has_start = ~np.isnat(self.start)
+        self.end = np.array(end, dtype='M8[D]')
+        self.filed = np.array(filed, dtype='M8[D]')
+
+    def __len__(self):
+        return len(self.val)
+
+
+"Joins the FactTables of consecutive parts of a fact list into the FactTable of the whole list"
+def concatenate_tables(tables):
+    if len(tables) == 1:
+        return tables[0]
+    table = FactTable.__new__(FactTable)
+    for column in COLUMNS:
+        setattr(table, column, np.concatenate([getattr(part, column) for part in tables]))
+    return table
+
+
+"Returns the FactTable of a payload's unit, decoding it only if it hasn't been already"
+def decode_facts(facts):
+    return facts if isinstance(facts, FactTable) else FactTable(facts)
+
+
+"Mask of the values satisfying the predicate, which is only called once per distinct value (i.e. per form or frame)"
+def distinct_mask(values, predicate):
+    results = {value: bool(predicate(value)) for value in set(values.tolist())}
+    return np.fromiter((results[value] for value in values.tolist()), dtype=bool, count=len(values))
+
+
+"Converts datetime objects (or None) into datetime64[D], much faster than NumPy's own conversion of objects"
+def to_datetime64(dates):
+    return np.array([NAT if date is None else date.toordinal() - EPOCH_ORDINAL for date in dates],
+                    dtype=np.int64).view('M8[D]')
+
+
+"Splits datetime64[D] dates into their integer years, months and days"
+def date_parts(dates):
+    months = dates.astype('M8[M]')
+    years = dates.astype('M8[Y]').astype(np.int64) + 1970
+    return years, months.astype(np.int64) % 12 + 1, (dates - months.astype('M8[D]')).astype(np.int64) + 1
+
+
+"""Vectorized check for quarters that start too late in the calendar year to belong to the fiscal year they are
+    reported for. fps can be one fiscal period for all dates or one per date, unknown fiscal periods always frontrun"""
+def frontrunning_mask(starts, fys, fps):
+    years, months, days = date_parts(starts)
+    if isinstance(fps, str):
+        latest_start = LATEST_QUARTER_START_MONTH.get(fps, 0)
+    else:
+        latest_start = np.fromiter((LATEST_QUARTER_START_MONTH.get(fp, 0) for fp in fps.tolist()), dtype=np.int64,
+                                   count=len(fps))
+    return (years > fys) | ((years == fys) & ((latest_start < months) | ((latest_start == months) & (days > 7))))
@@ -0,0 +1,61 @@
+"""
+periods.py - Index over the missing time periods that gap filling matches facts against. Replaces scanning (and
+             rebuilding) an (n, 2) array of periods per fact with a sorted list of their dates and hash lookups
+"""
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+import numpy as np
+
+
+class TimePeriodIndex:
+    """
+    TimePeriodIndex - Missing time periods, as the dates they start and end on. A quarter matches if it starts on the
+    start of any period or ends on the end of any period, which is what testing it against the (n, 2) array of periods
+    the library used to keep did. Once a quarter matched, the dates it covered are removed and the remaining dates are
+    paired up again in order, exactly like that array was masked, sorted and reshaped
+    """
+    def __init__(self, time_periods):
+        """
+        :param time_periods: (n, 2) (or, for a single period, (2,)) array of start and end dates
+        """
+        self._original = time_periods
+        dates = np.asarray(time_periods, dtype=object).reshape(-1).tolist()
+        # Until the first match the periods keep the order (and so the pairing) they were given in, after it starts are
+        # the dates at even positions of the sorted dates and ends those at odd positions
+        self._given_starts, self._given_ends = Counter(dates[0::2]), Counter(dates[1::2])
+        self._dates = sorted(dates)
+        self._changed = False
+
+    def __len__(self):
+        return len(self._dates) // 2
+
+    def _count(self, date, parity):
+        """Number of times the date is a start (parity 0) or an end (parity 1) of a period"""
+        if not self._changed:
+            return (self._given_ends if parity else self._given_starts)[date]
+        low, high = bisect_left(self._dates, date), bisect_right(self._dates, date)
+        return (high + 1 - parity) // 2 - (low + 1 - parity) // 2
+
+    def matches(self, start_date, end_date):
+        """Whether the quarter starts where a period starts or ends where a period ends"""
+        return self._count(start_date, 0) > 0 or self._count(end_date, 1) > 0
+
+    def _discard(self, date, count):
+        i = bisect_left(self._dates, date)
+        del self._dates[i:i + count]
+
+    def fill(self, start_date, end_date, one_day):
+        """Removes the dates the (matching) quarter covers, the remaining dates are paired up again in order"""
+        starts, ends = self._count(start_date, 0), self._count(end_date, 1)
+        self._discard(start_date, starts)
+        self._discard(end_date, ends)
+        # Sometimes the quarter only fills a part of a larger whole, what's left of it starts the day after the quarter
+        if len(self._dates) % 2:
+            insort(self._dates, end_date + one_day)
+        self._changed = True
+
+    def time_periods(self):
+        """The remaining time periods as an (n, 2) array, the given array if nothing matched or None if none remain"""
+        if not self._changed:
+            return self._original if len(self._original) else None
+        return np.array(self._dates, dtype=object).reshape(-1, 2) if self._dates else None
@@ -0,0 +1,245 @@
+"""
+service.py - Service mode: the FinData methods over local HTTP/JSON, all answered by one shared FinData so the processes
+             calling it share one company directory, one series cache and one SEC rate limit. Identical concurrent
+             calls (i.e. for a hot ticker) are coalesced into one SEC request per tag (see utils.single_flight).
+             FinDataClient has the same methods as FinData and returns the same values, each call being made to the
+             service
+
+             Usage: hfd serve [--host 127.0.0.1] [--port 8765] [--cache sec_cache] [--store store]
+                              [--rate-limiter rate_limit_file]
+"""
+import sys
+import json
+import builtins
+import datetime
+import argparse
+import functools
+import threading
+import requests
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import historicalFinancialData.exceptions as exceptions
+from historicalFinancialData.exceptions import *
+from historicalFinancialData.main import FinData
+
+# Port the service listens on, and clients connect to, by default
+DEFAULT_PORT = 8765
+# FinData methods the service answers, which FinDataClient has
+SERVICE_METHODS = ("get_revenue", "get_dates", "get_cost_of_revenue", "get_gross_profit", "get_operating_income",
+                   "get_net_profit", "get_eps", "get_total_assets", "get_total_liabilities", "get_statement",
+                   "get_many", "get_derived", "get_panel", "get_cross_section", "stats")
+
+
+"""Encodes a method's arguments or result into json values, the types json doesn't have (dates, tuples, NumPy arrays
+    and exceptions) being tagged so decode returns them as they were"""
+def encode(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return encode(value.item())
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, np.ndarray):
+        dtype = [list(field) for field in value.dtype.descr] if value.dtype.names else value.dtype.str
+        return {"__ndarray__": encode(value.tolist()), "dtype": dtype, "shape": list(value.shape)}
+    if isinstance(value, tuple):
+        return {"__tuple__": [encode(item) for item in value]}
+    if isinstance(value, list):
+        return [encode(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): encode(item) for key, item in value.items()}
+    if isinstance(value, Exception):
+        return {"__error__": type(value).__name__, "message": str(value)}
+    raise TypeError("Cannot be sent to or from the service: " + repr(value))
+
+
+"Rebuilds an exception encoded by encode, as the library's (or Python's) exception of the same name"
+def decode_error(name, message):
+    error_class = getattr(exceptions, name, None) or getattr(builtins, name, None)
+    if not isinstance(error_class, type) or not issubclass(error_class, Exception):
+        return Exception(name + ": " + message)
+    return error_class(message)
+
+
+"Decodes json values encoded by encode back into the values they were"
+def decode(value):
+    if isinstance(value, list):
+        return [decode(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "__datetime__" in value:
+        return datetime.datetime.fromisoformat(value["__datetime__"])
+    if "__date__" in value:
+        return datetime.date.fromisoformat(value["__date__"])
+    if "__tuple__" in value:
+        return tuple(decode(item) for item in value["__tuple__"])
+    if "__error__" in value:
+        return decode_error(value["__error__"], value["message"])
+    if "__ndarray__" in value:
+        dtype = np.dtype([tuple(field) for field in value["dtype"]] if isinstance(value["dtype"], list)
+                         else value["dtype"])
+        array = np.empty(value["shape"], dtype=dtype)
+        # Assigned rather than passed to np.array, which would make object arrays of rows of equal length 2d
+        if array.size:
+            array[...] = decode(value["__ndarray__"])
+        return array
+    return {key: decode(item) for key, item in value.items()}
+
+
+class _Server(ThreadingHTTPServer):
+    # Many clients connect at once when a hot ticker is asked for, more than the default backlog of 5
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class FinDataService:
+    """
+    FinDataService - Local HTTP/JSON server answering SERVICE_METHODS with one shared FinData, each request in its own
+    thread. A call is a POST to /<method> of {"args": [...], "kwargs": {...}} (encoded by encode), answered with
+    {"result": ...} or, if the method raised, {"error": ...}. Warnings are printed by the service, not the clients
+    """
+
+    def __init__(self, fin_data=None, host="127.0.0.1", port=DEFAULT_PORT):
+        """
+        :param fin_data: The FinData every call is answered with, a default FinData() if not given
+        :param host: Interface the service listens on, only the local host by default
+        :param port: Port the service listens on, 0 for any free port (see url)
+        """
+        self.fin_data = FinData() if fin_data is None else fin_data
+        self._server = _Server((host, port), self._handler_class())
+        self._thread = None
+
+    def _handler_class(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, status, body):
+                content = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_POST(self):
+                method = self.path.strip("/")
+                if method not in SERVICE_METHODS:
+                    self._respond(404, {"error": encode(ValueError("Unknown method: " + method))})
+                    return
+                try:
+                    call = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                    result = getattr(service.fin_data, method)(*decode(call.get("args", [])),
+                                                               **decode(call.get("kwargs", {})))
+                    self._respond(200, {"result": encode(result)})
+                except Exception as e:
+                    self._respond(400, {"error": encode(e)})
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return "http://" + host + ":" + str(port)
+
+    def serve_forever(self):
+        """Answers calls until shutdown is called (from another thread)"""
+        self._server.serve_forever()
+
+    def start(self):
+        """Answers calls from a background thread, returns the service"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self):
+        """Stops answering calls and closes the service's socket"""
+        if self._thread is not None:
+            self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.shutdown()
+
+
+class FinDataClient:
+    """
+    FinDataClient - Has the same methods (see SERVICE_METHODS), with the same arguments and results, as FinData, each of
+    them answered by a FinDataService. Exceptions raised by the service's FinData are raised by the client, and
+    HttpError if the service can't be reached. Arguments must be values json can carry (get_derived's formulas can't)
+    """
+
+    def __init__(self, url="http://127.0.0.1:" + str(DEFAULT_PORT), timeout=300):
+        """
+        :param url: URL of the service, the local host's default port by default
+        :param timeout: Seconds a call waits for the service's answer, default is five minutes
+        """
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self._session = requests.Session()
+
+    def _call(self, method, args, kwargs):
+        """Helper function making the call to the service and returning its decoded result"""
+        body = json.dumps({"args": encode(list(args)), "kwargs": encode(kwargs)})
+        try:
+            r = self._session.post(self.url + "/" + method, data=body, timeout=self.timeout,
+                                   headers={'Content-Type': 'application/json'})
+            answer = json.loads(r.content)
+        except (requests.RequestException, ValueError) as e:
+            raise HttpError("Could not reach the service at " + self.url + ": " + str(e))
+        if "error" in answer:
+            raise decode(answer["error"])
+        return decode(answer["result"])
+
+    def close(self):
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+"Builds the FinDataClient method calling the service's method of the same name, with FinData's signature and docstring"
+def _remote_method(name):
+    @functools.wraps(getattr(FinData, name))
+    def method(self, *args, **kwargs):
+        return self._call(name, args, kwargs)
+    return method
+
+
+for _name in SERVICE_METHODS:
+    setattr(FinDataClient, _name, _remote_method(_name))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog="hfd serve", description="Serves the FinData methods over local HTTP/JSON, "
+                                                                   "with one shared cache and SEC rate limit")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on, only the local host by default")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+    parser.add_argument("--cache", help="Directory of a persistent cache for SEC responses")
+    parser.add_argument("--store", help="Directory of a ColumnarStore to answer from instead of the SEC")
+    parser.add_argument("--rate-limiter", help="File sharing the SEC rate limit with other processes using it")
+    args = parser.parse_args(args)
+    service = FinDataService(FinData(cache=args.cache, store=args.store, rate_limiter=args.rate_limiter), args.host,
+                             args.port)
+    print("Serving FinData on " + service.url, file=sys.stderr)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
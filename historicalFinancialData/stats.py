@@ -0,0 +1,130 @@
+"""
+stats.py - Optional instrumentation of the library: where the time of a call goes (throttling, network, json decoding,
+           parsing, filling), what was requested and how it was answered. Off unless a Stats object is set, in which
+           case the cost is a check per stage
+"""
+import json
+import time
+import logging
+import threading
+from collections import defaultdict
+from urllib.parse import urlparse
+
+
+"Returns what a request was for: the us-gaap tag for companyconcept requests, the document's name for the others"
+def request_subject(url):
+    parts = [part for part in urlparse(url).path.split('/') if part]
+    if "us-gaap" in parts:
+        return parts[-1].rsplit('.', 1)[0]
+    if "companyfacts" in parts:
+        return "companyfacts"
+    if "submissions" in parts:
+        return "submissions"
+    return parts[-1].rsplit('.', 1)[0] if parts else url
+
+
+class Stats:
+    """
+    Stats - Collects per-stage timings, requests (by tag and by status), bytes downloaded, cache hits and rows produced.
+    Stage timings are exclusive: time spent in a stage nested within another (i.e. the network within parsing) only
+    counts towards the nested one, so the stages add up to the time spent in the library. Every event is also passed,
+    as a dictionary, to the hooks, which can turn them into structured logs (see logging_hook). Safe to share between
+    threads
+    """
+
+    def __init__(self, hooks=None):
+        """
+        :param hooks: Optional list of callables, each called with every event as a dictionary with an "event" key of
+        'stage', 'request', 'cache' or 'rows'. Stage events are the most frequent, a few dozen per series
+        """
+        self.hooks = [] if hooks is None else list(hooks)
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Stack of the stages the thread is in, to make their timings exclusive
+        self.reset()
+
+    def reset(self):
+        """Sets every counter back to zero"""
+        with self._lock:
+            self._stages = defaultdict(lambda: [0.0, 0])
+            self._requests_by_subject = defaultdict(int)
+            self._responses_by_status = defaultdict(int)
+            self._cache = defaultdict(int)
+            self._requests, self._bytes, self._rows = 0, 0, 0
+
+    def add_hook(self, hook):
+        """Adds a callable called with every event from now on"""
+        self.hooks.append(hook)
+
+    def _emit(self, event):
+        for hook in self.hooks:
+            hook(event)
+
+    def timed(self, stage, function, *args, **kwargs):
+        """Calls the function, recording the time spent in it (but not in the stages it calls) under the stage"""
+        stack = self._local.__dict__.setdefault("stack", [])
+        nested_seconds = [0.0]
+        stack.append(nested_seconds)
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1][0] += seconds
+            self.record_stage(stage, seconds - nested_seconds[0])
+
+    def record_stage(self, stage, seconds):
+        """Records time spent in a stage, see timed to have nested stages taken out of it"""
+        with self._lock:
+            timing = self._stages[stage]
+            timing[0] += seconds
+            timing[1] += 1
+        if self.hooks:
+            self._emit({"event": "stage", "stage": stage, "seconds": seconds})
+
+    def record_request(self, url, status, content_bytes):
+        """Records a response from the SEC, retried attempts included"""
+        with self._lock:
+            self._requests += 1
+            self._bytes += content_bytes
+            self._requests_by_subject[request_subject(url)] += 1
+            self._responses_by_status[status] += 1
+        if self.hooks:
+            self._emit({"event": "request", "url": url, "subject": request_subject(url), "status": status,
+                        "bytes": content_bytes})
+
+    def record_cache(self, cache, outcome):
+        """Records the outcome ('hit', 'miss', 'revalidated', 'skipped', ...) of a lookup in one of the caches"""
+        with self._lock:
+            self._cache[cache + "." + outcome] += 1
+        if self.hooks:
+            self._emit({"event": "cache", "cache": cache, "outcome": outcome})
+
+    def record_rows(self, rows):
+        """Records the number of quarters returned to the user"""
+        with self._lock:
+            self._rows += rows
+        if self.hooks:
+            self._emit({"event": "rows", "rows": rows})
+
+    def snapshot(self):
+        """Returns every counter as a dictionary of plain values, ready to be exported as metrics or json"""
+        with self._lock:
+            return {"stages": {stage: {"seconds": seconds, "calls": calls}
+                               for stage, (seconds, calls) in sorted(self._stages.items())},
+                    "requests": self._requests, "bytes_downloaded": self._bytes,
+                    "requests_by_tag": dict(sorted(self._requests_by_subject.items())),
+                    "responses_by_status": {str(status): count for status, count in
+                                            sorted(self._responses_by_status.items())},
+                    "cache": dict(sorted(self._cache.items())), "rows_produced": self._rows}
+
+
+"Returns a hook logging every event, other than stage timings unless asked for, as a line of json"
+def logging_hook(logger=None, level=logging.INFO, stages=False):
+    logger = logging.getLogger("historicalFinancialData") if logger is None else logger
+
+    def hook(event):
+        if stages or event["event"] != "stage":
+            logger.log(level, json.dumps(event))
+    return hook
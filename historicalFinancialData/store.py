@@ -0,0 +1,235 @@
+"""
+store.py - A local columnar store of cleaned quarterly series, one .npz file of typed columns per company, along with the
+           ingestion of the SEC's bulk companyfacts.zip archive into it so FinData can run without any network access.
+           The cleaning is CPU bound, so ingestion can spread the archive's companies over a pool of processes.
+
+           Usage: python -m historicalFinancialData.store companyfacts.zip store_directory --tickers company_tickers.json
+                  [--workers 8]
+"""
+import os
+import re
+import sys
+import json
+import zipfile
+import argparse
+import tempfile
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import historicalFinancialData.utils as ut
+from historicalFinancialData.columnar import COLUMNS, to_columns
+from historicalFinancialData.exceptions import *
+
+# Archive members are named after the company's zero-padded CIK, i.e. CIK0000320193.json
+_MEMBER_NAME = re.compile(r"CIK(\d{10})\.json$")
+# Forms of the (quarterly and yearly) reports the series are cleaned out of
+PERIODIC_FORMS = ("10-Q", "10-K", "10-Q/A", "10-K/A")
+# Number of archive members an ingestion worker is given at a time, large enough that scheduling a chunk costs little
+# next to cleaning it, small enough that the workers finish together
+INGEST_CHUNK_SIZE = 16
+
+
+class ColumnarStore:
+    """
+    ColumnarStore - Directory holding every series of a company in a single CIK##########.npz file, with one typed array
+    per column and metric (i.e. revenue.period, revenue.value, revenue.start, revenue.end and revenue.integral, which
+    values were integers), and the SEC's ticker to CIK mapping in company_tickers.json. The latest filing each
+    company's series include is kept in sync_state.json so syncing (see sync.py) only refreshes the companies that filed
+    since. Files are written to a temporary file and atomically renamed into place.
+    """
+    tickers_file_name = "company_tickers.json"
+    sync_state_file_name = "sync_state.json"
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _company_path(self, cik):
+        return os.path.join(self.directory, "CIK" + cik + ".npz")
+
+    def _atomic_write(self, path, write):
+        fd, temp_path = tempfile.mkstemp(prefix=".tmp-", dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def write_company(self, cik, series):
+        """Stores a company's series given a dictionary from metric to the labeled array get_data returns (or None)"""
+        arrays = {}
+        for metric, data in series.items():
+            if data is None or len(data) < 2:
+                continue
+            for name, column in to_columns(data).items():
+                arrays[metric + "." + name] = column
+            arrays[metric + ".integral"] = np.array([type(value) is int for value in data[1:, 1].tolist()], dtype=bool)
+        self._atomic_write(self._company_path(cik), lambda f: np.savez(f, **arrays))
+
+    def read_company(self, cik):
+        """Returns a dictionary from metric to its dictionary of typed columns, None if the company isn't stored"""
+        try:
+            with np.load(self._company_path(cik)) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+        except FileNotFoundError:
+            return None
+        metrics = {name.rsplit(".", 1)[0] for name in arrays}
+        series = {metric: {column: arrays[metric + "." + column] for column in COLUMNS} for metric in metrics}
+        for metric, columns in series.items():
+            # Stores written before integral was kept are taken to have had integers wherever a value is whole
+            columns["integral"] = arrays.get(metric + ".integral", np.isfinite(columns["value"]) &
+                                             (np.round(columns["value"]) == columns["value"]))
+        return series
+
+    def read_series(self, cik, metric):
+        """Returns the typed columns of one of the company's metrics, along with which values were integers (integral),
+        raises NotFoundError if there is no such data"""
+        company = self.read_company(cik)
+        if company is None or metric not in company:
+            raise NotFoundError("Series was not found in the store")
+        return company[metric]
+
+    def ciks(self):
+        """Returns the (zero-padded) CIKs of every company in the store"""
+        return sorted(name[3:13] for name in os.listdir(self.directory) if re.fullmatch(r"CIK\d{10}\.npz", name))
+
+    def write_tickers(self, tickers):
+        """Stores the SEC's company_tickers.json payload"""
+        self._atomic_write(os.path.join(self.directory, self.tickers_file_name),
+                           lambda f: f.write(json.dumps(tickers).encode('utf-8')))
+
+    def read_tickers(self):
+        """Returns the stored company_tickers.json payload or None if it was never ingested"""
+        try:
+            with open(os.path.join(self.directory, self.tickers_file_name), 'rb') as f:
+                return json.loads(f.read().decode('utf-8'))
+        except FileNotFoundError:
+            return None
+
+    def write_sync_state(self, state):
+        """Stores the dictionary from CIK to the [filed date, accession number] of the latest filing in its series"""
+        self._atomic_write(os.path.join(self.directory, self.sync_state_file_name),
+                           lambda f: f.write(json.dumps(state).encode('utf-8')))
+
+    def read_sync_state(self):
+        """Returns the stored dictionary from CIK to its latest filing, empty if the store was never synced"""
+        try:
+            with open(os.path.join(self.directory, self.sync_state_file_name), 'rb') as f:
+                return json.loads(f.read().decode('utf-8'))
+        except FileNotFoundError:
+            return {}
+
+
+"""Returns the [filed date, accession number] of the latest periodic report any of the company's facts come from, or
+    ["", ""] (which sorts before every filing) if there is none. ISO dates sort chronologically as strings, accession
+    numbers only break same day ties"""
+def latest_reported_filing(company_facts):
+    latest = ["", ""]
+    for concept in company_facts.get("facts", {}).get("us-gaap", {}).values():
+        for facts in concept.get("units", {}).values():
+            for fact in facts:
+                if fact.get("form") in PERIODIC_FORMS and "filed" in fact and "accn" in fact:
+                    filing = [fact["filed"], fact["accn"]]
+                    if filing > latest:
+                        latest = filing
+    return latest
+
+
+"Parses every metric out of a company's companyfacts document, returning a dictionary from metric to its full series"
+def parse_company_facts(cik, company_facts, metrics):
+    series, failures = {}, []
+    for metric, (jargon_terms, data_title, allow_negatives) in metrics.items():
+        try:
+            series[metric] = ut.get_data(cik, jargon_terms, data_title, allow_negatives=allow_negatives,
+                                         company_facts=company_facts)
+        except NotFoundError:
+            series[metric] = None
+        except Exception as e:  # Odd filers can trip the cleaning up, which shouldn't stop a whole backfill
+            series[metric] = None
+            failures.append((cik, metric, e))
+    return series, failures
+
+
+"""Ingests the given members of the archive, one at a time so memory stays bounded, writing each company's series into
+    the store directory. Runs in the ingestion workers, which are only sent paths and names and only send back each
+    company's latest filing and failures, rather than documents or series. Returns [(cik, latest filing)] and failures"""
+def ingest_archive_members(archive_path, store_directory, members, metrics):
+    store, ingested, failures = ColumnarStore(store_directory), [], []
+    with zipfile.ZipFile(archive_path) as archive:
+        for member in members:
+            cik = _MEMBER_NAME.search(member).group(1)
+            with archive.open(member) as f:
+                company_facts = json.load(f)
+            series, company_failures = parse_company_facts(cik, company_facts, metrics)
+            failures += company_failures
+            store.write_company(cik, series)
+            ingested.append((cik, latest_reported_filing(company_facts)))
+    return ingested, failures
+
+
+"""Reads the SEC's bulk companyfacts.zip archive and writes the cleaned quarterly series of every company into the
+    store. With more than one worker the archive's members are ingested, in chunks, by a pool of that many processes
+    so the cleaning runs on as many cores. Progress is given the number of companies ingested so far and in total.
+    Returns the number of companies ingested and the failures"""
+def ingest_company_facts_archive(archive_path, store, metrics=None, tickers_path=None, progress=None, workers=1):
+    if metrics is None:
+        from historicalFinancialData.main import FinData  # Imported here as main itself depends on the store
+        metrics = FinData._metrics
+    if tickers_path is not None:
+        with open(tickers_path, 'rb') as f:
+            store.write_tickers(json.loads(f.read().decode('utf-8')))
+    with zipfile.ZipFile(archive_path) as archive:
+        members = [member for member in archive.namelist() if _MEMBER_NAME.search(member)]
+    chunks = [members[i:i + INGEST_CHUNK_SIZE] for i in range(0, len(members), INGEST_CHUNK_SIZE)]
+    ingested, failures, sync_state = 0, [], store.read_sync_state()
+
+    def collect(chunk_ingested, chunk_failures):
+        nonlocal ingested, failures
+        sync_state.update(chunk_ingested)
+        failures += chunk_failures
+        ingested += len(chunk_ingested)
+        if progress is not None:
+            progress(ingested, len(members))
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+            futures = [executor.submit(ingest_archive_members, archive_path, store.directory, chunk, metrics)
+                       for chunk in chunks]
+            for future in as_completed(futures):
+                collect(*future.result())
+    else:
+        for chunk in chunks:
+            collect(*ingest_archive_members(archive_path, store.directory, chunk, metrics))
+    # Later syncs only need to refresh the companies that filed after the archive was made
+    store.write_sync_state(sync_state)
+    return ingested, failures
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Ingests the SEC's bulk companyfacts.zip archive into a local store")
+    parser.add_argument("archive", help="Path to the companyfacts.zip archive")
+    parser.add_argument("store", help="Directory of the store, created if it doesn't exist")
+    parser.add_argument("--tickers", help="Path to the SEC's company_tickers.json, needed to look companies up by ticker")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of processes cleaning the companies, default is the number of CPUs")
+    args = parser.parse_args(args)
+    reported = 0
+
+    def report_progress(done, total):
+        nonlocal reported
+        # Workers finish whole chunks so the count moves by more than one company at a time
+        if done - reported >= 100 or done == total:
+            reported = done
+            print("Ingested " + str(done) + "/" + str(total) + " companies", file=sys.stderr)
+
+    ingested, failures = ingest_company_facts_archive(args.archive, ColumnarStore(args.store),
+                                                      tickers_path=args.tickers, progress=report_progress,
+                                                      workers=args.workers)
+    for cik, metric, error in failures:
+        print("WARNING: Could not parse " + metric + " for CIK" + cik + ": " + repr(error), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+"""
+streaming.py - Incremental decoding of the SEC's json documents. The document is read chunk by chunk and every fact list
+               (the arrays under a "units" object, of companyconcept and companyfacts documents alike) is decoded
+               straight into FactTables, a batch of facts at a time, so neither the whole document's text nor the
+               dictionaries of all of its facts are ever in memory at once. The rest of the document is decoded as usual
+"""
+import re
+import json
+import codecs
+from json.scanner import make_scanner
+from historicalFinancialData.parser import FactTable, concatenate_tables
+
+# Bytes of a document decoded at a time when it is already fully in memory
+CHUNK_SIZE = 1 << 16
+# Facts whose dictionaries are gathered before being decoded into (a part of) their FactTable
+FACT_BATCH_SIZE = 8192
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _Reader:
+    """
+    _Reader - Text of the document read so far, from the position decoding is at, refilled from the chunks on demand
+    """
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._scan = make_scanner(json.JSONDecoder())
+        self.text = ""
+        self.pos = 0
+        self.exhausted = False
+
+    def fill(self):
+        """Appends the next chunk to the text, dropping what was already decoded. Returns False at the end"""
+        if self.exhausted:
+            return False
+        chunk = next(self._chunks, None)
+        self.exhausted = chunk is None
+        self.text = self.text[self.pos:] + self._utf8.decode(b"" if chunk is None else chunk, final=self.exhausted)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Skips whitespace, returning the character decoding is at"""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                raise json.JSONDecodeError("Unexpected end of document", self.text, self.pos)
+
+    def expect(self, characters):
+        """Consumes the next character, which has to be one of the given ones, returning it"""
+        character = self.peek()
+        if character not in characters:
+            raise json.JSONDecodeError("Expecting one of '" + characters + "'", self.text, self.pos)
+        self.pos += 1
+        return character
+
+    def value(self):
+        """Decodes the next value whole. A value running to the end of the text could be cut short (a number) or
+        incomplete, so it is decoded again once more of the document was read"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._scan(self.text, self.pos)
+                if end < len(self.text) or self.exhausted:
+                    self.pos = end
+                    return value
+            except StopIteration:
+                if self.exhausted:
+                    raise json.JSONDecodeError("Expecting value", self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            self.fill()
+
+    def complete_facts(self):
+        """Decodes every fact (but the last) that is complete in the text at once, as the C decoder decodes a batch
+        much faster than facts one by one. A '},{' ending a batch could be inside a string, but the batch then doesn't
+        decode as a string can't be left open. Returns None if there is no such batch"""
+        array_end = self.text.find(']', self.pos)
+        last_fact_end = self.text.rfind('},{', self.pos, len(self.text) if array_end < 0 else array_end)
+        if last_fact_end < 0:
+            return None
+        try:
+            facts = json.loads('[' + self.text[self.pos:last_fact_end + 1] + ']')
+        except json.JSONDecodeError:
+            return None
+        self.pos = last_fact_end + 2
+        return facts
+
+
+"Decodes an object, with the fact lists of the one keyed by 'units' decoded into FactTables"
+def _decode_object(reader, in_units):
+    reader.expect('{')
+    output = {}
+    if reader.peek() == '}':
+        reader.pos += 1
+        return output
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        character = reader.peek()
+        if character == '{':
+            output[key] = _decode_object(reader, key == "units")
+        elif character == '[' and in_units:
+            output[key] = _decode_facts(reader)
+        else:
+            output[key] = reader.value()
+        if reader.expect(',}') == '}':
+            return output
+
+
+"Decodes a fact list into a FactTable, decoding its facts in batches so only a batch of their dictionaries is kept"
+def _decode_facts(reader):
+    reader.expect('[')
+    facts, tables = [], []
+    if reader.peek() == ']':
+        reader.pos += 1
+        return FactTable(facts)
+    # Text a batch couldn't be decoded out of, it is only tried again once more of the document was read
+    failed_text = None
+    while True:
+        if reader.text is not failed_text:
+            batch = reader.complete_facts()
+            if batch is None:
+                failed_text = reader.text
+            else:
+                facts += batch
+        facts.append(reader.value())
+        if len(facts) >= FACT_BATCH_SIZE:
+            tables.append(FactTable(facts))
+            facts = []
+        if reader.expect(',]') == ']':
+            tables.append(FactTable(facts))
+            return concatenate_tables(tables)
+
+
+"""Decodes a json document given as bytes or an iterable of byte chunks (i.e. a streamed response's), returning what
+    json.loads would except for the fact lists, which are FactTables"""
+def decode_document(content):
+    if isinstance(content, (bytes, bytearray)):
+        view = memoryview(content)
+        content = (view[i:i + CHUNK_SIZE] for i in range(0, len(view), CHUNK_SIZE))
+    reader = _Reader(content)
+    document = _decode_object(reader, False) if reader.peek() == '{' else reader.value()
+    while True:
+        reader.pos = _WHITESPACE.match(reader.text, reader.pos).end()
+        if reader.pos < len(reader.text):
+            raise json.JSONDecodeError("Extra data", reader.text, reader.pos)
+        if not reader.fill():
+            return document
@@ -0,0 +1,110 @@
+"""
+sync.py - Incremental refresh of a ColumnarStore. Each company's (small) submissions document, revalidated with a
+          conditional request when a response cache is set, tells whether it filed a periodic report since the latest
+          filing its stored series include. Only the companies that did have their companyfacts document downloaded,
+          cleaned and written into the store again, turning a full refresh of the store into a delta refresh.
+
+          Usage: python -m historicalFinancialData.sync store_directory [--ciks 320193 789019 ...]
+"""
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import historicalFinancialData.utils as ut
+from historicalFinancialData.exceptions import *
+from historicalFinancialData.store import PERIODIC_FORMS, ColumnarStore, latest_reported_filing, parse_company_facts
+
+# Number of companies refreshed between writes of the sync state, so an interrupted sync keeps most of its progress
+_STATE_WRITE_INTERVAL = 100
+
+
+"Returns the [filing date, accession number] of the latest periodic report in a submissions document, None if none"
+def latest_submitted_filing(submissions):
+    recent = submissions.get("filings", {}).get("recent", {})
+    filings = [[filed, accn] for filed, accn, form in
+               zip(recent.get("filingDate", []), recent.get("accessionNumber", []), recent.get("form", []))
+               if form in PERIODIC_FORMS]
+    return max(filings) if filings else None
+
+
+"""Returns the company's latest periodic filing if it filed after the given (stored) latest filing, None if it didn't.
+    Companies without a stored filing are always refreshed"""
+def check_for_new_filing(cik, stored_filing):
+    # A fresh cached submissions document could predate today's filings, so it is always checked with the SEC
+    latest = latest_submitted_filing(ut.get_url_data(ut.submissions_url.format(cik), revalidate=True))
+    if stored_filing is None or (latest is not None and latest > stored_filing):
+        return latest
+    return None
+
+
+"""Refreshes a single company in the store if it filed since the stored filing. Returns whether it was refreshed, its
+    new latest filing and the metrics that failed to parse"""
+def sync_company(store, cik, stored_filing, metrics):
+    submitted_filing = check_for_new_filing(cik, stored_filing)
+    if submitted_filing is None and stored_filing is not None:
+        return False, stored_filing, []
+    # For the same reason a cached companyfacts document could still be missing the new filing's facts
+    company_facts = ut.get_url_data(ut.company_facts_url.format(cik), revalidate=True)
+    series, failures = parse_company_facts(cik, company_facts, metrics)
+    store.write_company(cik, series)
+    # The submissions document can list filings without any us-gaap facts, remembering it keeps them from being
+    # refreshed again on every sync
+    latest_filing = latest_reported_filing(company_facts)
+    if submitted_filing is not None and submitted_filing > latest_filing:
+        latest_filing = submitted_filing
+    return True, latest_filing, failures
+
+
+"""Refreshes the store's companies (or the given CIKs, which are added to the store if they aren't in it) that filed a
+    periodic report since they were last ingested or synced. The companies are checked concurrently by a pool of threads
+    sharing the library's rate limit. Returns the CIKs that were refreshed and the failures, as (cik, metric, error)
+    with a None metric if the whole company failed"""
+def sync_store(store, ciks=None, metrics=None, max_workers=8, progress=None):
+    if metrics is None:
+        from historicalFinancialData.main import FinData  # Imported here as main itself depends on the store
+        metrics = FinData._metrics
+    ciks = store.ciks() if ciks is None else [str(cik).zfill(10) for cik in ciks]
+    sync_state = store.read_sync_state()
+    refreshed, failures = [], []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(sync_company, store, cik, sync_state.get(cik), metrics): cik for cik in ciks}
+        for i, future in enumerate(as_completed(futures)):
+            cik = futures[future]
+            try:
+                was_refreshed, latest_filing, company_failures = future.result()
+            except (HttpError, ForbiddenError) as e:
+                failures.append((cik, None, e))
+            else:
+                failures += company_failures
+                if was_refreshed:
+                    sync_state[cik] = latest_filing
+                    refreshed.append(cik)
+                    if len(refreshed) % _STATE_WRITE_INTERVAL == 0:
+                        store.write_sync_state(sync_state)
+            if progress is not None:
+                progress(i + 1, len(ciks))
+    if refreshed:
+        store.write_sync_state(sync_state)
+    return sorted(refreshed), failures
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Refreshes the companies in a local store that filed since it was "
+                                                 "last synced")
+    parser.add_argument("store", help="Directory of the store, see store.py to create one out of the bulk archive")
+    parser.add_argument("--ciks", nargs="+", help="CIKs to sync instead of every company in the store")
+    args = parser.parse_args(args)
+
+    def report_progress(done, total):
+        if done % 100 == 0 or done == total:
+            print("Checked " + str(done) + "/" + str(total) + " companies", file=sys.stderr)
+
+    refreshed, failures = sync_store(ColumnarStore(args.store), args.ciks, progress=report_progress)
+    print("Refreshed " + str(len(refreshed)) + " companies", file=sys.stderr)
+    for cik, metric, error in failures:
+        print("WARNING: Could not sync " + (metric + " for " if metric else "") + "CIK" + cik + ": " + repr(error),
+              file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+tags.py - Index of the us-gaap tags each company reports, persisted locally. Lets the library skip companyconcept
+          requests for tags a company is known not to report instead of spending its rate limit budget on their 404s
+"""
+import os
+import json
+import time
+import atexit
+import weakref
+import tempfile
+import threading
+
+
+class TagIndex:
+    """
+    TagIndex - Records, per CIK, which us-gaap tags the company reports. It is learned from the 404s of companyconcept
+    requests (and the tags that were found) and seeded with the complete list of a company's tags whenever its
+    companyfacts document is read. What it learned is forgotten after max_age, so tags a company newly adopts get
+    picked up. Loaded lazily on the first lookup and safe to share between threads. What is learned is written to the
+    file every flush_every changes or flush_interval seconds, by flush and when the interpreter exits, rather than on
+    every change. Processes sharing the same file each write their whole index, the last one to write wins, which at
+    worst costs requests that could've been skipped
+    """
+    default_path = os.path.join(os.path.expanduser("~"), ".cache", "historicalFinancialData", "tag_index.json")
+
+    def __init__(self, path=default_path, max_age=7 * 24 * 60 * 60, flush_every=100, flush_interval=5):
+        """
+        :param path: File the index is persisted to, None to keep it in memory only
+        :param max_age: Seconds after which what was learned about a company's tags is forgotten, default is a week
+        :param flush_every: Number of changes after which the index is written to the file
+        :param flush_interval: Seconds after which changes not yet written are written along with the next one
+        """
+        self.path = path
+        self.max_age = max_age
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # Held while the file is written so writes, made outside of _lock, are made in order
+        self._flush_lock = threading.Lock()
+        # CIK to {"reported": [tags], "seeded": time} from a companyfacts document and {"missing": {tag: time}} of 404s
+        self._companies = None
+        # Changes not yet written to the file and when it was last written
+        self._changes = 0
+        self._flushed_at = time.time()
+        if path is not None:
+            atexit.register(_flush_at_exit, weakref.ref(self))
+
+    def _ensure_loaded(self):
+        if self._companies is not None:
+            return
+        self._companies = {}
+        if self.path is not None and os.path.exists(self.path):
+            try:
+                with open(self.path, 'rb') as f:
+                    self._companies = json.loads(f.read().decode('utf-8'))
+            except (OSError, ValueError):
+                pass  # A corrupted index only costs the requests it would've saved
+
+    def _save(self, content):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, self.path)
+
+    def _changed(self):
+        """Counts a change (with _lock held), returns whether the index is due to be flushed"""
+        self._changes += 1
+        return self.path is not None and (self._changes >= self.flush_every or
+                                          time.time() - self._flushed_at >= self.flush_interval)
+
+    def flush(self):
+        """Writes the changes made to the index since it was last written to its file"""
+        if self.path is None:
+            return
+        with self._flush_lock:
+            with self._lock:
+                if not self._changes:
+                    return
+                content = json.dumps(self._companies).encode('utf-8')
+                self._changes = 0
+                self._flushed_at = time.time()
+            self._save(content)
+
+    def _is_fresh(self, learned_at):
+        return learned_at is not None and time.time() - learned_at < self.max_age
+
+    def is_missing(self, cik, tag):
+        """Whether the company is known (and recently enough) not to report the tag"""
+        with self._lock:
+            self._ensure_loaded()
+            company = self._companies.get(str(cik))
+            if company is None:
+                return False
+            if self._is_fresh(company.get("seeded")):
+                return tag not in company["reported"]
+            return self._is_fresh(company.get("missing", {}).get(tag))
+
+    def record(self, cik, tag, reported):
+        """Records whether the company reports the tag, learned from a companyconcept request for it"""
+        due = False
+        with self._lock:
+            self._ensure_loaded()
+            company = self._companies.setdefault(str(cik), {})
+            missing = company.setdefault("missing", {})
+            changed = not reported or tag in missing
+            if reported:
+                missing.pop(tag, None)
+                if "reported" in company and tag not in company["reported"]:
+                    company["reported"].append(tag)
+                    changed = True
+            else:
+                missing[tag] = time.time()
+            # Tags found again teach nothing new, so only changes count towards the next write
+            if changed:
+                due = self._changed()
+        if due:
+            self.flush()
+
+    def seed(self, cik, company_facts):
+        """Records every tag the company reports out of its companyfacts document, None if it has no such document"""
+        reported = [] if company_facts is None else sorted(company_facts.get("facts", {}).get("us-gaap", {}))
+        with self._lock:
+            self._ensure_loaded()
+            company = self._companies.get(str(cik), {})
+            if company.get("reported") == reported and self._is_fresh(company.get("seeded")):
+                return
+            self._companies[str(cik)] = {"reported": reported, "seeded": time.time(), "missing": {}}
+            due = self._changed()
+        if due:
+            self.flush()
+
+    def invalidate(self, cik=None):
+        """Forgets what was learned about the company's tags, or about every company's if no CIK is given"""
+        with self._lock:
+            self._ensure_loaded()
+            if cik is None:
+                self._companies.clear()
+            else:
+                self._companies.pop(str(cik), None)
+            due = self._changed()
+        if due:
+            self.flush()
+
+
+"Flushes the index, if it still exists, when the interpreter exits"
+def _flush_at_exit(index_ref):
+    index = index_ref()
+    if index is not None:
+        index.flush()
@@ -0,0 +1,191 @@
+"""
+transport.py - The HTTP layer every SEC request goes through. Keeps a pooled keep-alive session, negotiates compressed
+               responses and retries rate limited (429) and server side (5xx) failures with jittered exponential
+               backoff. AsyncTransport does the same for coroutines, on aiohttp (historicalFinancialData[async])
+"""
+import time
+import random
+import asyncio
+import datetime
+import requests
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from historicalFinancialData.exceptions import *
+
+try:
+    import aiohttp
+except ImportError:  # Only AsyncTransport needs it, it is the async extra's dependency
+    aiohttp = None
+
+
+class Transport:
+    """
+    Transport - A pooled requests session with retries. Each attempt first waits on the given rate limiter so retries
+    count against the SEC's limit like any other request
+    """
+    user_agent = 'Automated-Financial-Data-Library'
+
+    def __init__(self, pool_size=10, max_retries=5, backoff=0.5, max_backoff=60, timeout=30):
+        """
+        :param pool_size: Number of connections kept alive per host, should be at least the number of threads fetching
+        :param max_retries: Number of times a 429, 5xx or connection failure is retried before giving up
+        :param backoff: Base delay, in seconds, of the exponential backoff between retries
+        :param max_backoff: Longest delay, in seconds, between two retries
+        :param timeout: Seconds to wait on the SEC to connect and respond before considering the attempt failed
+        """
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'User-Agent': self.user_agent, 'Accept-Encoding': 'gzip, deflate'})
+
+    def _backoff_delay(self, attempt):
+        """Full jitter exponential backoff so clients that failed together don't retry together"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _retry_delay(self, response, attempt):
+        """Honours the SEC's Retry-After header (seconds or an HTTP date) if there is one, backs off otherwise"""
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None:
+            try:
+                return min(self.max_backoff, max(0.0, float(retry_after)))
+            except ValueError:
+                try:
+                    retry_at = parsedate_to_datetime(retry_after)
+                    now = datetime.datetime.now(retry_at.tzinfo)
+                    return min(self.max_backoff, max(0.0, (retry_at - now).total_seconds()))
+                except (TypeError, ValueError):
+                    pass
+        return self._backoff_delay(attempt)
+
+    @staticmethod
+    def _call(stats, stage, function, *args, **kwargs):
+        """Calls the function, timed as the given stage if stats (see stats.py) are being collected"""
+        if stats is None:
+            return function(*args, **kwargs)
+        return stats.timed(stage, function, *args, **kwargs)
+
+    def get(self, url, headers=None, rate_limiter=None, stats=None, stream=False):
+        """Returns the response to a GET request, retrying transient failures. Raises HttpError if they persist. The
+        time spent waiting on the rate limiter, the network and between retries is recorded in the optional stats. With
+        stream the body of the returned response is only downloaded as it is read (see requests' iter_content)"""
+        for attempt in range(self.max_retries + 1):
+            if rate_limiter is not None:
+                self._call(stats, "throttle", rate_limiter.acquire)
+            try:
+                r = self._call(stats, "network", self.session.get, url, headers=headers, timeout=self.timeout,
+                               stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise HttpError("Could not connect to the SEC: " + str(e))
+                self._call(stats, "backoff", time.sleep, self._backoff_delay(attempt))
+                continue
+            if (r.status_code == 429 or r.status_code >= 500) and attempt < self.max_retries:
+                # Reading the body of the failed attempt returns its connection to the pool for the next one
+                content = r.content
+                if stats is not None:
+                    stats.record_request(url, r.status_code, len(content))
+                self._call(stats, "backoff", time.sleep, self._retry_delay(r, attempt))
+                continue
+            return r
+
+
+class AsyncResponse:
+    """The parts of an aiohttp response the library uses, named like requests' so both are handled the same way"""
+
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+
+class AsyncTransport(Transport):
+    """
+    AsyncTransport - Transport's pooled session and retries for coroutines, waiting on the rate limiter and between
+    retries without blocking the event loop. A session is opened per event loop, on its first request
+    """
+
+    def __init__(self, pool_size=10, max_retries=5, backoff=0.5, max_backoff=60, timeout=30):
+        """
+        :param pool_size: Number of connections kept open to the SEC, i.e. the most requests in flight at once
+        :param max_retries: Number of times a 429, 5xx or connection failure is retried before giving up
+        :param backoff: Base delay, in seconds, of the exponential backoff between retries
+        :param max_backoff: Longest delay, in seconds, between two retries
+        :param timeout: Seconds to wait on the SEC to connect and respond before considering the attempt failed
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncTransport requires aiohttp, pip install historicalFinancialData[async]")
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self._sessions = {}
+
+    def _session(self):
+        """Returns the running event loop's session, opening it if needed"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                headers={'User-Agent': self.user_agent, 'Accept-Encoding': 'gzip, deflate'},
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+            self._sessions[loop] = session
+        return session
+
+    async def close(self):
+        """Closes the running event loop's session"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+    @staticmethod
+    async def _timed(stats, stage, awaitable):
+        """Awaits, timing it as the given stage if stats are being collected. Coroutines interleave so, unlike
+        Transport's, these timings aren't made exclusive of other stages"""
+        if stats is None:
+            return await awaitable
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            stats.record_stage(stage, time.perf_counter() - start)
+
+    async def _acquire(self, rate_limiter):
+        acquire_async = getattr(rate_limiter, "acquire_async", None)
+        if acquire_async is not None:
+            await acquire_async()
+        else:
+            await asyncio.to_thread(rate_limiter.acquire)  # Limiters without a coroutine still don't block the loop
+
+    async def _read(self, url, headers):
+        async with self._session().get(url, headers=headers) as r:
+            return AsyncResponse(r.status, r.headers, await r.read())
+
+    async def get(self, url, headers=None, rate_limiter=None, stats=None):
+        """Returns the response to a GET request, its body read, retrying transient failures. Raises HttpError if they
+        persist. The time spent waiting on the rate limiter, the network and between retries is recorded in the
+        optional stats"""
+        for attempt in range(self.max_retries + 1):
+            if rate_limiter is not None:
+                await self._timed(stats, "throttle", self._acquire(rate_limiter))
+            try:
+                r = await self._timed(stats, "network", self._read(url, headers))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries:
+                    raise HttpError("Could not connect to the SEC: " + str(e))
+                await self._timed(stats, "backoff", asyncio.sleep(self._backoff_delay(attempt)))
+                continue
+            if (r.status_code == 429 or r.status_code >= 500) and attempt < self.max_retries:
+                # Reading the body of the failed attempt returns its connection to the pool for the next one
+                content = r.content
+                if stats is not None:
+                    stats.record_request(url, r.status_code, len(content))
+                await self._timed(stats, "backoff", asyncio.sleep(self._retry_delay(r, attempt)))
+                continue
+            return r
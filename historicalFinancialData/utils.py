@@ -1,11 +1,17 @@
 import datetime
-from datetime import datetime as dt
-from ratelimit import limits
-import requests
 import json
+import functools
+import contextvars
 import numpy as np
 from math import isclose
 from historicalFinancialData.exceptions import *
+from historicalFinancialData.limiter import SingleFlight, TokenBucket
+from historicalFinancialData.transport import Transport
+from historicalFinancialData.columnar import _to_datetime_objects
+from historicalFinancialData.parser import decode_facts, distinct_mask, frontrunning_mask, to_datetime64
+from historicalFinancialData.periods import TimePeriodIndex
+from historicalFinancialData.tags import TagIndex
+from historicalFinancialData.streaming import decode_document
 
 """
 utils.py - File for utility functions that largely originated as static methods in FinData. Not meant for use by the
@@ -13,8 +19,52 @@ utils.py - File for utility functions that largely originated as static methods
 """
 # Default API URL for SEC API
 sec_url = "https://data.sec.gov/api/xbrl/companyconcept/CIK{0}/us-gaap/{1}.json"
+# API URL returning every fact (for every tag) a company reported in one document
+company_facts_url = "https://data.sec.gov/api/xbrl/companyfacts/CIK{0}.json"
+# API URL returning a company's filing history, much smaller than its facts so it is used to check for new filings
+submissions_url = "https://data.sec.gov/submissions/CIK{0}.json"
+# API URL returning every filer's value of a tag, in a unit, for one calendar period (see frames.py)
+frames_url = "https://data.sec.gov/api/xbrl/frames/us-gaap/{0}/{1}/{2}.json"
 # Constants
 ONE_DAY_DATETIME = datetime.timedelta(days=1)
+# Optional persistent cache (see cache.py) every SEC request goes through, None means no caching
+response_cache = None
+# Rate limiter every SEC request waits on, the SEC allows at most 10 requests a second. Can be replaced by one backed by
+# a file to share the limit with other processes (see limiter.py)
+rate_limiter = TokenBucket(10)
+# Identical SEC requests made at the same time by several threads (i.e. for a hot ticker on the service, see service.py)
+# are coalesced into one, whose response they all share. None means every request is made
+single_flight = SingleFlight()
+# Pooled HTTP session, with retries, shared by every SEC request (see transport.py)
+transport = Transport()
+# Index of the tags each company reports (see tags.py), companyconcept requests for tags known to be missing are
+# skipped. None means every tag is always requested
+tag_index = TagIndex()
+# Optional Stats (see stats.py) recording per-stage timings, requests and cache hits, None means nothing is recorded
+stats = None
+# Whether the fact lists of companyconcept and companyfacts documents are decoded as the response is read, straight into
+# FactTables (see streaming.py), rather than the whole document being decoded at once. Lowers the peak memory of large
+# documents, False falls back to json.loads
+streaming_decode = True
+# Bytes of a streamed response read at a time
+STREAM_CHUNK_SIZE = 1 << 16
+# Responses already retrieved (i.e. concurrently, by AsyncFinData), by URL, which get_url_data returns (or raises, for
+# failures) instead of requesting them. Context local so that only the call they were retrieved for sees them
+prefetched_responses = contextvars.ContextVar("prefetched_responses", default=None)
+# Series the call already looked up in the series cache (i.e. AsyncFinData while planning its requests), by key, None
+# for those that weren't cached, so each is looked up once per call. Context local for the same reason
+prefetched_series = contextvars.ContextVar("prefetched_series", default=None)
+
+
+"Decorator timing the function as a stage of the pipeline, named after it, if stats are being collected"
+def timed_stage(function):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if stats is None:
+            return function(*args, **kwargs)
+        return stats.timed(function.__name__, function, *args, **kwargs)
+    return wrapper
+
 
 "Fills missing quarterly financial data given (complete) yearly data and (in-complete) quarterly data"
 def fill_financial_data(yearly_data, quarterly_data, allow_negatives):
@@ -39,24 +89,104 @@ def fill_financial_data(yearly_data, quarterly_data, allow_negatives):
     return quarterly_data
 
 
-"Retrieves SEC data given the complete URL in a json format"
-@limits(calls=10, period=1)
-def get_url_data(url):
-    r = requests.get(url, headers={'User-Agent': 'Automated-Financial-Data-Library'})
+"""Sends the rate limited request to the SEC, waiting (rather than raising) when the limit is reached and retrying
+    transient failures"""
+def request_url(url, headers=None, stream=False):
+    r = transport.get(url, headers, rate_limiter, stats, stream)
+    # A streamed body is only read (and counted) as it is decoded, see get_url_data. Any other is read right away, which
+    # returns the connection to the pool rather than leaving it open with the unread body of a 404
+    if not (stream and r.status_code == 200):
+        content = r.content
+        if stats is not None:
+            stats.record_request(url, r.status_code, len(content))
+    return r
+
+
+"""Retrieves SEC data given the complete URL in a json format, going through the response cache if one is set. With
+    revalidate even a fresh cached response is checked with the SEC, through a conditional request. With fact_tables
+    (and streaming_decode set) the response is streamed and its fact lists returned as FactTables. Threads asking for
+    a url already being retrieved by another share its response (see single_flight), which is never modified"""
+def get_url_data(url, revalidate=False, fact_tables=False):
+    prefetched = prefetched_responses.get()
+    if prefetched is not None and url in prefetched:
+        if isinstance(prefetched[url], Exception):
+            raise prefetched[url]
+        return prefetched[url]
+    stream = fact_tables and streaming_decode
+    if single_flight is not None:
+        return single_flight.do((url, revalidate, stream), lambda: fetch_url_data(url, revalidate, stream))
+    return fetch_url_data(url, revalidate, stream)
+
+
+"Retrieves a url's json output, through the response cache if there is one, decoding fact lists as it is read if stream"
+def fetch_url_data(url, revalidate, stream):
+    cached = response_cache.lookup(url) if response_cache is not None else None
+    # Fresh cached responses don't need the network (nor the rate limit budget) at all
+    if cached is not None and response_cache.is_fresh(cached) and not revalidate:
+        if stats is not None:
+            stats.record_cache("response_cache", "hit")
+        return decode_json(cached.content, stream)
+    if stats is not None and response_cache is not None:
+        stats.record_cache("response_cache", "miss" if cached is None else "stale")
+    r = request_url(url, cached.validators() if cached is not None else None, stream)
+    raise_for_status(r, cached is not None)
+    if r.status_code == 304:
+        # The SEC confirmed our stale copy is still up-to-date
+        response_cache.refresh(url, cached)
+        return decode_json(cached.content, stream)
+    if stream:
+        return get_streamed_data(url, r)
+    if response_cache is not None:
+        response_cache.store(url, r.content, r.headers)
+    json_output = decode_json(r.content)
+    return json_output
+
+
+"Raises the library's exception for a failed response, a 304 only being a success for a conditional request"
+def raise_for_status(r, conditional):
     # Throw if the request was incorrect because of the revenue word
     match r.status_code:
         case 200:
             pass  # Everything is correct and we can proceed
+        case 304 if conditional:
+            pass
         case 403:
             raise ForbiddenError("Request/URL was not found")
         case 404:
             raise NotFoundError("Request/URL was not found")
         case _:
             raise HttpError("Unknown error occurred with request")
-    json_output = json.loads(r.content.decode('utf-8'))
+
+
+"""Decodes a streamed response as it is downloaded. The chunks are only kept, to cache the whole body once it was read,
+    if there is a response cache"""
+def get_streamed_data(url, r):
+    received, received_bytes = [], [0]
+
+    def chunks():
+        for chunk in r.iter_content(STREAM_CHUNK_SIZE):
+            received_bytes[0] += len(chunk)
+            if response_cache is not None:
+                received.append(chunk)
+            yield chunk
+    with r:
+        # Reading the body happens within decoding, so its time counts towards decode_json rather than the network
+        json_output = decode_json(chunks(), True)
+    if stats is not None:
+        stats.record_request(url, r.status_code, received_bytes[0])
+    if response_cache is not None:
+        response_cache.store(url, b"".join(received), r.headers)
     return json_output
 
 
+"Decodes a json response body, given whole or (to be streamed) in chunks, with its fact lists as FactTables if streamed"
+@timed_stage
+def decode_json(content, stream=False):
+    if stream:
+        return decode_document(content)
+    return json.loads(content.decode('utf-8'))
+
+
 "Fills missing quarter dates, should be applied to the result of fill_financial_data which doesn't add dates"
 def fill_dates(data):
     for i, quarter in enumerate(data):
@@ -84,47 +214,54 @@ def is_in_date_bound(string_date, min_year, min_quarter, max_year, max_quarter):
             (given_yr < max_year or given_qtr <= max_quarter)
 
 
-"""Sometimes the SEC reports financial quarters that are too late in the calendar year to be valid and
-    and as such conflict with company data"""
-def is_fy_date_frontrunning(start, fy, fp):
-    if start.year > fy:
-        return True
-    if start.year == fy:
-        latest_start = {"Q1":1, "Q2":4, "Q3":7, "Q4":10}
-        if latest_start[fp] < start.month or (latest_start[fp] == start.month and start.day > 7):
-            return True
-        return False
-    return False
-
-
-"Filter for valid yearly and quarterly revenue data"
-def yr_is_valid(item, min_year, max_year):
-    return item["form"] == "10-K" and "fy" in item and "fp" in item and min_year <= int(item["fy"]) <= max_year and \
-           ("start" not in item or 330 < (dt.fromisoformat(item["end"]) - dt.fromisoformat(item["start"])).days < 380)
-
-
-def qr_is_valid(item, min_year, max_year):
-    return "fp" in item and item["form"] in "10-Q/A" and min_year <= int(item["fy"]) <= max_year and "fy" in item \
-           and ("start" not in item or \
-                (60 < (dt.fromisoformat(item["end"]) - dt.fromisoformat(item["start"])).days < 100 and \
-                not is_fy_date_frontrunning(dt.fromisoformat(item["start"]), item["fy"], item["fp"])))
+"Filter for valid yearly data, as a mask over the decoded facts"
+def yr_is_valid(facts, min_year, max_year):
+    mask = (facts.form == "10-K") & facts.has_fy & facts.has_fp & (min_year <= facts.fy) & (facts.fy <= max_year)
+    # Only the facts that passed the cheaper checks have their durations checked
+    dated = np.flatnonzero(mask & facts.has_start)
+    durations = (facts.end[dated] - facts.start[dated]).astype(np.int64)
+    mask[dated] = (330 < durations) & (durations < 380)
+    return mask
+
+
+"Filter for valid quarterly data, as a mask over the decoded facts"
+def qr_is_valid(facts, min_year, max_year):
+    # Forms are matched as substrings of "10-Q/A", which are 10-Q and its amendments
+    mask = facts.has_fp & distinct_mask(facts.form, lambda form: form is not None and form in "10-Q/A") & \
+           facts.has_fy & (min_year <= facts.fy) & (facts.fy <= max_year)
+    dated = np.flatnonzero(mask & facts.has_start)
+    durations = (facts.end[dated] - facts.start[dated]).astype(np.int64)
+    mask[dated] = (60 < durations) & (durations < 100) & \
+        ~frontrunning_mask(facts.start[dated], facts.fy[dated], facts.fp[dated])
+    return mask
+
+
+"Builds the rows (time period, value, start and end dates) of quarterly data out of the masked facts"
+def quarter_rows(facts, mask, periods):
+    if not mask.any():
+        return np.array([])
+    rows = np.empty((len(periods), 4), dtype=object)
+    rows[:, 0] = periods
+    rows[:, 1] = facts.val[mask]
+    # Only the selected dates are converted to the datetime objects the library returns
+    rows[:, 2] = _to_datetime_objects(facts.start[mask])
+    rows[:, 3] = _to_datetime_objects(facts.end[mask])
+    return rows
 
 
 "Return quarters marked by frame rather than year and quarter"
-def get_frame_quarter_data(raw_output, min_year, max_year, found_qrtrs, value_list_name):
-        frame_quarter_data = np.array([[item["frame"][2:8], item["val"],(dt.fromisoformat(item["start"])
-                                if "start" in item else None), dt.fromisoformat(item["end"])]
-                                for item in raw_output["units"][value_list_name] if "frame" in item and
-                                "Q" in item["frame"] and item["frame"][2:] not in found_qrtrs and "fy" in item
-                                and min_year <= int(item["frame"][2:6]) <= max_year])
-        return frame_quarter_data
+def get_frame_quarter_data(facts, min_year, max_year, found_qrtrs):
+    def is_new_quarter(frame):
+        return "Q" in frame and frame[2:] not in found_qrtrs and frame[2:6].isdigit() and \
+            min_year <= int(frame[2:6]) <= max_year
+    mask = distinct_mask(facts.frame, is_new_quarter) & facts.has_fy
+    return quarter_rows(facts, mask, [frame[2:8] for frame in facts.frame[mask].tolist()])
 
 
 "Return quarters marked by year and quarter explicitly"
-def get_explicit_quarter_data(raw_output, min_year, max_year, value_list_name):
-    return np.array([[str(item["fy"]) + item["fp"], item["val"], (dt.fromisoformat(item["start"]) if "start" in item
-                    else None), dt.fromisoformat(item["end"])] for item in raw_output["units"][value_list_name] if
-                    qr_is_valid(item, min_year, max_year)])
+def get_explicit_quarter_data(facts, min_year, max_year):
+    mask = qr_is_valid(facts, min_year, max_year)
+    return quarter_rows(facts, mask, [str(fy) + fp for fy, fp in zip(facts.fy[mask].tolist(), facts.fp[mask].tolist())])
 
 
 "Function that appends 2d np arrays which can be None"
@@ -137,47 +274,66 @@ def safe_np_append(main_data, additional_data):
 
 "Given a sorted value data 2d np array it returns the missing time periods"
 def get_missing_time_periods(data):
-    missing_time_periods, last_date = None, None
+    missing_time_periods, last_date = [], None
     average_quarter_length = None
     # Iterate over quarters and record the gaps between them, a missing time period which is likely a missing quarter
     for quarter_info in data:
         if last_date is not None and quarter_info[2] is not None and (quarter_info[2] - last_date).days > 1:
-            new_data = np.array([last_date+ONE_DAY_DATETIME, quarter_info[2]-ONE_DAY_DATETIME])
-            missing_time_periods = safe_np_append(missing_time_periods, new_data)
+            missing_time_periods.append([last_date+ONE_DAY_DATETIME, quarter_info[2]-ONE_DAY_DATETIME])
         if last_date is not None and (quarter_info[3] - last_date).days < 95 and average_quarter_length is None:
             average_quarter_length = (quarter_info[3] - last_date - ONE_DAY_DATETIME).days
         last_date = quarter_info[3]
     # Add a last date as the function calling this will always work on whole years and as such ignore the last Q4
     if last_date is not None:
         end_of_latest_quarter = last_date + datetime.timedelta(days=average_quarter_length)
-        latest_quarter = np.array([last_date+ONE_DAY_DATETIME, end_of_latest_quarter])
-        missing_time_periods = safe_np_append(missing_time_periods, latest_quarter)
-    return missing_time_periods
+        missing_time_periods.append([last_date+ONE_DAY_DATETIME, end_of_latest_quarter])
+    # The periods are collected in a list and turned into an array once, rather than stacked one at a time
+    return np.array(missing_time_periods, dtype=object) if missing_time_periods else None
+
+
+"""Returns the facts (indices, start and end dates) that could fill a missing time period, those that match most of the
+    qr_is_valid() conditions except the form req. Instants use the start date worked out for the quarter ending on the
+    same date, if any"""
+def get_time_period_candidates(facts, end_date_to_new_start_date_map):
+    starts = facts.start.copy()
+    instants = np.flatnonzero(~facts.has_start)
+    if len(instants) and end_date_to_new_start_date_map:
+        # Look the instants' end dates up in the map's (sorted) end dates rather than converting them to objects
+        map_ends = to_datetime64(end_date_to_new_start_date_map.keys())
+        map_starts = to_datetime64(end_date_to_new_start_date_map.values())
+        order = np.argsort(map_ends)
+        map_ends, map_starts = map_ends[order], map_starts[order]
+        positions = np.minimum(np.searchsorted(map_ends, facts.end[instants]), len(map_ends) - 1)
+        found = map_ends[positions] == facts.end[instants]
+        starts[instants[found]] = map_starts[positions[found]]
+    candidates = np.flatnonzero(~np.isnat(starts) & facts.has_fy & facts.has_fp)
+    durations = (facts.end[candidates] - starts[candidates]).astype(np.int64)
+    candidates = candidates[(60 < durations) & (durations < 100) &
+                            ~frontrunning_mask(starts[candidates], facts.fy[candidates], "Q4")]
+    return candidates, _to_datetime_objects(starts[candidates]), _to_datetime_objects(facts.end[candidates])
 
 
 "Returns quarterly data that matches the time periods and most of the qr_is_valid() conditions except the form req"
-def get_quarterly_data_from_time_periods(raw_output, time_periods, value_list_name, end_date_to_new_start_date_map):
-    missing_data = None
-    for item in raw_output["units"][value_list_name]:
-        end_date = dt.fromisoformat(item["end"])
-        # Skip data we can't find a start date for
-        if "start" not in item and end_date not in end_date_to_new_start_date_map:
-            continue
-        start_date = dt.fromisoformat(item["start"]) if "start" in item else end_date_to_new_start_date_map[end_date]
-        if np.array([start_date, end_date]) in time_periods and 'fy' in item \
-                and 60 < (end_date - start_date).days < 100 and 'fp' in item \
-                and not is_fy_date_frontrunning(start_date, item["fy"], "Q4"):
-            new_data = [np.array([str(end_date.year)+"Q4", item["val"], start_date, end_date])]
+@timed_stage
+def get_quarterly_data_from_time_periods(facts, time_periods, end_date_to_new_start_date_map):
+    missing_data = {}
+    # Everything but the time period matching is independent of the facts before, so it is checked for all at once
+    candidates, start_dates, end_dates = get_time_period_candidates(facts, end_date_to_new_start_date_map)
+    # Each fact is then matched against the index of the time periods rather than scanning every one of them
+    index = TimePeriodIndex(time_periods)
+    for i, start_date, end_date in zip(candidates, start_dates, end_dates):
+        if index.matches(start_date, end_date):
             # Sometimes we only find a date that fills a part of a larger whole so we re-adapt the missing interval
-            if len(time_periods[time_periods != np.array([start_date, end_date])])%2:
-                time_periods = safe_np_append(time_periods, np.array([start_date, end_date + ONE_DAY_DATETIME]))
-            time_periods = np.sort(time_periods[time_periods != np.array([start_date, end_date])]).reshape(-1,2)
-            missing_data = safe_np_append(missing_data, new_data)
+            index.fill(start_date, end_date, ONE_DAY_DATETIME)
+            # Like unique(), the latest data found for a quarter is kept
+            missing_data[str(end_date.year)+"Q4"] = np.array([str(end_date.year)+"Q4", facts.val[i], start_date,
+                                                             end_date])
     # Return the found missing data as well as the time periods we couldn't find data for
-    return unique(missing_data) if missing_data is not None else None, time_periods if len(time_periods) else None
+    return np.array(list(missing_data.values())) if missing_data else None, index.time_periods()
 
 
 "Fill in start dates if they are not provided, assumes end date always provided"
+@timed_stage
 def fill_start_dates(data):
     average_quarter_length, last_date = None, None
     end_date_to_new_start_date_map = {}
@@ -199,36 +355,43 @@ def fill_start_dates(data):
 
 
 "Retrieves the financial data values from the url response from the start of the min_year up to the max_year"
+@timed_stage
 def get_spec_data_given_url(url, min_year=0, max_year=3000, found_qrtrs=None, missing_time_periods = None, raw_data=None):
-    raw_output = get_url_data(url) if raw_data is None else raw_data
+    raw_output = get_url_data(url, fact_tables=True) if raw_data is None else raw_data
     value_list_name = list(raw_output["units"].keys())[0] # Always only one key so order/indicies don't matter
+    # Decode the facts once, the decoded table is returned in place of them so a second pass doesn't decode them again.
+    # Only the table is kept, not the rest of the payload's dictionaries
+    facts = decode_facts(raw_output["units"][value_list_name])
+    raw_output = {"units": {value_list_name: facts}}
     # Create tables of quarterly and yearly revenues by parsing the raw output
-    yearly_revenue = {str(item["fy"]): item["val"] for item in raw_output["units"][value_list_name] if
-                      yr_is_valid(item, min_year, max_year)}
+    yearly_mask = yr_is_valid(facts, min_year, max_year)
+    yearly_revenue = dict(zip(map(str, facts.fy[yearly_mask].tolist()), facts.val[yearly_mask]))
     # Do we do an additional scrape of the data finding just quarter we couldn't before, if so found_qrtrs exists
     if found_qrtrs is None:
-        quarterly_data = get_explicit_quarter_data(raw_output, min_year, max_year, value_list_name)
+        quarterly_data = get_explicit_quarter_data(facts, min_year, max_year)
         quarterly_data = unique(quarterly_data)
         quarterly_data, end_date_to_new_start_date_map = fill_start_dates(quarterly_data)
         new_missing_time_periods = get_missing_time_periods(quarterly_data)
         missing_time_periods = safe_np_append(missing_time_periods, new_missing_time_periods)
         if missing_time_periods is not None:
-            missing_data, missing_time_periods = get_quarterly_data_from_time_periods(raw_output, missing_time_periods,
-                                                                    value_list_name, end_date_to_new_start_date_map)
+            missing_data, missing_time_periods = get_quarterly_data_from_time_periods(facts, missing_time_periods,
+                                                                                      end_date_to_new_start_date_map)
             if missing_data is not None:
                 quarterly_data = safe_np_append(quarterly_data, missing_data)
                 quarterly_data = quarterly_data[quarterly_data[:, 0].argsort()]
     else:
-        quarterly_data = get_frame_quarter_data(raw_output, min_year, max_year, found_qrtrs, value_list_name)
+        quarterly_data = get_frame_quarter_data(facts, min_year, max_year, found_qrtrs)
         quarterly_data, _ = fill_start_dates(quarterly_data)
         quarterly_data = unique(quarterly_data)
     return quarterly_data, yearly_revenue, missing_time_periods, raw_output
 
 
 "Fill the quarterly data given its own information, as a list, and information from the yearly data, a dictionary"
+@timed_stage
 def fill_data(yearly_data, quarterly_data, allow_negatives):
     # Filter data and make it unique as the above can return double counts
-    _, unique_indices = np.unique(quarterly_data.astype(str)[:, 0], return_index=True, axis=0)
+    # Only the time periods are converted to strings, converting the dates as well costs more than the rest of filling
+    _, unique_indices = np.unique(quarterly_data[:, 0].astype(str), return_index=True)
     value_data = np.take(quarterly_data, unique_indices, 0)
     # Fill in missing data
     value_data = fill_financial_data(yearly_data, value_data, allow_negatives)
@@ -236,23 +399,47 @@ def fill_data(yearly_data, quarterly_data, allow_negatives):
     return value_data
 
 
-"Given value tags, it returns the quarterly and yearly data"
-def get_value_and_yearly_data(cik, value_tags, min_year, max_year, found_qrtrs = None, raw_data = None):
-    value_data, missing_time_periods, yearly_data, cur_raw_data = None, None, {}, {}
+"Returns a tag's data out of a companyfacts document, in the same format the SEC returns for a single companyconcept"
+def get_tag_data_from_company_facts(company_facts, value_tag):
+    try:
+        return company_facts["facts"]["us-gaap"][value_tag]
+    except KeyError:
+        # Mirror the SEC's behaviour with companyconcept requests for tags the company doesn't report
+        raise NotFoundError("Tag was not found in the company facts")
+
+
+"Given value tags, it returns the quarterly and yearly data, from the companyfacts document instead of the API if given"
+def get_value_and_yearly_data(cik, value_tags, min_year, max_year, found_qrtrs = None, raw_data = None,
+                              company_facts=None):
+    value_data, missing_time_periods, yearly_data, cur_raw_data = None, None, {}, None
     # If we don't have the raw data from the SEC then we need to do the whole process of retrieving it
     if raw_data is None:
         # Some value tag words aren't found in certain company's income statements, so we cycle through possibilities
         for i in range(len(value_tags)):
+            # Tags the company is known not to report would only cost a request (and its rate limit budget) to 404
+            index = tag_index if company_facts is None else None
+            if index is not None and index.is_missing(cik, value_tags[i]):
+                if stats is not None:
+                    stats.record_cache("tag_index", "skipped")
+                continue
             try:
                 url = sec_url.format(cik, value_tags[i])
+                tag_data = None if company_facts is None else \
+                    get_tag_data_from_company_facts(company_facts, value_tags[i])
                 new_qtr_data, new_yr_data, missing_time_periods, new_raw_data = \
-                    get_spec_data_given_url(url, min_year-1, max_year+1, found_qrtrs, missing_time_periods)
-                cur_raw_data = cur_raw_data | new_raw_data
+                    get_spec_data_given_url(url, min_year-1, max_year+1, found_qrtrs, missing_time_periods, tag_data)
+                # Only the last tag found is parsed again for isolated quarters, the others' tables are let go
+                cur_raw_data = new_raw_data
                 if new_qtr_data is not None and len(new_qtr_data) > 0 and len(new_qtr_data.shape) > 1:
                     value_data = new_qtr_data if value_data is None else np.concatenate((value_data, new_qtr_data))
                 yearly_data = yearly_data | new_yr_data
-            except HttpError:
-                pass
+            except NotFoundError:
+                # The company doesn't use this tag, other failures (that persisted through retries) are raised
+                if index is not None:
+                    index.record(cik, value_tags[i], False)
+            else:
+                if index is not None:
+                    index.record(cik, value_tags[i], True)
     # As we have the data we just parse it. As we only use this to find isolated data, yearly info isn't needed
     else:
         # No need for try-except block as we aren't hitting an API like above
@@ -270,6 +457,7 @@ def get_number_of_quarters_necessary(start_year, start_quarter, end_year, end_qu
 
 
 "Corrects the shape and cleans the array given the exact start and end dates"
+@timed_stage
 def correct_output(value_data, min_year, min_quarter, max_year, max_quarter):
     value_data = np.fromiter(
         (x for x in value_data if is_in_date_bound(x[0], min_year, min_quarter, max_year, max_quarter)),
@@ -277,10 +465,14 @@ def correct_output(value_data, min_year, min_quarter, max_year, max_quarter):
     return np.stack(value_data)
 
 
-"Gets data from the list of value tags for a particular company, given its cik"
-def get_data(cik, value_tags, data_name, min_year=0, min_quarter=0, max_year=3000, max_quarter=5, allow_negatives=True):
+"""Gets data from the list of value tags for a particular company, given its cik. If the company's companyfacts
+    document is given the data is parsed from it instead of requesting each tag from the SEC"""
+@timed_stage
+def get_data(cik, value_tags, data_name, min_year=0, min_quarter=0, max_year=3000, max_quarter=5, allow_negatives=True,
+             company_facts=None):
     values = np.array(['Time-Period', data_name, 'Start of Quarter', 'End of Quarter'])
-    value_data, yearly_data, raw_data = get_value_and_yearly_data(cik, value_tags, min_year, max_year)
+    value_data, yearly_data, raw_data = get_value_and_yearly_data(cik, value_tags, min_year, max_year,
+                                                                  company_facts=company_facts)
     if value_data is None: # No data was found (Some companies, primarily non-US, like Toyota)
         raise NotFoundError()
     relevant_value_data = correct_output(value_data, min_year, min_quarter, max_year, max_quarter)
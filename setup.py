@@ -17,7 +17,9 @@ setup(
     long_description_content_type='text/markdown',
     license='Apache 2.0 License',
     packages=['historicalFinancialData'],
-    install_requires=['ratelimit', 'numpy', 'requests', 'pypandoc'],
+    install_requires=['numpy', 'requests', 'pypandoc'],
+    extras_require={'async': ['aiohttp'], 'parquet': ['pyarrow']},
+    entry_points={'console_scripts': ['hfd=historicalFinancialData.cli:main']},
     classifiers=[
         'Development Status :: 3 - Alpha',
         'Intended Audience :: Developers',